@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# applied to every new SQLite connection, override with settings.SQLITE_PRAGMAS
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',      # readers don't block the writer (and the other way round)
+    'synchronous': 'NORMAL',    # safe with WAL, fsync only at checkpoints
+    'busy_timeout': 5000,       # wait up to 5s for the write lock instead of failing with "database is locked"
+    'mmap_size': 134217728,     # 128MB memory-mapped reads
+    'cache_size': -20000,       # ~20MB page cache per connection
+    'temp_store': 'MEMORY',
+}
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if not name.isidentifier():
+                raise ValueError(f'Invalid SQLite pragma name: {name!r}')
+            cursor.execute(f'PRAGMA {name} = {value}')
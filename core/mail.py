@@ -0,0 +1,16 @@
+from django.conf import settings
+
+from .models import OutboxEmail
+
+
+def queue_mail(subject, message, from_email, recipient_list):
+    """
+    Drop-in for send_mail() that writes the email to the outbox instead of talking to SMTP.
+    Call it inside the transaction that produced the email, manage.py send_queued_mail delivers it.
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
@@ -0,0 +1,284 @@
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+from io import StringIO
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core.middleware import QueryTimer
+from quiz import leaderboard, search
+from quiz import urls as quiz_urls
+from quiz.attempt_store import get_attempt_store
+from quiz.models import Category, Option, Question, Quiz, QuizAttempt, Rating, UserAnswer, RATING_SCORES
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset into a throwaway test database and measure every quiz route plus the "
+        "welcome page through the test client (p50/p95 latency, SQL query count and SQL time)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--quizzes', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=20, help='questions per quiz')
+        parser.add_argument('--options', type=int, default=4, help='options per question')
+        parser.add_argument('--attempts', type=int, default=2000)
+        parser.add_argument('--ratings', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=30, help='timed requests per route')
+        parser.add_argument('--route', action='append', dest='routes', help='only run these routes (repeatable)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--json', dest='json_path', help="write the results as JSON to this file ('-' for stdout)")
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            cache.clear()
+            started = time.perf_counter()
+            self.seed(options)
+            seed_time = time.perf_counter() - started
+            results = self.run_routes(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'dataset': {key: options[key] for key in ('users', 'quizzes', 'questions', 'options', 'attempts', 'ratings')},
+            'iterations': options['iterations'],
+            'seed_seconds': round(seed_time, 3),
+            'routes': results,
+        }
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+        self.print_table(results)
+
+    # --- dataset -------------------------------------------------------------
+
+    def seed(self, options):
+        users = User.objects.bulk_create([
+            User(username=f'bench{i}', email=f'bench{i}@example.com', is_email_verified=True)
+            for i in range(options['users'])
+        ])
+        self.author = User.objects.create(username='bench-author', email='author@example.com', is_email_verified=True, is_staff=True)
+        self.taker = User.objects.create(username='bench-taker', email='taker@example.com', is_email_verified=True)
+        self.admin = User.objects.create(username='bench-admin', email='admin@example.com', is_email_verified=True, user_type='admin')
+        categories = Category.objects.bulk_create([Category(name=f'Category {i}') for i in range(5)])
+        quizzes = Quiz.objects.bulk_create([
+            Quiz(title=f'Quiz {i}', description='Synthetic benchmark quiz ' * 5, category=categories[i % len(categories)], created_by=self.author,
+                 last_question_order=options['questions'])
+            for i in range(options['quizzes'])
+        ])
+        questions = Question.objects.bulk_create([
+            Question(quiz=quiz, text=f'Question {n} of {quiz.title}?', order=n + 1, points=1 + n % 3)
+            for quiz in quizzes for n in range(options['questions'])
+        ], batch_size=1000)
+        Option.objects.bulk_create([
+            Option(question=question, text=f'Option {n}', is_correct=(n == 0))
+            for question in questions for n in range(options['options'])
+        ], batch_size=1000)
+
+        questions_by_quiz = {}
+        for question in questions:
+            questions_by_quiz.setdefault(question.quiz_id, []).append(question)
+        correct = dict(Option.objects.filter(is_correct=True).values_list('question_id', 'id'))
+        pairs = random.sample([(user, quiz) for user in users for quiz in quizzes], min(options['attempts'], len(users) * len(quizzes)))
+        attempts = QuizAttempt.objects.bulk_create([
+            QuizAttempt(user=user, quiz=quiz, score=0, max_score=0, time_taken=timedelta(seconds=random.randint(30, 900)))
+            for user, quiz in pairs
+        ], batch_size=1000)
+        answers = []
+        for attempt in attempts:
+            for question in questions_by_quiz.get(attempt.quiz_id, []):
+                is_correct = random.random() < 0.6
+                attempt.max_score += question.points
+                attempt.score += question.points if is_correct else 0
+                answers.append(UserAnswer(attempt=attempt, question=question, selected_option_id=correct[question.id], is_correct=is_correct))
+        UserAnswer.objects.bulk_create(answers, batch_size=1000)
+        QuizAttempt.objects.bulk_update(attempts, ['score', 'max_score'], batch_size=1000)
+
+        pairs = random.sample([(user, quiz) for user in users for quiz in quizzes], min(options['ratings'], len(users) * len(quizzes)))
+        Rating.objects.bulk_create([Rating(user=user, quiz=quiz, score=random.choice(RATING_SCORES)) for user, quiz in pairs], batch_size=1000)
+
+        # the stored aggregates are normally maintained by the views
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        leaderboard.rebuild()
+        search.rebuild()
+
+        self.quiz = quizzes[0]
+        self.spare_quiz = quizzes[-1]
+        self.import_quiz = quizzes[-2]
+        self.attempt = QuizAttempt.objects.filter(quiz=self.quiz).select_related('user').first() or attempts[0]
+        self.fresh_users = 0
+
+    def fresh_user(self):
+        # a user without attempts, for routes that can only be hit once per user
+        self.fresh_users += 1
+        return User.objects.create(username=f'bench-fresh{self.fresh_users}', email='fresh@example.com', is_email_verified=True)
+
+    # --- routes --------------------------------------------------------------
+
+    def routes(self):
+        """(label, url name, method, url, user, data, prepare) for every route that is measured."""
+        quiz, spare, attempt = self.quiz, self.spare_quiz, self.attempt
+        question = Question.objects.filter(quiz=quiz).order_by('order').first()
+        answer = Option.objects.filter(question=question).values_list('id', flat=True).first()
+        store = get_attempt_store()
+
+        def restart_attempt(client, user):
+            store.finish(user, quiz.id)
+            store.start(user, quiz.id)
+
+        def ready_to_complete(client, user):
+            state = store.start(user, quiz.id)
+            for number, (question_id, option_id) in enumerate(Option.objects.filter(question__quiz=quiz, is_correct=True).values_list('question_id', 'id')):
+                store.record_answer(state, question_id, option_id)
+                store.move_cursor(state, number + 1)
+            store.save(state)
+
+        bank = SimpleUploadedFile('bank.csv', ''.join(
+            f'Imported question {n}?,1,{1 + n % 4},first,second,third,fourth\n' for n in range(200)
+        ).encode(), content_type='text/csv')
+
+        def rewind_upload(client, user):
+            bank.seek(0)
+
+        question_ids = list(Question.objects.filter(quiz=quiz).order_by('order').values_list('id', flat=True))
+        reversed_order = question_ids[::-1]
+
+        def flip_order(client, user):
+            # every POST moves every question: alternate between the reversed and the original order
+            reversed_order.reverse()
+
+        def revalidating(url):
+            # fetch the page untimed, the measured request sends its ETag back (304 Not Modified)
+            def prepare(client, user):
+                client.defaults['HTTP_IF_NONE_MATCH'] = client.get(url)['ETag']
+            return prepare
+
+        return [
+            ('welcome-page', 'welcome-page', 'get', reverse('welcome-page'), None, None, None),
+            ('quiz-list', 'quiz-list', 'get', reverse('quiz-list'), self.taker, None, None),
+            ('quiz-list ?sort=rating', 'quiz-list', 'get', reverse('quiz-list') + '?sort=rating&page=2', self.taker, None, None),
+            ('quiz-list ?q=', 'quiz-list', 'get', reverse('quiz-list') + '?q=question+quiz+1', self.taker, None, None),
+            ('my-quiz-list', 'my-quiz-list', 'get', reverse('my-quiz-list'), self.author, None, None),
+            ('quiz-list 304', 'quiz-list', 'get', reverse('quiz-list'), self.taker, None, revalidating(reverse('quiz-list'))),
+            ('quiz-detail', 'quiz-detail', 'get', reverse('quiz-detail', args=[quiz.pk]), self.taker, None, None),
+            ('quiz-detail 304', 'quiz-detail', 'get', reverse('quiz-detail', args=[quiz.pk]), self.taker, None, revalidating(reverse('quiz-detail', args=[quiz.pk]))),
+            ('category-create', 'category-create', 'get', reverse('category-create'), self.author, None, None),
+            ('quiz-create', 'quiz-create', 'get', reverse('quiz-create'), self.author, None, None),
+            ('quiz-update', 'quiz-update', 'get', reverse('quiz-update', args=[quiz.pk]), self.author, None, None),
+            ('quiz-delete', 'quiz-delete', 'get', reverse('quiz-delete', args=[quiz.pk]), self.author, None, None),
+            ('quiz-take', 'quiz-take', 'get', reverse('quiz-take', args=[quiz.pk]), self.taker, None, None),
+            ('quiz-take POST', 'quiz-take', 'post', reverse('quiz-take', args=[quiz.pk]), self.taker, {'answer': answer}, restart_attempt),
+            ('quiz-take ?mode=single', 'quiz-take', 'get', reverse('quiz-take', args=[quiz.pk]) + '?mode=single', self.taker, None, None),
+            ('quiz-complete', 'quiz-complete', 'get', reverse('quiz-complete', args=[quiz.pk]), 'fresh', None, ready_to_complete),
+            ('add-question', 'add-question', 'get', reverse('add-question', args=[spare.pk]), self.author, None, None),
+            ('add-question POST', 'add-question', 'post', reverse('add-question', args=[spare.pk]), self.author, {
+                'question_text': 'Benchmark question?', 'option_1': 'a', 'option_2': 'b', 'option_3': 'c', 'option_4': 'd', 'correct_option': '1',
+            }, None),
+            ('quiz-import', 'quiz-import', 'get', reverse('quiz-import'), self.author, None, None),
+            ('question-import POST 200q', 'question-import', 'post', reverse('question-import', args=[self.import_quiz.pk]), self.author, {'file': bank}, rewind_upload),
+            ('quiz-reorder', 'quiz-reorder', 'get', reverse('quiz-reorder', args=[quiz.pk]), self.author, None, None),
+            ('quiz-reorder POST', 'quiz-reorder', 'post', reverse('quiz-reorder', args=[quiz.pk]), self.author, {'question': reversed_order}, flip_order),
+            ('quiz-analytics', 'quiz-analytics', 'get', reverse('quiz-analytics', args=[quiz.pk]), self.author, None, None),
+            ('quiz-export csv', 'quiz-export', 'get', reverse('quiz-export', args=[quiz.pk]), self.author, None, None),
+            ('quiz-export json', 'quiz-export', 'get', reverse('quiz-export', args=[quiz.pk]) + '?format=json', self.author, None, None),
+            ('quiz-attempts-export', 'quiz-attempts-export', 'get', reverse('quiz-attempts-export', args=[quiz.pk]), self.author, None, None),
+            ('quiz-result', 'quiz-result', 'get', reverse('quiz-result', args=[attempt.pk]), attempt.user, None, None),
+            ('user-history', 'user-history', 'get', reverse('user-history'), attempt.user, None, None),
+            ('leaderboard', 'leaderboard', 'get', reverse('leaderboard'), self.taker, None, None),
+            ('leaderboard 304', 'leaderboard', 'get', reverse('leaderboard'), self.taker, None, revalidating(reverse('leaderboard'))),
+            ('quiz-leaderboard', 'quiz-leaderboard', 'get', reverse('quiz-leaderboard', args=[quiz.pk]), self.taker, None, None),
+            ('api-quiz-list', 'api-quiz-list', 'get', reverse('api-quiz-list'), None, None, None),
+            ('api-quiz-list 304', 'api-quiz-list', 'get', reverse('api-quiz-list'), None, None, revalidating(reverse('api-quiz-list'))),
+            ('api-quiz-detail', 'api-quiz-detail', 'get', reverse('api-quiz-detail', args=[quiz.pk]), None, None, None),
+            ('api-leaderboard', 'api-leaderboard', 'get', reverse('api-leaderboard'), None, None, None),
+            ('api-quiz-leaderboard', 'api-quiz-leaderboard', 'get', reverse('api-quiz-leaderboard', args=[quiz.pk]), None, None, None),
+            ('rate-quiz', 'rate-quiz', 'get', reverse('rate-quiz', args=[quiz.pk]), self.taker, None, None),
+            ('profile admin', 'profile', 'get', reverse('profile'), self.admin, None, None),
+            ('profile admin ?q=&sort=active', 'profile', 'get', reverse('profile') + '?q=bench1&sort=active&page=2', self.admin, None, None),
+            ('user-directory-export', 'user-directory-export', 'get', reverse('user-directory-export'), self.admin, None, None),
+            ('rate-quiz POST', 'rate-quiz', 'post', reverse('rate-quiz', args=[quiz.pk]), self.taker, {'score': '5'}, None),
+        ]
+
+    def run_routes(self, options):
+        routes = self.routes()
+        if options['routes']:
+            routes = [route for route in routes if route[0] in options['routes'] or route[1] in options['routes']]
+
+        covered = {route[1] for route in routes}
+        missing = {pattern.name for pattern in quiz_urls.urlpatterns if pattern.name} - covered
+        if missing and not options['routes']:
+            self.stderr.write(f"Not benchmarked: {', '.join(sorted(missing))}")
+
+        results = {}
+        for label, url_name, method, url, user, data, prepare in routes:
+            timings, query_counts, query_times, statuses = [], [], [], set()
+            # one untimed warm-up request (fills caches like the quiz snapshot)
+            for iteration in range(options['iterations'] + 1):
+                client = Client()
+                request_user = self.fresh_user() if user == 'fresh' else user
+                if request_user is not None:
+                    client.force_login(request_user)
+                if prepare:
+                    prepare(client, request_user)
+                recorder = QueryTimer()
+                with connection.execute_wrapper(recorder):
+                    started = time.perf_counter()
+                    response = getattr(client, method)(url, data or {})
+                    if response.streaming:
+                        # streamed responses do their work while being consumed
+                        b''.join(response.streaming_content)
+                    elapsed = time.perf_counter() - started
+                statuses.add(response.status_code)
+                if iteration == 0:
+                    continue
+                timings.append(elapsed * 1000)
+                query_counts.append(recorder.count)
+                query_times.append(recorder.time * 1000)
+            results[label] = {
+                'url_name': url_name,
+                'method': method.upper(),
+                'status': sorted(statuses),
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'queries': round(statistics.mean(query_counts), 1),
+                'sql_ms': round(statistics.mean(query_times), 3),
+            }
+        return results
+
+    def print_table(self, results):
+        self.stdout.write(f"{'route':<26} {'method':<6} {'status':<10} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'sql ms':>8}")
+        for label, row in results.items():
+            status = ','.join(str(code) for code in row['status'])
+            self.stdout.write(
+                f"{label:<26} {row['method']:<6} {status:<10} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['queries']:>8} {row['sql_ms']:>8.2f}"
+            )
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,120 @@
+import asyncio
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import AsyncClient, Client, override_settings
+
+from quiz_master import settings_asgi, urls_asgi
+
+from .bench import Command as BenchCommand, percentile
+
+
+class Command(BenchCommand):
+    help = (
+        "Seed the bench dataset into a throwaway test database and load the pages that have async views "
+        "through both request paths: WSGI (sync views, one thread per concurrent client, like a threaded "
+        "server) and ASGI (quiz_master/settings_asgi.py, concurrent tasks on one event loop, like one "
+        "uvicorn worker). Reports throughput and p50/p95/p99 latency under load. Both paths run in-process "
+        "through the test clients, so sockets and HTTP parsing are left out"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--concurrency', type=int, default=16, help='requests in flight at once')
+        parser.set_defaults(iterations=400)
+
+    def run_routes(self, options):
+        # the GET routes of bench that the ASGI profile serves with async views
+        async_names = {pattern.name for pattern in urls_asgi.urlpatterns[0].url_patterns}
+        routes = [route for route in self.routes() if route[1] in async_names and route[2] == 'get' and route[6] is None]
+        if options['routes']:
+            routes = [route for route in routes if route[0] in options['routes'] or route[1] in options['routes']]
+
+        results = {}
+        for label, url_name, method, url, user, data, prepare in routes:
+            for server, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                samples, wall = run(url, user, options['iterations'], options['concurrency'])
+                timings = [elapsed for elapsed, status in samples]
+                results[f'{label} [{server}]'] = {
+                    'url_name': url_name,
+                    'server': server,
+                    'concurrency': options['concurrency'],
+                    'status': sorted({status for elapsed, status in samples}),
+                    'requests_per_s': round(len(samples) / wall, 1),
+                    'p50_ms': round(percentile(timings, 50), 3),
+                    'p95_ms': round(percentile(timings, 95), 3),
+                    'p99_ms': round(percentile(timings, 99), 3),
+                }
+        return results
+
+    def run_wsgi(self, url, user, requests, concurrency):
+        """[(ms, status)] of `requests` GETs made `concurrency` at a time from threads, and the wall time."""
+        clients = queue.SimpleQueue()
+        for _ in range(concurrency):
+            client = Client()
+            if user is not None:
+                client.force_login(user)
+            clients.put(client)
+
+        def timed(_):
+            client = clients.get()
+            try:
+                started = time.perf_counter()
+                response = client.get(url)
+                return (time.perf_counter() - started) * 1000, response.status_code
+            finally:
+                clients.put(client)
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            # untimed warm-up round: database connections, middleware chains, caches
+            list(pool.map(timed, range(concurrency)))
+            started = time.perf_counter()
+            samples = list(pool.map(timed, range(requests)))
+            return samples, time.perf_counter() - started
+
+    def run_asgi(self, url, user, requests, concurrency):
+        """Same as run_wsgi() through the ASGI handler, the async views and middleware of settings_asgi."""
+        # connections read CONN_MAX_AGE from the (shared) settings dict when they open
+        database = connections.settings[DEFAULT_DB_ALIAS]
+        conn_max_age = database['CONN_MAX_AGE']
+        database['CONN_MAX_AGE'] = settings_asgi.DATABASES['default']['CONN_MAX_AGE']
+        try:
+            with override_settings(ROOT_URLCONF=settings_asgi.ROOT_URLCONF, MIDDLEWARE=settings_asgi.MIDDLEWARE):
+                return asyncio.run(self._run_asgi(url, user, requests, concurrency))
+        finally:
+            database['CONN_MAX_AGE'] = conn_max_age
+
+    async def _run_asgi(self, url, user, requests, concurrency):
+        clients = asyncio.Queue()
+        for _ in range(concurrency):
+            client = AsyncClient()
+            if user is not None:
+                await client.aforce_login(user)
+            clients.put_nowait(client)
+
+        async def timed():
+            client = await clients.get()
+            try:
+                started = time.perf_counter()
+                # like ASGIHandler (the test client skips it): the request's sync code gets its own thread
+                async with ThreadSensitiveContext():
+                    response = await client.get(url)
+                return (time.perf_counter() - started) * 1000, response.status_code
+            finally:
+                clients.put_nowait(client)
+
+        await asyncio.gather(*(timed() for _ in range(concurrency)))
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(timed() for _ in range(requests)))
+        return samples, time.perf_counter() - started
+
+    def print_table(self, results):
+        self.stdout.write(f"{'route':<32} {'status':<8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for label, row in results.items():
+            status = ','.join(str(code) for code in row['status'])
+            self.stdout.write(
+                f"{label:<32} {status:<8} {row['requests_per_s']:>8.1f} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}"
+            )
@@ -0,0 +1,110 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued emails from the outbox in batches over one reused mail connection. Batches are claimed, "
+        "so several workers can run side by side, and sent emails are purged after --keep-sent-days"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=5, help='failed attempts before an email is dead-lettered')
+        parser.add_argument('--backoff', type=int, default=60, help='base retry delay in seconds, doubled on each failure')
+        parser.add_argument('--lease', type=int, default=300, help='seconds a claimed batch is reserved for this worker')
+        parser.add_argument('--keep-sent-days', type=int, default=30, help='sent emails older than this are deleted, 0 keeps them')
+        parser.add_argument('--loop', action='store_true', help='keep running and poll for new mail')
+        parser.add_argument('--interval', type=float, default=5, help='seconds to sleep between polls with --loop')
+
+    def handle(self, *args, **options):
+        purged_at = None
+        while True:
+            sent = failed = 0
+            while True:
+                batch = self.claim(options)
+                if not batch:
+                    break
+                batch_sent, batch_failed = self.deliver(batch, options)
+                sent += batch_sent
+                failed += batch_failed
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed.')
+            # at most once an hour with --loop, the sent rows are only kept for inspection
+            if options['keep_sent_days'] and (purged_at is None or time.monotonic() - purged_at >= 3600):
+                self.purge(options['keep_sent_days'])
+                purged_at = time.monotonic()
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def claim(self, options):
+        """
+        The next due batch, claimed for this worker. Due are pending emails and claims of a worker
+        that died (lease run out). The conditional UPDATE only takes rows nobody claimed in the meantime,
+        the batch is what it actually got.
+        """
+        now = timezone.now()
+        due = Q(status__in=[OutboxEmail.PENDING, OutboxEmail.SENDING], next_attempt_at__lte=now)
+        ids = list(OutboxEmail.objects.filter(due).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:options['batch_size']])
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        OutboxEmail.objects.filter(due, id__in=ids).update(
+            status=OutboxEmail.SENDING, claim=token, next_attempt_at=now + timedelta(seconds=options['lease']),
+        )
+        return list(OutboxEmail.objects.filter(status=OutboxEmail.SENDING, claim=token).order_by('id'))
+
+    def deliver(self, batch, options):
+        sent = failed = 0
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as exc:
+            # can't reach the mail server, the whole batch is retried later
+            for email in batch:
+                self.mark_failed(email, exc, options)
+            OutboxEmail.objects.bulk_update(batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'claim'])
+            return 0, len(batch)
+
+        try:
+            for email in batch:
+                message = EmailMessage(email.subject, email.body, email.from_email, email.recipients, connection=connection)
+                try:
+                    message.send()
+                except Exception as exc:
+                    self.mark_failed(email, exc, options)
+                    email.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'claim'])
+                    failed += 1
+                else:
+                    # written right away, a crash later in the batch must not send this one again
+                    OutboxEmail.objects.filter(pk=email.pk).update(
+                        status=OutboxEmail.SENT, sent_at=timezone.now(), attempts=F('attempts') + 1, last_error='', claim='',
+                    )
+                    sent += 1
+        finally:
+            connection.close()
+        return sent, failed
+
+    def mark_failed(self, email, exc, options):
+        email.attempts += 1
+        email.last_error = f'{type(exc).__name__}: {exc}'
+        email.claim = ''
+        if email.attempts >= options['max_attempts']:
+            email.status = OutboxEmail.DEAD
+        else:
+            email.status = OutboxEmail.PENDING
+            email.next_attempt_at = timezone.now() + timedelta(seconds=options['backoff'] * 2 ** (email.attempts - 1))
+
+    def purge(self, days):
+        deleted, _ = OutboxEmail.objects.filter(status=OutboxEmail.SENT, sent_at__lt=timezone.now() - timedelta(days=days)).delete()
+        if deleted:
+            self.stdout.write(f'Deleted {deleted} sent emails older than {days} days.')
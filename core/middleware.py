@@ -0,0 +1,138 @@
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.template import base as template_base
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+logger = logging.getLogger('quiz_master.performance')
+
+# per-request template timing, filled by the patched Template.render below
+_template_timing = contextvars.ContextVar('template_timing', default=None)
+
+
+def _timed_render(render):
+    def wrapper(self, context):
+        timing = _template_timing.get()
+        if timing is None:
+            return render(self, context)
+        # only the outermost template is timed, {% include %} renders are part of it
+        outermost = timing['depth'] == 0
+        timing['depth'] += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            timing['depth'] -= 1
+            if outermost:
+                timing['time'] += time.perf_counter() - start
+    wrapper.timed = True
+    return wrapper
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+
+class ServerTimingMiddleware:
+    """
+    Opt-in (settings.PERFORMANCE_TIMING): records total time, DB query count/time and template
+    render time per request, adds them as a Server-Timing header and logs one line per request to
+    the 'quiz_master.performance' logger. When disabled the middleware removes itself at startup.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFORMANCE_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if not getattr(template_base.Template.render, 'timed', False):
+            template_base.Template.render = _timed_render(template_base.Template.render)
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        token = _template_timing.set({'depth': 0, 'time': 0.0})
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+            total = time.perf_counter() - start
+            template_time = _template_timing.get()['time']
+        finally:
+            _template_timing.reset(token)
+
+        response['Server-Timing'] = (
+            f'db;dur={queries.time * 1000:.2f};desc="{queries.count} queries", '
+            f'tpl;dur={template_time * 1000:.2f}, '
+            f'total;dur={total * 1000:.2f}'
+        )
+        url_name = request.resolver_match.view_name if request.resolver_match else None
+        logger.info(
+            'url_name=%s method=%s status=%s total_ms=%.2f db_queries=%d db_ms=%.2f template_ms=%.2f',
+            url_name, request.method, response.status_code, total * 1000, queries.count, queries.time * 1000, template_time * 1000,
+            extra={
+                'url_name': url_name,
+                'path': request.path,
+                'method': request.method,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                'db_queries': queries.count,
+                'db_ms': round(queries.time * 1000, 2),
+                'template_ms': round(template_time * 1000, 2),
+            },
+        )
+        return response
+
+
+async def _read_in_thread(file, block_size):
+    # the file itself is closed by the response (FileResponse registers it)
+    read = sync_to_async(file.read, thread_sensitive=False)
+    while chunk := await read(block_size):
+        yield chunk
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise for the ASGI profile (quiz_master/settings_asgi.py). The stock middleware is sync
+    only, and a single sync middleware makes Django run every request, async views included, in
+    a worker thread. Here static files are read in a thread and everything else is awaited.
+    """
+    sync_capable = True
+    async_capable = True
+    block_size = 64 * 1024
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            return await self.get_response(request)
+        response = await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        if response.file_to_stream is not None:
+            response.streaming_content = _read_in_thread(response.file_to_stream, self.block_size)
+        return response
@@ -1,3 +1,97 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .mail import queue_mail
+from .middleware import ServerTimingMiddleware
+from .models import OutboxEmail
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class SendQueuedMailTests(TestCase):
+    def test_delivers_pending_mail(self):
+        queue_mail('Hello', 'body', 'from@example.com', ['a@example.com'])
+        later = queue_mail('Later', 'body', 'from@example.com', ['b@example.com'])
+        OutboxEmail.objects.filter(pk=later.pk).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        call_command('send_queued_mail', stdout=mock.MagicMock())
+
+        self.assertEqual([m.subject for m in mail.outbox], ['Hello'])
+        self.assertEqual(OutboxEmail.objects.get(subject='Hello').status, OutboxEmail.SENT)
+        self.assertEqual(OutboxEmail.objects.get(subject='Later').status, OutboxEmail.PENDING)
+
+    def test_failures_back_off_then_dead_letter(self):
+        email = queue_mail('Hello', 'body', 'from@example.com', ['a@example.com'])
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('smtp down')):
+            call_command('send_queued_mail', '--max-attempts=2', stdout=mock.MagicMock())
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboxEmail.PENDING, 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            call_command('send_queued_mail', '--max-attempts=2', stdout=mock.MagicMock())
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboxEmail.DEAD, 2))
+        self.assertEqual(mail.outbox, [])
+
+    def test_claimed_mail_skipped_until_lease_runs_out(self):
+        email = queue_mail('Hello', 'body', 'from@example.com', ['a@example.com'])
+        # another worker holds it
+        OutboxEmail.objects.update(status=OutboxEmail.SENDING, claim='other', next_attempt_at=timezone.now() + timedelta(minutes=5))
+        call_command('send_queued_mail', stdout=mock.MagicMock())
+        self.assertEqual(mail.outbox, [])
+
+        # that worker died, its lease ran out
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        call_command('send_queued_mail', stdout=mock.MagicMock())
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.claim, len(mail.outbox)), (OutboxEmail.SENT, '', 1))
+
+    def test_sent_written_per_message(self):
+        for n in range(3):
+            queue_mail(f'Hello {n}', 'body', 'from@example.com', ['a@example.com'])
+        send = EmailMessage.send
+        def crash_on_third(message, *args, **kwargs):
+            if message.subject == 'Hello 2':
+                raise KeyboardInterrupt
+            return send(message, *args, **kwargs)
+        with mock.patch('django.core.mail.EmailMessage.send', crash_on_third), self.assertRaises(KeyboardInterrupt):
+            call_command('send_queued_mail', stdout=mock.MagicMock())
+        statuses = list(OutboxEmail.objects.values_list('status', flat=True))
+        self.assertEqual(statuses, [OutboxEmail.SENT, OutboxEmail.SENT, OutboxEmail.SENDING])
+
+    def test_purges_old_sent_mail(self):
+        queue_mail('Old', 'body', 'from@example.com', ['a@example.com'])
+        recent = queue_mail('Recent', 'body', 'from@example.com', ['a@example.com'])
+        dead = queue_mail('Dead', 'body', 'from@example.com', ['a@example.com'])
+        OutboxEmail.objects.update(status=OutboxEmail.SENT, sent_at=timezone.now() - timedelta(days=40))
+        OutboxEmail.objects.filter(pk=recent.pk).update(sent_at=timezone.now())
+        OutboxEmail.objects.filter(pk=dead.pk).update(status=OutboxEmail.DEAD)
+
+        call_command('send_queued_mail', '--keep-sent-days=0', stdout=mock.MagicMock())
+        self.assertEqual(OutboxEmail.objects.count(), 3)
+        call_command('send_queued_mail', stdout=mock.MagicMock())
+        self.assertEqual(set(OutboxEmail.objects.values_list('subject', flat=True)), {'Recent', 'Dead'})
+
+
+class ServerTimingTests(TestCase):
+    @override_settings(PERFORMANCE_TIMING=True)
+    def test_header_and_log_line_when_enabled(self):
+        # a new client loads the middleware under the overridden setting
+        with self.assertLogs('quiz_master.performance', 'INFO') as logs:
+            response = Client().get(reverse('welcome-page'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertIn('url_name=welcome-page', logs.output[0])
+
+    @override_settings(PERFORMANCE_TIMING=False)
+    def test_absent_when_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ServerTimingMiddleware(lambda request: None)
+        self.assertNotIn('Server-Timing', Client().get(reverse('welcome-page')))
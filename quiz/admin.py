@@ -1,5 +1,16 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.template.response import TemplateResponse
+from core.pagination import EstimatedCountPaginator
 from .models import Quiz, Question, Option, QuizAttempt, UserAnswer, Category, Rating
+from . import bulk
+
+def attempts_csv_response(attempts, filename):
+    response = StreamingHttpResponse(bulk.export_attempts_csv(attempts), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 
 class OptionInline(admin.TabularInline):
     model = Option
@@ -17,36 +28,110 @@ class QuestionInline(admin.TabularInline):
 class QuizAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'created_by', 'created_at', 'is_active', 'question_count', 'average_rating')
     list_filter = ('is_active', 'category', 'created_at')
+    list_select_related = ('category', 'created_by')
     search_fields = ('title', 'description')
+    autocomplete_fields = ('created_by',)
     inlines = [QuestionInline]
+    actions = ['activate', 'deactivate', 'export_attempts']
+    
+    def get_queryset(self, request):
+        # counted in the changelist query instead of one count() per row
+        return super().get_queryset(request).annotate(question_total=Count('questions'))
     
+    @admin.display(description='Questions', ordering='question_total')
     def question_count(self, obj):
-        return obj.questions.count()
-    question_count.short_description = 'Questions'
+        return obj.question_total
+    
+    @admin.action(description='Activate selected quizzes', permissions=['change'])
+    def activate(self, request, queryset):
+        changed = bulk.set_active(queryset, True)
+        self.message_user(request, f'{changed} quiz(zes) activated.', messages.SUCCESS)
+    
+    @admin.action(description='Deactivate selected quizzes', permissions=['change'])
+    def deactivate(self, request, queryset):
+        changed = bulk.set_active(queryset, False)
+        self.message_user(request, f'{changed} quiz(zes) deactivated.', messages.SUCCESS)
+    
+    @admin.action(description='Export attempts of selected quizzes (CSV)')
+    def export_attempts(self, request, queryset):
+        quiz_ids = list(queryset.values_list('id', flat=True))
+        return attempts_csv_response(QuizAttempt.objects.filter(quiz_id__in=quiz_ids), 'attempts.csv')
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ('quiz', 'text', 'points')  # Removed 'order'
     list_filter = ('quiz',)
+    list_select_related = ('quiz',)
     search_fields = ('text',)
+    autocomplete_fields = ('quiz',)
     inlines = [OptionInline]
 
 @admin.register(Option)
 class OptionAdmin(admin.ModelAdmin):
     list_display = ('question', 'text', 'is_correct')
     list_filter = ('is_correct', 'question__quiz')
+    list_select_related = ('question__quiz',)
+    search_fields = ('text',)
+    raw_id_fields = ('question',)
+    paginator = EstimatedCountPaginator
 
 @admin.register(QuizAttempt)
 class QuizAttemptAdmin(admin.ModelAdmin):
     list_display = ('user', 'quiz', 'score', 'max_score', 'completed_at', 'time_taken')
     list_filter = ('quiz', 'completed_at')
+    list_select_related = ('user', 'quiz')
     search_fields = ('user__username', 'quiz__title')
+    autocomplete_fields = ('user', 'quiz')
+    # ids follow completion (auto_now_add), the pk order pages without sorting the table
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # filter by quiz and date, then select all: the actions get the whole filtered queryset
+    actions = ['export_csv', 'delete_attempts']
+    
+    @admin.action(description='Export selected attempts with answers (CSV)')
+    def export_csv(self, request, queryset):
+        return attempts_csv_response(queryset, 'attempts.csv')
+    
+    def get_actions(self, request):
+        # delete_selected deletes one attempt at a time and leaves the leaderboards stale, delete_attempts replaces it
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+    
+    @admin.action(description='Delete selected attempts', permissions=['delete'])
+    def delete_attempts(self, request, queryset):
+        # like delete_selected: the first post shows a confirmation page, which posts the selection back with post=yes
+        if request.POST.get('post'):
+            deleted = bulk.delete_attempts(queryset)
+            self.message_user(request, f'{deleted} attempt(s) deleted, leaderboards recounted.', messages.SUCCESS)
+            return None
+        return TemplateResponse(request, 'admin/quiz/quizattempt/delete_attempts_confirmation.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Delete attempts',
+            'opts': self.opts,
+            'count': queryset.count(),
+            'select_across': request.POST.get('select_across') == '1',
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'media': self.media,
+        })
+    
+    def delete_model(self, request, obj):
+        # the delete button of the change form, recounted like the action
+        bulk.delete_attempts(QuizAttempt.objects.filter(pk=obj.pk))
 
 @admin.register(UserAnswer)
 class UserAnswerAdmin(admin.ModelAdmin):
     list_display = ('attempt', 'question', 'selected_option', 'is_correct')
     list_filter = ('is_correct', 'attempt__quiz')
+    # everything the __str__ of the three columns reads
+    list_select_related = ('attempt__user', 'attempt__quiz', 'question__quiz', 'selected_option__question')
     search_fields = ('attempt__user__username', 'question__text')
+    raw_id_fields = ('attempt', 'question', 'selected_option')
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -57,4 +142,15 @@ class CategoryAdmin(admin.ModelAdmin):
 class RatingAdmin(admin.ModelAdmin):
     list_display = ('quiz', 'user', 'score', 'created_at')
     list_filter = ('score', 'created_at')
-    search_fields = ('quiz__title', 'user__username')
\ No newline at end of file
+    list_select_related = ('quiz', 'user')
+    search_fields = ('quiz__title', 'user__username')
+    autocomplete_fields = ('quiz', 'user')
+    paginator = EstimatedCountPaginator
+
+    # scores only change through RateQuizView, which keeps the quiz's stored aggregates in step;
+    # deleting stays possible, the post_delete signal takes the rating out of them
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,198 @@
+"""
+Per-question analytics for quiz creators.
+
+The stats tables (QuizStats, ScoreStats, QuestionStats, OptionStats) hold running counts. refresh()
+only adds the attempts recorded since the previous refresh (QuizStats.last_attempt_id) with three
+grouped queries over QuizAttempt/UserAnswer, so a quiz with 100k attempts isn't rescanned on every
+visit of the dashboard. Attempt ids are committed in order (atomic() takes SQLite's write lock up
+front), so no attempt is skipped. Deleted attempts aren't subtracted: reset() drops the counts of
+the quizzes concerned (quiz/bulk.py does on its deletes), `manage.py rebuild_question_stats`
+recounts everything.
+
+    report = question_report(quiz)   # refreshes first
+    for row in report.questions:
+        row.correct_rate, row.discrimination, row.options ...
+
+The discrimination index of a question is the correct rate of the top scoring attempts minus the
+one of the bottom scoring attempts (about 27% each). Groups are cut at whole scores, so attempts
+with the same score always land in the same group.
+"""
+import math
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Prefetch, Q
+from django.utils import timezone
+
+from .models import Option, OptionStats, QuestionStats, QuizAttempt, QuizStats, ScoreStats, UserAnswer
+
+GROUP_FRACTION = 0.27
+TOO_EASY = 0.9
+TOO_HARD = 0.3
+WEAK_DISCRIMINATION = 0.2
+MIN_ANSWERS = 10  # below this the rates are too noisy for a verdict
+
+QuizReport = namedtuple('QuizReport', ['attempts', 'refreshed_at', 'groups', 'questions'])
+QuestionReport = namedtuple('QuestionReport', ['question', 'answered', 'correct', 'correct_rate', 'discrimination', 'verdict', 'options'])
+OptionReport = namedtuple('OptionReport', ['option', 'picks', 'share'])
+
+
+def _merge(queryset, key_fields, rows, counters):
+    """
+    Add grouped counts to a stats table. rows are dicts with the key_fields and the counters, the
+    matching rows of `queryset` are loaded once and written back with one bulk_update, the missing
+    ones are inserted with one bulk_create.
+    """
+    model = queryset.model
+    existing = {tuple(getattr(stats, field) for field in key_fields): stats for stats in queryset}
+    changed, created = [], []
+    for row in rows:
+        stats = existing.get(tuple(row[field] for field in key_fields))
+        if stats is None:
+            created.append(model(**{field: row[field] for field in key_fields + counters}))
+            continue
+        for counter in counters:
+            setattr(stats, counter, getattr(stats, counter) + row[counter])
+        changed.append(stats)
+    model.objects.bulk_update(changed, counters)
+    model.objects.bulk_create(created)
+
+
+def refresh(quiz_id):
+    """Count the attempts made since the last refresh into the stats tables, returns the QuizStats."""
+    with transaction.atomic():
+        stats, _ = QuizStats.objects.select_for_update().get_or_create(quiz_id=quiz_id)
+        # the ids come from a range seek on the quiz_id index (quiz_id, id > watermark), as a plain
+        # filter SQLite prefers the covering ranking index and reads every attempt of the quiz
+        new = QuizAttempt.objects.filter(quiz_id=quiz_id, id__gt=stats.last_attempt_id).values('id')
+        scores = list(
+            QuizAttempt.objects.filter(pk__in=new).order_by()
+            .values('quiz_id', 'score').annotate(attempts=Count('id'), last=Max('id'))
+        )
+        if not scores:
+            return stats
+        last_attempt_id = max(row['last'] for row in scores)
+        answers = UserAnswer.objects.filter(attempt__in=new.filter(id__lte=last_attempt_id)).order_by()
+
+        _merge(ScoreStats.objects.filter(quiz_id=quiz_id), ['quiz_id', 'score'], scores, ['attempts'])
+        _merge(
+            QuestionStats.objects.filter(question__quiz_id=quiz_id),
+            ['question_id', 'score'],
+            answers.values('question_id', score=F('attempt__score')).annotate(
+                answered=Count('id'), correct=Count('id', filter=Q(is_correct=True))
+            ),
+            ['answered', 'correct'],
+        )
+        _merge(
+            OptionStats.objects.filter(option__question__quiz_id=quiz_id),
+            ['option_id'],
+            answers.values(option_id=F('selected_option_id')).annotate(picks=Count('id')),
+            ['picks'],
+        )
+
+        stats.last_attempt_id = last_attempt_id
+        stats.attempts += sum(row['attempts'] for row in scores)
+        stats.refreshed_at = timezone.now()
+        stats.save()
+    return stats
+
+
+def rebuild():
+    """Drop every count and recount all quizzes from scratch, returns the number of quizzes counted."""
+    with transaction.atomic():
+        for model in (QuizStats, ScoreStats, QuestionStats, OptionStats):
+            model.objects.all().delete()
+        quiz_ids = list(QuizAttempt.objects.order_by().values_list('quiz_id', flat=True).distinct())
+        for quiz_id in quiz_ids:
+            refresh(quiz_id)
+    return len(quiz_ids)
+
+
+def reset(quiz_ids):
+    """Drop the counts of some quizzes, their next refresh() counts every attempt again."""
+    QuizStats.objects.filter(quiz_id__in=quiz_ids).delete()
+    ScoreStats.objects.filter(quiz_id__in=quiz_ids).delete()
+    QuestionStats.objects.filter(question__quiz_id__in=quiz_ids).delete()
+    OptionStats.objects.filter(option__question__quiz_id__in=quiz_ids).delete()
+
+
+def score_groups(score_counts, fraction=GROUP_FRACTION):
+    """
+    (top, bottom) score cut-offs from {score: attempts}: the top group is every attempt scoring
+    top or more, the bottom group every attempt scoring bottom or less. None when there are too
+    few distinct scores to tell two groups apart.
+    """
+    size = math.ceil(sum(score_counts.values()) * fraction)
+
+    def cutoff(scores):
+        seen = 0
+        for score in scores:
+            seen += score_counts[score]
+            if seen >= size:
+                return score
+
+    if not size:
+        return None
+    top = cutoff(sorted(score_counts, reverse=True))
+    bottom = cutoff(sorted(score_counts))
+    return (top, bottom) if top > bottom else None
+
+
+def _rate(correct, answered):
+    return correct / answered if answered else None
+
+
+def _group_rate(rows, in_group):
+    # rows: (score, answered, correct) of one question
+    return _rate(sum(row[2] for row in rows if in_group(row[0])), sum(row[1] for row in rows if in_group(row[0])))
+
+
+def _verdict(answered, correct_rate, discrimination):
+    if answered < MIN_ANSWERS:
+        return ''
+    if correct_rate >= TOO_EASY:
+        return 'too easy'
+    if correct_rate <= TOO_HARD:
+        return 'too hard'
+    if discrimination is not None and discrimination < WEAK_DISCRIMINATION:
+        return 'weak discrimination'
+    return ''
+
+
+def question_report(quiz):
+    """Refresh the stats of a quiz and return its QuizReport, questions in quiz order."""
+    stats = refresh(quiz.pk)
+    groups = score_groups(dict(ScoreStats.objects.filter(quiz=quiz).values_list('score', 'attempts')))
+
+    by_question = defaultdict(list)
+    for question_id, score, answered, correct in QuestionStats.objects.filter(question__quiz=quiz).values_list(
+        'question_id', 'score', 'answered', 'correct'
+    ):
+        by_question[question_id].append((score, answered, correct))
+    picks = dict(OptionStats.objects.filter(option__question__quiz=quiz).values_list('option_id', 'picks'))
+
+    questions = []
+    for question in quiz.questions.order_by('order', 'id').prefetch_related(Prefetch('options', queryset=Option.objects.order_by('id'))):
+        rows = by_question[question.id]
+        answered = sum(row[1] for row in rows)
+        correct = sum(row[2] for row in rows)
+        discrimination = None
+        if groups:
+            top = _group_rate(rows, lambda score: score >= groups[0])
+            bottom = _group_rate(rows, lambda score: score <= groups[1])
+            if top is not None and bottom is not None:
+                discrimination = top - bottom
+        correct_rate = _rate(correct, answered)
+        questions.append(QuestionReport(
+            question=question,
+            answered=answered,
+            correct=correct,
+            correct_rate=correct_rate,
+            discrimination=discrimination,
+            verdict=_verdict(answered, correct_rate, discrimination),
+            options=[
+                OptionReport(option, picks.get(option.id, 0), _rate(picks.get(option.id, 0), answered))
+                for option in question.options.all()
+            ],
+        ))
+    return QuizReport(attempts=stats.attempts, refreshed_at=stats.refreshed_at, groups=groups, questions=questions)
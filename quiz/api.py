@@ -0,0 +1,186 @@
+"""
+Read-only JSON API (v1) for the quiz list, quiz detail and leaderboards, mounted at /api/v1/.
+
+Rows are serialized straight from .values() querysets, no model instances or templates. Lists
+are paginated with cursors (core/pagination.py): {"results": [...], "next": url, "previous": url},
+`?limit=` up to MAX_LIMIT. `?fields=id,title` selects the fields of each result, only those
+columns are queried. ETags and 304s come from the same validators as the HTML pages
+(quiz/conditional.py), responses are gzipped when the client accepts it.
+
+    GET /api/v1/quizzes/?category=3&fields=id,title,rating
+    GET /api/v1/quizzes/12/?fields=title,questions
+    GET /api/v1/leaderboard/
+    GET /api/v1/leaderboard/quiz/12/
+"""
+from django.core.exceptions import BadRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from django.views.generic import View
+
+from core.pagination import KeysetPaginator
+
+from . import conditional
+from .models import LeaderboardEntry, Question, Quiz, QuizLeaderboardEntry
+from .snapshot import get_quiz_snapshot
+
+DEFAULT_LIMIT = 25
+MAX_LIMIT = 100
+
+# public name: a .values() lookup, or an expression annotated under the public name
+QUIZ_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'category': 'category__name',
+    'time_limit': 'time_limit',
+    'question_count': Coalesce(Subquery(
+        Question.objects.filter(quiz=OuterRef('pk')).order_by().values('quiz').annotate(count=Count('id')).values('count')
+    ), 0),
+    'rating': Case(
+        When(rating_count=0, then=Value(0.0)),
+        default=ExpressionWrapper(F('rating_sum') * 1.0 / F('rating_count'), output_field=FloatField()),
+        output_field=FloatField(),
+    ),
+    'rating_count': 'rating_count',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+QUIZ_LIST_DEFAULT = ('id', 'title', 'category', 'question_count', 'rating', 'created_at')
+# the questions come from the cached quiz snapshot, without the correct flags
+QUIZ_DETAIL_FIELDS = (*QUIZ_FIELDS, 'questions')
+
+LEADERBOARD_FIELDS = {
+    'user': 'user__username',
+    'total_score': 'total_score',
+    'total_attempts': 'total_attempts',
+}
+QUIZ_LEADERBOARD_FIELDS = {
+    'user': 'user__username',
+    'best_score': 'best_score',
+    'max_score': 'max_score',
+    'best_time': 'best_time',
+    'completed_at': 'completed_at',
+}
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=DjangoJSONEncoder, json_dumps_params={'separators': (',', ':')})
+
+
+def _requested_fields(request, available, default):
+    """The ?fields= selection in the order given, or `default`."""
+    fields = list(dict.fromkeys(name.strip() for name in request.GET.get('fields', '').split(',') if name.strip()))
+    if not fields:
+        return list(default)
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}")
+    return fields
+
+
+def _values(queryset, spec, fields, extra=()):
+    """(queryset.values(...), serializer of its rows) for the public `fields` of `spec`; `extra` lookups are selected too (cursor keys)."""
+    lookups = {name: spec[name] for name in fields if name in spec}
+    annotations = {name: lookup for name, lookup in lookups.items() if not isinstance(lookup, str)}
+    columns = {lookup for lookup in lookups.values() if isinstance(lookup, str)} | set(extra)
+    queryset = queryset.annotate(**annotations).values(*columns, *annotations)
+
+    def serialize(row):
+        return {name: row[lookup if isinstance(lookup, str) else name] for name, lookup in lookups.items()}
+    return queryset, serialize
+
+
+def _limit(request):
+    try:
+        return max(1, min(int(request.GET.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+    except ValueError:
+        raise BadRequest('limit must be a number')
+
+
+def _page_url(request, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def _paginated(request, queryset, spec, default, ordering):
+    fields = _requested_fields(request, spec, default)
+    queryset, serialize = _values(queryset, spec, fields, extra=[name.lstrip('-') for name in ordering])
+    page = KeysetPaginator(queryset, ordering, _limit(request)).page(request.GET.get('cursor'))
+    return {
+        'results': [serialize(row) for row in page],
+        'next': _page_url(request, page.next_cursor),
+        'previous': _page_url(request, page.previous_cursor),
+    }
+
+
+class ApiView(View):
+    http_method_names = ['get', 'head', 'options']
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except BadRequest as error:
+            return _json({'error': str(error)}, status=400)
+
+
+@method_decorator(gzip_page, name='get')
+@method_decorator(conditional.quiz_list, name='get')
+class QuizListApiView(ApiView):
+    def get(self, request):
+        queryset = Quiz.objects.filter(is_active=True)
+        category_id = request.GET.get('category')
+        if category_id:
+            if not category_id.isdigit():
+                raise BadRequest('category must be an id')
+            queryset = queryset.filter(category_id=category_id)
+        # newest first, the order of the quiz_active_created_idx index
+        return _json(_paginated(request, queryset, QUIZ_FIELDS, QUIZ_LIST_DEFAULT, ('-created_at', '-id')))
+
+
+@method_decorator(gzip_page, name='get')
+@method_decorator(conditional.quiz_detail, name='get')
+class QuizDetailApiView(ApiView):
+    def get(self, request, pk):
+        fields = _requested_fields(request, QUIZ_DETAIL_FIELDS, QUIZ_DETAIL_FIELDS)
+        queryset, serialize = _values(Quiz.objects.filter(pk=pk, is_active=True), QUIZ_FIELDS, fields, extra=['id'])
+        row = queryset.first()
+        if row is None:
+            return _json({'error': 'Not found'}, status=404)
+        data = serialize(row)
+        if 'questions' in fields:
+            data['questions'] = [
+                {
+                    'id': question.id,
+                    'text': question.text,
+                    'points': question.points,
+                    'options': [{'id': option.id, 'text': option.text} for option in question.options],
+                }
+                for question in get_quiz_snapshot(row['id']).questions
+            ]
+        return _json(data)
+
+
+@method_decorator(gzip_page, name='get')
+@method_decorator(conditional.leaderboard, name='get')
+class LeaderboardApiView(ApiView):
+    def get(self, request, quiz_id=None):
+        # the materialized leaderboard tables, in the order of their rank indexes
+        if quiz_id is None:
+            return _json(_paginated(
+                request, LeaderboardEntry.objects.all(), LEADERBOARD_FIELDS, LEADERBOARD_FIELDS, ('-total_score', 'user'),
+            ))
+        quiz = Quiz.objects.filter(pk=quiz_id).values('id', 'title').first()
+        if quiz is None:
+            return _json({'error': 'Not found'}, status=404)
+        data = _paginated(
+            request, QuizLeaderboardEntry.objects.filter(quiz_id=quiz_id), QUIZ_LEADERBOARD_FIELDS, QUIZ_LEADERBOARD_FIELDS,
+            ('-best_score', 'best_time', 'user'),
+        )
+        return _json({'quiz': quiz, **data})
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import api
+
+# versioned read-only JSON API, see quiz/api.py
+urlpatterns = [
+    path('quizzes/', api.QuizListApiView.as_view(), name='api-quiz-list'),
+    path('quizzes/<int:pk>/', api.QuizDetailApiView.as_view(), name='api-quiz-detail'),
+    path('leaderboard/', api.LeaderboardApiView.as_view(), name='api-leaderboard'),
+    path('leaderboard/quiz/<int:quiz_id>/', api.LeaderboardApiView.as_view(), name='api-quiz-leaderboard'),
+]
@@ -0,0 +1,144 @@
+"""
+Async versions of the read-heavy quiz pages, served by the ASGI profile (quiz_master/settings_asgi.py,
+routed by quiz_master/urls_asgi.py under the same names as the sync views of quiz/views.py).
+
+They build the same querysets as their sync counterparts and render the same templates with the
+same context, the queries are awaited with the async ORM (aget, acount, async for) so a request
+waiting on the database doesn't hold a worker thread. Helpers that only exist as sync code (search
+snippets, cache versions, ranks) run through sync_to_async. Templates are rendered by Django in a
+thread (TemplateResponse), so anything left lazy in the context is still safe to evaluate there.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from django.template.response import TemplateResponse
+from django.utils.decorators import method_decorator
+from django.views.generic import View
+
+from . import conditional, leaderboard, search, views
+from .forms import RatingForm
+from .models import Category, Quiz, QuizAttempt, Rating
+from .snapshot import get_quiz_version, get_quiz_versions
+
+
+async def _apage(request, queryset, per_page):
+    """The ?page= page of `queryset` like ListView.paginate_queryset() (404 for a bad page), counted and read with the async ORM."""
+    paginator = Paginator(queryset, per_page)
+    # count is a cached_property, setting it keeps Paginator from running the sync count()
+    paginator.count = await queryset.acount()
+    number = request.GET.get('page') or 1
+    if number == 'last':
+        number = paginator.num_pages
+    try:
+        page = paginator.page(number)
+    except InvalidPage as error:
+        raise Http404(f'Invalid page ({error})')
+    page.object_list = [obj async for obj in page.object_list]
+    return page
+
+
+def _page_context(page, name):
+    return {
+        name: page.object_list,
+        'object_list': page.object_list,
+        'page_obj': page,
+        'paginator': page.paginator,
+        'is_paginated': page.has_other_pages(),
+    }
+
+
+@method_decorator(conditional.quiz_list, name='get')
+class QuizListView(View):
+    template_name = views.QuizListView.template_name
+    paginate_by = views.QuizListView.paginate_by
+
+    async def get(self, request):
+        user = await request.auser()
+        # the sync view builds the queryset, nothing runs until the page is read here
+        list_view = views.QuizListView()
+        list_view.setup(request)
+        queryset = list_view.get_queryset()
+        page = await _apage(request, queryset, self.paginate_by)
+        quizzes = page.object_list
+        quiz_ids = [quiz.id for quiz in quizzes]
+
+        context = _page_context(page, 'quizzes')
+        context['categories'] = [category async for category in Category.objects.all()]
+        context['selected_category'] = request.GET.get('category')
+        context['search_query'] = request.GET.get('q', '')
+        context['sort_by'] = request.GET.get('sort') or ('relevance' if list_view.search_match else 'newest')
+        if list_view.search_match:
+            found = await sync_to_async(search.snippets)(list_view.search_match, quiz_ids)
+            for quiz in quizzes:
+                quiz.search_title, quiz.search_snippet = found.get(quiz.id, (None, None))
+        else:
+            versions = await sync_to_async(get_quiz_versions)(quiz_ids)
+            for quiz in quizzes:
+                quiz.cache_version = versions[quiz.id]
+        if user.is_authenticated:
+            attempted = QuizAttempt.objects.filter(user=user, quiz_id__in=quiz_ids).order_by().values_list('quiz_id', flat=True)
+            context['attempted_quizzes'] = {quiz_id async for quiz_id in attempted}
+        return TemplateResponse(request, self.template_name, context)
+
+
+@method_decorator(conditional.quiz_detail, name='get')
+class QuizDetailView(View):
+    template_name = views.QuizDetailView.template_name
+
+    async def get(self, request, pk):
+        user = await request.auser()
+        quiz = await aget_object_or_404(Quiz, pk=pk, is_active=True)
+        context = {
+            'quiz': quiz,
+            'object': quiz,
+            'quiz_version': await sync_to_async(get_quiz_version)(quiz.pk),
+            'can_edit': user.is_staff or quiz.created_by_id == user.pk,
+            # lazy, only evaluated (while rendering) when the questions fragment isn't cached
+            'questions': quiz.questions.prefetch_related('options'),
+        }
+        if user.is_authenticated:
+            user_rating = await Rating.objects.filter(quiz=quiz, user=user).afirst()
+            context['user_rating'] = user_rating.score if user_rating else None
+            context['rating_form'] = RatingForm(initial={'score': user_rating.score} if user_rating else None)
+        return TemplateResponse(request, self.template_name, context)
+
+
+@method_decorator(login_required, name='get')
+class QuizResultView(View):
+    template_name = 'quiz/quiz_result.html'
+
+    async def get(self, request, pk):
+        user = await request.auser()
+        # everything the page shows is loaded here, the template only reads the prefetched answers
+        attempt = await aget_object_or_404(
+            QuizAttempt.objects.select_related('quiz').prefetch_related(
+                'answers__question__options', 'answers__selected_option',
+            ),
+            pk=pk, user=user,
+        )
+        return TemplateResponse(request, self.template_name, {'attempt': attempt, 'object': attempt})
+
+
+@method_decorator(conditional.leaderboard, name='get')
+class LeaderboardView(View):
+    template_name = views.LeaderboardView.template_name
+    paginate_by = views.LeaderboardView.paginate_by
+
+    async def get(self, request, quiz_id=None):
+        user = await request.auser()
+        list_view = views.LeaderboardView()
+        list_view.setup(request, **self.kwargs)
+        page = await _apage(request, list_view.get_queryset(), self.paginate_by)
+
+        context = _page_context(page, 'leaderboard')
+        context['is_specific_quiz'] = bool(quiz_id)
+        if quiz_id:
+            context['quiz'] = await aget_object_or_404(Quiz, id=quiz_id)
+        if user.is_authenticated:
+            if quiz_id:
+                context['my_rank'] = await sync_to_async(leaderboard.get_quiz_rank)(quiz_id, user)
+            else:
+                context['my_rank'] = await sync_to_async(leaderboard.get_user_rank)(user)
+        return TemplateResponse(request, self.template_name, context)
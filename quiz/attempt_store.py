@@ -0,0 +1,143 @@
+"""
+Storage for in-progress quiz attempts (current question and answers so far).
+
+    store = get_attempt_store()
+    state = store.load(user, quiz_id) or store.start(user, quiz_id)
+    store.record_answer(state, question_id, option_id)
+    store.move_cursor(state, state.cursor + 1)
+    store.save(state)            # one write, skipped when nothing changed
+    ...
+    store.finish(user, quiz_id)
+
+The backend is chosen with settings.QUIZ_ATTEMPT_STORE:
+- 'quiz.attempt_store.DatabaseAttemptStore' (default): the AttemptProgress table only
+- 'quiz.attempt_store.CacheAttemptStore': reads from a cache shared by every process (Redis,
+  Memcached...), with the AttemptProgress table as fallback; the process-local LocMemCache is refused
+"""
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import AttemptProgress
+
+DEFAULT_ATTEMPT_STORE = 'quiz.attempt_store.DatabaseAttemptStore'
+
+
+class AttemptState:
+    __slots__ = ('user_id', 'quiz_id', 'cursor', 'answers', 'started_at', 'dirty', 'changes')
+
+    def __init__(self, user_id, quiz_id, cursor=0, answers=None, started_at=None):
+        self.user_id = user_id
+        self.quiz_id = quiz_id
+        self.cursor = cursor
+        self.answers = answers if answers is not None else {}
+        self.started_at = started_at or timezone.now()
+        self.dirty = False
+        self.changes = 0
+
+    def __getstate__(self):
+        return (self.user_id, self.quiz_id, self.cursor, self.answers, self.started_at, self.changes)
+
+    def __setstate__(self, data):
+        self.__init__(*data[:5])
+        self.changes = data[5]
+
+
+class DatabaseAttemptStore:
+    """One compact AttemptProgress row per (user, quiz)."""
+
+    def start(self, user, quiz_id):
+        state = AttemptState(user.pk, quiz_id)
+        try:
+            with transaction.atomic():
+                AttemptProgress.objects.create(user_id=state.user_id, quiz_id=quiz_id, started_at=state.started_at)
+        except IntegrityError:
+            # started in another tab/request, keep that one
+            return self.load(user, quiz_id)
+        return state
+
+    def load(self, user, quiz_id):
+        row = AttemptProgress.objects.filter(user=user, quiz_id=quiz_id).values('cursor', 'answers', 'started_at').first()
+        if row is None:
+            return None
+        return AttemptState(user.pk, quiz_id, row['cursor'], row['answers'], row['started_at'])
+
+    def record_answer(self, state, question_id, option_id):
+        option_id = int(option_id)
+        if state.answers.get(str(question_id)) != option_id:
+            state.answers[str(question_id)] = option_id
+            state.dirty = True
+
+    def move_cursor(self, state, cursor):
+        if state.cursor != cursor:
+            state.cursor = cursor
+            state.dirty = True
+
+    def save(self, state):
+        if not state.dirty:
+            return False
+        self.write(state)
+        state.dirty = False
+        return True
+
+    def write(self, state):
+        AttemptProgress.objects.filter(user_id=state.user_id, quiz_id=state.quiz_id).update(
+            cursor=state.cursor, answers=state.answers, updated_at=timezone.now()
+        )
+
+    def finish(self, user, quiz_id):
+        AttemptProgress.objects.filter(user=user, quiz_id=quiz_id).delete()
+
+
+class CacheAttemptStore(DatabaseAttemptStore):
+    """
+    Keeps the state in Django's cache. The AttemptProgress row is still created on start (so the
+    start time survives and abandoned attempts can be swept) and checkpointed every `checkpoint_every`
+    saves, it is the fallback when the cache entry is missing. Everything that reads the state (the
+    views, grading on finish, manage.py sweep_attempts) goes through load(), so the row may lag behind
+    by up to `checkpoint_every` - 1 saves: that is what an evicted cache entry loses. The cache must be
+    shared by all processes, with a per-process cache another worker would read an older copy.
+    """
+    timeout = 60 * 60 * 24
+    checkpoint_every = 10
+
+    def __init__(self):
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache):
+            raise ImproperlyConfigured(
+                'CacheAttemptStore needs a cache shared by every process, the default cache is a LocMemCache. '
+                "Use 'quiz.attempt_store.DatabaseAttemptStore' or a shared cache backend."
+            )
+
+    def key(self, user_id, quiz_id):
+        return f'quiz-attempt:{user_id}:{quiz_id}'
+
+    def start(self, user, quiz_id):
+        state = super().start(user, quiz_id)
+        cache.set(self.key(state.user_id, quiz_id), state, self.timeout)
+        return state
+
+    def load(self, user, quiz_id):
+        state = cache.get(self.key(user.pk, quiz_id))
+        if state is None:
+            state = super().load(user, quiz_id)
+            if state is not None:
+                cache.set(self.key(user.pk, quiz_id), state, self.timeout)
+        return state
+
+    def write(self, state):
+        state.changes += 1
+        cache.set(self.key(state.user_id, state.quiz_id), state, self.timeout)
+        if state.changes % self.checkpoint_every == 0:
+            super().write(state)
+
+    def finish(self, user, quiz_id):
+        cache.delete(self.key(user.pk, quiz_id))
+        super().finish(user, quiz_id)
+
+
+def get_attempt_store():
+    return import_string(getattr(settings, 'QUIZ_ATTEMPT_STORE', DEFAULT_ATTEMPT_STORE))()
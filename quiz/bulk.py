@@ -0,0 +1,82 @@
+"""
+Bulk operations on quizzes and attempts, for the admin actions and the attempt export of creators.
+
+export_attempts_csv() streams attempts with their answers as CSV, one row per answer, from a single
+query read in chunks, so memory stays flat however many attempts are exported. set_active() and
+delete_attempts() are set-based: one UPDATE/DELETE for the whole queryset instead of a save() or
+delete() per object.
+
+    attempts = attempts_between(QuizAttempt.objects.filter(quiz=quiz), start, end)
+    StreamingHttpResponse(export_attempts_csv(attempts), content_type='text/csv')
+"""
+import csv
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.streaming import Echo
+
+from . import analytics, leaderboard
+from .models import QuizAttempt
+
+CSV_HEADER = [
+    'attempt', 'quiz', 'user', 'completed_at', 'score', 'max_score', 'time_taken_seconds',
+    'question', 'question_order', 'selected_option', 'is_correct',
+]
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def attempts_between(attempts, start=None, end=None):
+    """Attempts completed from the `start` date to the `end` date, both included (either can be None)."""
+    # plain datetime bounds rather than completed_at__date, which would hide the column from its indexes
+    if start:
+        attempts = attempts.filter(completed_at__gte=_start_of(start))
+    if end:
+        attempts = attempts.filter(completed_at__lt=_start_of(end + datetime.timedelta(days=1)))
+    return attempts
+
+
+def export_attempts_csv(attempts):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    # attempt id then answer id: the attempts are read in primary key order and each one's answers
+    # from the attempt_id index, nothing has to be sorted; attempts without answers get one row
+    rows = (
+        attempts.order_by('id', 'answers__id')
+        .values_list(
+            'id', 'quiz__title', 'user__username', 'completed_at', 'score', 'max_score', 'time_taken',
+            'answers__question__text', 'answers__question__order', 'answers__selected_option__text', 'answers__is_correct',
+        )
+        .iterator(chunk_size=2000)
+    )
+    for attempt_id, quiz, user, completed_at, score, max_score, time_taken, question, order, option, is_correct in rows:
+        yield writer.writerow([
+            attempt_id, quiz, user, completed_at.isoformat(), score, max_score,
+            int(time_taken.total_seconds()) if time_taken is not None else '',
+            question or '', order or '', option or '', '' if is_correct is None else int(is_correct),
+        ])
+
+
+def set_active(quizzes, active):
+    """Activate or deactivate quizzes with one UPDATE, returns the number of quizzes changed."""
+    # update() skips auto_now, updated_at is the validator of the quiz pages (quiz/conditional.py)
+    return quizzes.exclude(is_active=active).update(is_active=active, updated_at=timezone.now())
+
+
+def delete_attempts(attempts):
+    """
+    Delete attempts and their answers, returns the number of attempts deleted. The leaderboard
+    entries of the users and quizzes concerned are recounted and their analytics reset.
+    """
+    with transaction.atomic():
+        user_ids = list(attempts.order_by().values_list('user_id', flat=True).distinct())
+        quiz_ids = list(attempts.order_by().values_list('quiz_id', flat=True).distinct())
+        # the answers go with one DELETE per batch of attempt ids, only the ids are loaded
+        _, deleted = attempts.select_related(None).only('id').delete()
+        leaderboard.recount(user_ids, quiz_ids)
+        analytics.reset(quiz_ids)
+    return deleted.get(QuizAttempt._meta.label, 0)
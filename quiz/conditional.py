@@ -0,0 +1,147 @@
+"""
+Conditional GET (ETag / Last-Modified, answered with 304 Not Modified) for the quiz pages.
+
+    @method_decorator(conditional.quiz_detail, name='get')
+    class QuizDetailView(DetailView): ...
+
+Each page has a validator that runs a single query (index lookups only, no rendering) and returns
+(last_modified, key). The ETag hashes the key together with the path and query string and the
+user's identity, so per-user pages never match another user's copy. Last-Modified can't tell users
+apart, it is only sent to anonymous visitors. Pages with pending flash messages are always rendered.
+
+Quiz.updated_at is moved forward by everything the quiz pages show: quiz edits (auto_now), new
+questions (Quiz.allocate_question_orders), ratings (Quiz.apply_rating), question/option edits,
+reorders and category renames (quiz/signals.py, quiz/question_bank.py).
+"""
+import datetime
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import Category, LeaderboardEntry, Quiz, QuizAttempt, QuizLeaderboardEntry
+
+_QUIZ = Quiz._meta.db_table
+_ATTEMPT = QuizAttempt._meta.db_table
+
+# max() is a seek on quiz_active_updated_idx, count(*) a scan of the same (covering) index; the
+# category names are in the key because the list's filter shows them, the table is tiny
+_LIST_SQL = f"""
+    SELECT (SELECT max(updated_at) FROM {_QUIZ} WHERE is_active),
+           (SELECT count(*) FROM {_QUIZ} WHERE is_active),
+           (SELECT group_concat(id || ':' || name, char(10)) FROM {Category._meta.db_table}),
+           (SELECT count(*) FROM {_ATTEMPT} WHERE user_id = %s)
+"""
+
+_DETAIL_SQL = f'SELECT updated_at FROM {_QUIZ} WHERE id = %s AND is_active'
+
+# the newest attempt by rowid, the entry ids change when manage.py rebuild_leaderboards or a recount
+# recreates entries, their number when a recount drops users left without attempts
+_LEADERBOARD_SQL = f"""
+    SELECT (SELECT completed_at FROM {_ATTEMPT} ORDER BY id DESC LIMIT 1),
+           (SELECT max(id) FROM {_ATTEMPT}),
+           (SELECT max(id) FROM {LeaderboardEntry._meta.db_table}),
+           (SELECT count(*) FROM {LeaderboardEntry._meta.db_table})
+"""
+
+_QUIZ_LEADERBOARD_SQL = f"""
+    SELECT quiz.updated_at,
+           (SELECT completed_at FROM {_ATTEMPT} WHERE quiz_id = quiz.id ORDER BY id DESC LIMIT 1),
+           (SELECT max(id) FROM {_ATTEMPT} WHERE quiz_id = quiz.id),
+           (SELECT max(id) FROM {QuizLeaderboardEntry._meta.db_table})
+    FROM {_QUIZ} quiz WHERE quiz.id = %s
+"""
+
+
+def _fetch(sql, params=()):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def _datetime(value):
+    # raw SQLite values are naive UTC, strings when they come out of an aggregate
+    if value is None:
+        return None
+    if not isinstance(value, datetime.datetime):
+        value = parse_datetime(value)
+    return value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value
+
+
+def _latest(*values):
+    values = [_datetime(value) for value in values if value is not None]
+    return max(values) if values else None
+
+
+def quiz_list_validators(request):
+    modified, count, categories, attempted = _fetch(_LIST_SQL, [request.user.pk])
+    return _datetime(modified), (modified, count, categories, attempted)
+
+
+def quiz_detail_validators(request, pk):
+    row = _fetch(_DETAIL_SQL, [pk])
+    if row is None:
+        return None
+    return _datetime(row[0]), row
+
+
+def leaderboard_validators(request, quiz_id=None):
+    if quiz_id is None:
+        row = _fetch(_LEADERBOARD_SQL)
+        return _datetime(row[0]), row
+    row = _fetch(_QUIZ_LEADERBOARD_SQL, [quiz_id])
+    if row is None:
+        return None
+    return _latest(row[0], row[1]), row
+
+
+def conditional_page(validators):
+    """
+    View decorator (wrap CBVs with method_decorator on 'get'). `validators(request, *args, **kwargs)`
+    returns (last_modified, key) or None to always render; it runs once per request. Async views
+    (quiz/async_views.py) get their validators and user loaded in a thread before condition() asks.
+    """
+    def get_validators(request, *args, **kwargs):
+        if not hasattr(request, '_page_validators'):
+            # a 304 would leave the flash messages unshown
+            request._page_validators = None if len(get_messages(request)) else validators(request, *args, **kwargs)
+        return request._page_validators
+
+    def etag(request, *args, **kwargs):
+        found = get_validators(request, *args, **kwargs)
+        if found is None:
+            return None
+        user = request.user
+        key = (request.get_full_path(), user.pk, user.is_staff, found[1])
+        return hashlib.md5(repr(key).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        found = get_validators(request, *args, **kwargs)
+        if found is None or request.user.is_authenticated:
+            return None
+        return found[0]
+
+    def decorator(view):
+        # no-cache: browsers keep the page but revalidate it every time instead of guessing a lifetime
+        conditional_view = cache_control(no_cache=True)(condition(etag_func=etag, last_modified_func=last_modified)(view))
+        if not iscoroutinefunction(view):
+            return conditional_view
+
+        @wraps(view)
+        async def async_view(request, *args, **kwargs):
+            # condition() calls etag()/last_modified() synchronously, they must not hit the database
+            request.user = await request.auser()
+            await sync_to_async(get_validators)(request, *args, **kwargs)
+            return await conditional_view(request, *args, **kwargs)
+        return async_view
+    return decorator
+
+
+quiz_list = conditional_page(quiz_list_validators)
+quiz_detail = conditional_page(quiz_detail_validators)
+leaderboard = conditional_page(leaderboard_validators)
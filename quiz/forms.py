@@ -1,5 +1,6 @@
 from django import forms
 from .models import Quiz, Question, Option, Category, Rating
+from . import question_bank
 
 class StyledFormMixin:
     def __init__(self, *args, **kwargs):
@@ -88,7 +89,8 @@ class TakeQuizForm(forms.Form):
         self.question = kwargs.pop('question')
         super().__init__(*args, **kwargs)
         
-        choices = [(option.id, option.text) for option in self.question.options.all()]
+        # question is a SnapshotQuestion (quiz/snapshot.py), its options are already loaded
+        choices = [(option.id, option.text) for option in self.question.options]
         self.fields['answer'] = forms.ChoiceField(
             choices=choices,
             widget=forms.RadioSelect,
@@ -125,3 +127,45 @@ class QuestionWithOptionsForm(forms.Form):
             label="Correct Option"
         )
 
+
+
+class QuizImportForm(StyledFormMixin, forms.Form):
+    file = forms.FileField(label="File", help_text="CSV (.csv) or JSON Lines (.json/.jsonl), as produced by the export")
+    title = forms.CharField(label="Title", max_length=200, required=False, help_text="For a new quiz, defaults to the title in a JSON file")
+    category = forms.ModelChoiceField(label="Category", queryset=Category.objects.all(), required=False)
+
+    def __init__(self, *args, **kwargs):
+        # quiz: append to this quiz, None: create a new one
+        self.quiz = kwargs.pop('quiz', None)
+        super().__init__(*args, **kwargs)
+        if self.quiz is not None:
+            del self.fields['title']
+            del self.fields['category']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload is None:
+            return cleaned_data
+        self.format = question_bank.detect_format(upload.name)
+        if self.format is None:
+            self.add_error('file', "Upload a .csv or .json/.jsonl file.")
+            return cleaned_data
+        try:
+            self.question_count = question_bank.validate(upload, self.format)
+        except question_bank.QuestionBankError as e:
+            for error in e.errors:
+                self.add_error('file', error)
+            return cleaned_data
+        details = question_bank.read_quiz_header(upload, self.format)
+        time_limit = details.get('time_limit')
+        self.quiz_details = {
+            'description': str(details.get('description') or ''),
+            'time_limit': time_limit if isinstance(time_limit, int) and time_limit > 0 else None,
+        }
+        if self.quiz is None and not cleaned_data.get('title'):
+            title = str(details.get('title') or '').strip()[:200]
+            if not title:
+                self.add_error('title', "Enter a title, the file doesn't contain one.")
+            cleaned_data['title'] = title
+        return cleaned_data
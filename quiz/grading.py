@@ -0,0 +1,111 @@
+"""
+Batched grading engine.
+
+grade_answers() scores a whole attempt with a single Option query and record_attempt() writes the
+result with one INSERT for the attempt and one bulk_create for its answers. Neither needs a request, so
+they can be called from views, management commands, tests and benchmarks alike. finish_attempt()
+is the way a user's attempt ends, from the quiz pages or the attempt sweeper (quiz/sweeper.py).
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.mail import queue_mail
+
+from . import leaderboard
+from .models import Option, QuizAttempt, UserAnswer
+from .snapshot import get_quiz_snapshot
+
+GradedAnswer = namedtuple('GradedAnswer', ['question_id', 'option_id', 'is_correct', 'points'])
+GradeResult = namedtuple('GradeResult', ['score', 'max_score', 'answers'])
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def grade_answers(snapshot, answers):
+    """
+    Score answers against a QuizSnapshot.
+    answers maps question id -> selected option id, ints or strings (as stored in the session).
+    Options that don't exist or don't belong to their question are rejected (not recorded).
+    """
+    answers = {str(question_id): option_id for question_id, option_id in answers.items()}
+    selected = {}
+    for question in snapshot.questions:
+        option_id = _to_id(answers.get(str(question.id)))
+        if option_id is not None:
+            selected[question.id] = option_id
+
+    # one query for every selected option, the DB (not the cached snapshot) decides what is correct
+    options = {
+        option['id']: option
+        for option in Option.objects.filter(id__in=selected.values()).values('id', 'question_id', 'is_correct')
+    }
+
+    score = 0
+    graded = []
+    for question in snapshot.questions:
+        option = options.get(selected.get(question.id))
+        if option is None or option['question_id'] != question.id:
+            continue
+        if option['is_correct']:
+            score += question.points
+        graded.append(GradedAnswer(question.id, option['id'], option['is_correct'], question.points))
+    return GradeResult(score=score, max_score=snapshot.max_score, answers=graded)
+
+
+def record_attempt(user, quiz, result, time_taken=None):
+    """Save a graded attempt (a GradeResult) as the QuizAttempt with its UserAnswer rows, returns the attempt."""
+    # writes only: grade before opening the transaction, which takes SQLite's write lock up front
+    with transaction.atomic():
+        attempt = QuizAttempt.objects.create(
+            user=user,
+            quiz=quiz,
+            score=result.score,
+            max_score=result.max_score,
+            time_taken=time_taken,
+        )
+        UserAnswer.objects.bulk_create([
+            UserAnswer(
+                attempt=attempt,
+                question_id=answer.question_id,
+                selected_option_id=answer.option_id,
+                is_correct=answer.is_correct,
+            )
+            for answer in result.answers
+        ])
+        leaderboard.record_attempt(attempt)
+    return attempt
+
+
+def finish_attempt(user, quiz, answers, started_at, finished_at=None):
+    """
+    Score and save a finished attempt and queue the result email, returns the attempt, or None when
+    the user already has one (unique_quiz_attempt constraint). The time taken is capped at the quiz's
+    time limit.
+    """
+    time_taken = (finished_at or timezone.now()) - started_at
+    if quiz.time_limit:
+        time_taken = min(time_taken, timedelta(minutes=quiz.time_limit))
+    # the snapshot (on a cache miss) and the Option lookup run before the write lock is taken
+    result = grade_answers(get_quiz_snapshot(quiz), answers)
+    try:
+        with transaction.atomic():
+            attempt = record_attempt(user, quiz, result, time_taken=time_taken)
+            # delivered by manage.py send_queued_mail
+            queue_mail(
+                'Quiz Result',
+                f'Your result for {quiz.title}:\nScore: {attempt.score}/{attempt.max_score}\nTime taken: {attempt.time_taken}',
+                settings.DEFAULT_FROM_EMAIL,
+                [user.email],
+            )
+    except IntegrityError:
+        return None
+    return attempt
@@ -0,0 +1,125 @@
+"""
+Materialized leaderboards.
+
+LeaderboardEntry (per-user totals) and QuizLeaderboardEntry (per quiz/user best score and time)
+are updated as attempts are recorded, so the leaderboard pages read a small indexed table
+instead of grouping the whole QuizAttempt table.
+"""
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from .models import LeaderboardEntry, QuizAttempt, QuizLeaderboardEntry
+
+
+def _update_or_insert(queryset, changes, create):
+    # UPDATE first, INSERT when there is no row yet, and retry the UPDATE if a concurrent request won the INSERT
+    if queryset.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            create()
+    except IntegrityError:
+        queryset.update(**changes)
+
+
+def record_attempt(attempt):
+    """Add a freshly saved QuizAttempt to both leaderboards, call it in the attempt's transaction."""
+    _update_or_insert(
+        LeaderboardEntry.objects.filter(user_id=attempt.user_id),
+        {'total_score': F('total_score') + attempt.score, 'total_attempts': F('total_attempts') + 1},
+        lambda: LeaderboardEntry.objects.create(user_id=attempt.user_id, total_score=attempt.score, total_attempts=1),
+    )
+
+    changes = {
+        'best_score': Greatest(F('best_score'), Value(attempt.score)),
+        'max_score': attempt.max_score,
+        'completed_at': attempt.completed_at,
+    }
+    if attempt.time_taken is not None:
+        changes['best_time'] = Coalesce(Least(F('best_time'), Value(attempt.time_taken)), Value(attempt.time_taken))
+    _update_or_insert(
+        QuizLeaderboardEntry.objects.filter(quiz_id=attempt.quiz_id, user_id=attempt.user_id),
+        changes,
+        lambda: QuizLeaderboardEntry.objects.create(
+            quiz_id=attempt.quiz_id,
+            user_id=attempt.user_id,
+            best_score=attempt.score,
+            max_score=attempt.max_score,
+            best_time=attempt.time_taken,
+            completed_at=attempt.completed_at,
+        ),
+    )
+
+
+def get_user_rank(user):
+    """1-based rank on the overall leaderboard, or None if the user has no attempts."""
+    entry = LeaderboardEntry.objects.filter(user=user).first()
+    if entry is None:
+        return None
+    ahead = LeaderboardEntry.objects.filter(
+        Q(total_score__gt=entry.total_score) | Q(total_score=entry.total_score, user_id__lt=entry.user_id)
+    ).count()
+    return ahead + 1
+
+
+def get_quiz_rank(quiz_id, user):
+    """1-based rank on a quiz leaderboard, or None if the user hasn't taken the quiz."""
+    entry = QuizLeaderboardEntry.objects.filter(quiz_id=quiz_id, user=user).first()
+    if entry is None:
+        return None
+    # same order as the leaderboard page: '-best_score', 'best_time', 'user_id' (SQLite sorts NULL times first)
+    if entry.best_time is None:
+        better_time = Q(best_time__isnull=True, user_id__lt=entry.user_id)
+    else:
+        better_time = (
+            Q(best_time__isnull=True)
+            | Q(best_time__lt=entry.best_time)
+            | Q(best_time=entry.best_time, user_id__lt=entry.user_id)
+        )
+    ahead = QuizLeaderboardEntry.objects.filter(quiz_id=quiz_id).filter(
+        Q(best_score__gt=entry.best_score) | (Q(best_score=entry.best_score) & better_time)
+    ).count()
+    return ahead + 1
+
+
+def _totals():
+    return QuizAttempt.objects.values('user_id').annotate(total_score=Sum('score'), total_attempts=Count('id')).order_by()
+
+
+def _bests():
+    return (
+        QuizAttempt.objects.values('quiz_id', 'user_id')
+        .annotate(best_score=Max('score'), max_score=Max('max_score'), best_time=Min('time_taken'), completed_at=Max('completed_at'))
+        .order_by()
+    )
+
+
+def rebuild(batch_size=1000):
+    """Recompute both leaderboards from QuizAttempt, returns (users, quiz entries) written."""
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        QuizLeaderboardEntry.objects.all().delete()
+        users = _bulk_insert(LeaderboardEntry, _totals(), batch_size)
+        entries = _bulk_insert(QuizLeaderboardEntry, _bests(), batch_size)
+    return users, entries
+
+
+def recount(user_ids, quiz_ids, batch_size=1000):
+    """Recompute the entries of some users and quizzes, e.g. after their attempts were deleted."""
+    with transaction.atomic():
+        LeaderboardEntry.objects.filter(user_id__in=user_ids).delete()
+        QuizLeaderboardEntry.objects.filter(quiz_id__in=quiz_ids).delete()
+        _bulk_insert(LeaderboardEntry, _totals().filter(user_id__in=user_ids), batch_size)
+        _bulk_insert(QuizLeaderboardEntry, _bests().filter(quiz_id__in=quiz_ids), batch_size)
+
+
+def _bulk_insert(model, rows, batch_size):
+    written = 0
+    rows = rows.iterator(chunk_size=batch_size)
+    while batch := [model(**row) for row in islice(rows, batch_size)]:
+        model.objects.bulk_create(batch)
+        written += len(batch)
+    return written
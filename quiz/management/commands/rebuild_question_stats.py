@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from quiz import analytics
+
+
+class Command(BaseCommand):
+    help = "Recount the per-question analytics tables from QuizAttempt/UserAnswer (needed after deleting attempts)"
+
+    def handle(self, *args, **options):
+        quizzes = analytics.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt question stats for {quizzes} quizzes.'))
@@ -0,0 +1,39 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from quiz.models import Quiz, Rating, RATING_SCORES
+
+
+class Command(BaseCommand):
+    help = "Rebuild the stored rating aggregates (sum, count, 1-7 histogram) on every quiz from the Rating table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        histograms = defaultdict(lambda: dict.fromkeys(RATING_SCORES, 0))
+        for row in Rating.objects.values('quiz_id', 'score').annotate(total=Count('id')).order_by():
+            histograms[row['quiz_id']][row['score']] = row['total']
+
+        fields = ['rating_sum', 'rating_count'] + [f'rating_{score}' for score in RATING_SCORES]
+        now = timezone.now()
+        changed = []
+        for quiz in Quiz.objects.only('id', *fields):
+            histogram = histograms.get(quiz.id, dict.fromkeys(RATING_SCORES, 0))
+            stored = [getattr(quiz, field) for field in fields]
+            quiz.rating_sum = sum(score * total for score, total in histogram.items())
+            quiz.rating_count = sum(histogram.values())
+            for score, total in histogram.items():
+                setattr(quiz, f'rating_{score}', total)
+            if [getattr(quiz, field) for field in fields] != stored:
+                # bulk_update skips auto_now, updated_at is the validator of the quiz pages
+                quiz.updated_at = now
+                changed.append(quiz)
+
+        # the cached quiz cards are keyed on the aggregates, the snapshot version stays as it is
+        Quiz.objects.bulk_update(changed, fields + ['updated_at'], batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates, {len(changed)} quizzes changed.'))
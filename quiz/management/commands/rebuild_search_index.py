@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from quiz import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text quiz search index (needed after bulk imports that skip the model signals)"
+
+    def handle(self, *args, **options):
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} quizzes.'))
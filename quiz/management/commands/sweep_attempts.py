@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from quiz import sweeper
+
+
+class Command(BaseCommand):
+    help = (
+        "Finish timed-out quiz attempts (the answers given so far are scored), drop the progress of attempts "
+        "abandoned on quizzes without time limit, then delete the expired sessions, in small batches so the "
+        "database write lock is never held for long. Run it from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='attempts loaded per batch')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='sessions deleted per DELETE')
+
+    def handle(self, *args, **options):
+        finalized, discarded, abandoned = sweeper.finalize_timed_out(batch_size=options['batch_size'])
+        sessions = sweeper.purge_expired_sessions(chunk_size=options['chunk_size'])
+        sessions = 'cleared the expired sessions' if sessions is None else f'deleted {sessions} expired sessions'
+        self.stdout.write(self.style.SUCCESS(
+            f'Finished {finalized} timed-out attempts ({discarded} already completed), '
+            f'dropped {abandoned} abandoned attempts, {sessions}.'
+        ))
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:51
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Quiz = apps.get_model('quiz', 'Quiz')
+    Rating = apps.get_model('quiz', 'Rating')
+    quizzes = {}
+    for row in Rating.objects.values('quiz_id', 'score').annotate(total=Count('id')).order_by():
+        quiz = quizzes.setdefault(row['quiz_id'], Quiz(pk=row['quiz_id']))
+        setattr(quiz, f"rating_{row['score']}", row['total'])
+        quiz.rating_sum += row['score'] * row['total']
+        quiz.rating_count += row['total']
+    fields = ['rating_sum', 'rating_count'] + [f'rating_{score}' for score in range(1, 8)]
+    Quiz.objects.bulk_update(quizzes.values(), fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_6',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_7',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
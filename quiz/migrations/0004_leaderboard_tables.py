@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def populate_leaderboards(apps, schema_editor):
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    LeaderboardEntry = apps.get_model('quiz', 'LeaderboardEntry')
+    QuizLeaderboardEntry = apps.get_model('quiz', 'QuizLeaderboardEntry')
+    totals = QuizAttempt.objects.values('user_id').annotate(
+        total_score=Sum('score'), total_attempts=Count('id')
+    ).order_by()
+    LeaderboardEntry.objects.bulk_create([LeaderboardEntry(**row) for row in totals], batch_size=1000)
+    bests = QuizAttempt.objects.values('quiz_id', 'user_id').annotate(
+        best_score=Max('score'), max_score=Max('max_score'), best_time=Min('time_taken'), completed_at=Max('completed_at')
+    ).order_by()
+    QuizLeaderboardEntry.objects.bulk_create([QuizLeaderboardEntry(**row) for row in bests], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0003_quiz_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_score', models.PositiveIntegerField(default=0)),
+                ('total_attempts', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-total_score', 'user_id'],
+                'indexes': [models.Index(fields=['-total_score', 'user'], name='leaderboard_rank_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizLeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_score', models.PositiveIntegerField(default=0)),
+                ('max_score', models.PositiveIntegerField(default=0)),
+                ('best_time', models.DurationField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField()),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='quiz.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-best_score', 'best_time', 'user_id'],
+                'indexes': [models.Index(fields=['quiz', '-best_score', 'best_time', 'user'], name='quiz_leaderboard_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('quiz', 'user'), name='unique_quiz_leaderboard_user')],
+            },
+        ),
+        migrations.RunPython(populate_leaderboards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def remove_duplicate_attempts(apps, schema_editor):
+    # keep the first attempt per (user, quiz) so the unique constraint can be added
+    QuizAttempt = apps.get_model('quiz', 'QuizAttempt')
+    LeaderboardEntry = apps.get_model('quiz', 'LeaderboardEntry')
+    QuizLeaderboardEntry = apps.get_model('quiz', 'QuizLeaderboardEntry')
+    duplicates = QuizAttempt.objects.values('user_id', 'quiz_id').annotate(first_id=Min('id'), total=Count('id')).filter(total__gt=1).order_by()
+    for row in duplicates:
+        QuizAttempt.objects.filter(user_id=row['user_id'], quiz_id=row['quiz_id']).exclude(id=row['first_id']).delete()
+        # refresh the materialized leaderboards for this user
+        totals = QuizAttempt.objects.filter(user_id=row['user_id']).aggregate(total_score=Sum('score'), total_attempts=Count('id'))
+        LeaderboardEntry.objects.filter(user_id=row['user_id']).update(**totals)
+        best = QuizAttempt.objects.filter(user_id=row['user_id'], quiz_id=row['quiz_id']).aggregate(
+            best_score=Max('score'), max_score=Max('max_score'), best_time=Min('time_taken'), completed_at=Max('completed_at')
+        )
+        QuizLeaderboardEntry.objects.filter(user_id=row['user_id'], quiz_id=row['quiz_id']).update(**best)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_attempt_progress'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['quiz', 'order'], name='question_quiz_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at'], name='quiz_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', '-score', 'time_taken'], name='attempt_quiz_ranking_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_attempts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='quizattempt',
+            constraint=models.UniqueConstraint(fields=('user', 'quiz'), name='unique_quiz_attempt'),
+        ),
+    ]
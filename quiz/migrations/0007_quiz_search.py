@@ -0,0 +1,51 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_index(apps, schema_editor):
+    schema_editor.execute("""
+        INSERT INTO quiz_search (rowid, title, description, category, questions)
+        SELECT quiz.id, quiz.title, quiz.description, coalesce(category.name, ''),
+               coalesce((SELECT group_concat(question.text, char(10)) FROM quiz_question question
+                         WHERE question.quiz_id = quiz.id), '')
+        FROM quiz_quiz quiz
+        LEFT JOIN quiz_category category ON category.id = quiz.category_id
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        # SQLite FTS5 table behind quiz.search, rowid = quiz id
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE quiz_search USING fts5("
+            "title, description, category, questions, tokenize = 'unicode61 remove_diacritics 2')",
+            "DROP TABLE quiz_search",
+        ),
+        # rank = bm25 with column weights title, description, category, questions
+        migrations.RunSQL(
+            "INSERT INTO quiz_search (quiz_search, rank) VALUES ('rank', 'bm25(10.0, 4.0, 3.0, 1.0)')",
+            migrations.RunSQL.noop,
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='QuizSearchEntry',
+            fields=[
+                ('quiz', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='quiz.quiz')),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+                ('category', models.TextField()),
+                ('questions', models.TextField()),
+                ('document', models.TextField(db_column='quiz_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'quiz_search',
+                'managed': False,
+            },
+        ),
+    ]
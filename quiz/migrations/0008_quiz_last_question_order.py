@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:13
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_last_question_order(apps, schema_editor):
+    Quiz = apps.get_model('quiz', 'Quiz')
+    Question = apps.get_model('quiz', 'Question')
+    highest = Question.objects.filter(quiz=OuterRef('pk')).order_by().values('quiz').annotate(highest=Max('order')).values('highest')
+    Quiz.objects.update(last_question_order=Coalesce(Subquery(highest), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_quiz_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='last_question_order',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_last_question_order, migrations.RunPython.noop),
+    ]
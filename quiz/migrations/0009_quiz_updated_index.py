@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_quiz_last_question_order'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['updated_at'], name='quiz_active_updated_idx'),
+        ),
+    ]
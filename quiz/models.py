@@ -1,10 +1,18 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Max
+from django.db.models import F
+from django.utils import timezone
 
 User = get_user_model()
 
+RATING_SCORES = range(1, 8)
+
+# slack after a quiz's time limit for the round trip of the last answer
+ATTEMPT_GRACE = timedelta(seconds=30)
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -23,19 +31,87 @@ class Quiz(models.Model):
     time_limit = models.PositiveIntegerField(help_text="Time limit in minutes", null=True, blank=True)
     max_questions = models.PositiveIntegerField(default=50)
     min_questions = models.PositiveIntegerField(default=5)
+    # stored rating aggregates, kept in sync by RateQuizView (rebuild: manage.py rebuild_rating_aggregates)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    rating_6 = models.PositiveIntegerField(default=0)
+    rating_7 = models.PositiveIntegerField(default=0)
+    # highest question order handed out so far, see allocate_question_orders()
+    last_question_order = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # partial index: Django renders filter(is_active=True) as a bare "WHERE is_active" on SQLite
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True), name='quiz_active_created_idx'),
+            # newest change of the quiz list, for its ETag/Last-Modified (quiz/conditional.py)
+            models.Index(fields=['updated_at'], condition=models.Q(is_active=True), name='quiz_active_updated_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
     @property
     def average_rating(self):
-        ratings = self.ratings.all()
-        if not ratings:
+        if not self.rating_count:
             return 0
-        return sum(rating.score for rating in ratings) / len(ratings)
+        return self.rating_sum / self.rating_count
+    
+    @property
+    def rating_histogram(self):
+        # number of ratings for each score 1..7
+        return [getattr(self, f'rating_{score}') for score in RATING_SCORES]
+    
+    def apply_rating(self, score, previous_score=None):
+        """
+        Add a new rating (previous_score=None) or change an existing one to the stored aggregates.
+        Uses F() expressions so concurrent raters don't overwrite each other, call it inside the
+        same transaction that writes the Rating row.
+        """
+        if score == previous_score:
+            return
+        # updated_at too: the aggregates are part of the quiz pages' validators
+        changes = {f'rating_{score}': F(f'rating_{score}') + 1, 'updated_at': timezone.now()}
+        if previous_score is None:
+            changes['rating_sum'] = F('rating_sum') + score
+            changes['rating_count'] = F('rating_count') + 1
+        else:
+            changes['rating_sum'] = F('rating_sum') + (score - previous_score)
+            changes[f'rating_{previous_score}'] = F(f'rating_{previous_score}') - 1
+        Quiz.objects.filter(pk=self.pk).update(**changes)
+    
+    def remove_rating(self, score):
+        """Take a deleted rating out of the stored aggregates (the post_delete signal of Rating)."""
+        Quiz.objects.filter(pk=self.pk).update(**{
+            f'rating_{score}': F(f'rating_{score}') - 1,
+            'rating_sum': F('rating_sum') - score,
+            'rating_count': F('rating_count') - 1,
+            'updated_at': timezone.now(),
+        })
+    
+    def time_is_up(self, started_at, now=None):
+        """Whether an attempt started at `started_at` is past the time limit (and ATTEMPT_GRACE)."""
+        if not self.time_limit:
+            return False
+        return (now or timezone.now()) > started_at + timedelta(minutes=self.time_limit) + ATTEMPT_GRACE
+    
+    def allocate_question_orders(self, count=1):
+        """
+        Reserve `count` consecutive order numbers for new questions, returns them as a range.
+        The counter is bumped with an F() update, which takes the write lock, so concurrent
+        authors (or imports) never get the same numbers. Works for bulk_create batches too.
+        The same UPDATE moves updated_at forward, new questions change the quiz pages.
+        """
+        with transaction.atomic(savepoint=False):
+            Quiz.objects.filter(pk=self.pk).update(last_question_order=F('last_question_order') + count, updated_at=timezone.now())
+            last = Quiz.objects.filter(pk=self.pk).values_list('last_question_order', flat=True).get()
+        self.last_question_order = last
+        return range(last - count + 1, last + 1)
 
 class Question(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='questions')
@@ -45,17 +121,17 @@ class Question(models.Model):
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['quiz', 'order'], name='question_quiz_order_idx'),
+        ]
     
     def __str__(self):
         return f"{self.quiz.title} - Q{self.order}: {self.text[:50]}..."
     
     def save(self, *args, **kwargs):
-        # If this is a new question (no pk yet), set the order automatically
+        # If this is a new question (no pk yet), append it to the end of the quiz
         if not self.pk:
-            # Get the current maximum order number for this quiz
-            max_order = Question.objects.filter(quiz=self.quiz).aggregate(Max('order'))['order__max']
-            # If there are no questions yet, start with 1, otherwise increment by 1
-            self.order = (max_order or 0) + 1
+            self.order = self.quiz.allocate_question_orders(1)[0]
         
         super().save(*args, **kwargs)
 
@@ -77,6 +153,15 @@ class QuizAttempt(models.Model):
     
     class Meta:
         ordering = ['-completed_at']
+        constraints = [
+            # one attempt per user and quiz, also the index behind the "already attempted" checks
+            models.UniqueConstraint(fields=['user', 'quiz'], name='unique_quiz_attempt'),
+        ]
+        indexes = [
+            models.Index(fields=['quiz', '-score', 'time_taken'], name='attempt_quiz_ranking_idx'),
+            # a user's history, newest first, paginated by (completed_at, id) keys
+            models.Index(fields=['user', '-completed_at', '-id'], name='attempt_user_history_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.quiz.title} - {self.score}/{self.max_score}"
@@ -103,4 +188,122 @@ class Rating(models.Model):
         unique_together = ('quiz', 'user')
     
     def __str__(self):
-        return f"{self.user.username} - {self.quiz.title} - {self.score}/7"
\ No newline at end of file
+        return f"{self.user.username} - {self.quiz.title} - {self.score}/7"
+
+class LeaderboardEntry(models.Model):
+    # per-user totals over all quizzes, maintained by quiz.leaderboard (rebuild: manage.py rebuild_leaderboards)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='leaderboard_entry')
+    total_score = models.PositiveIntegerField(default=0)
+    total_attempts = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-total_score', 'user_id']
+        indexes = [
+            models.Index(fields=['-total_score', 'user'], name='leaderboard_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.total_score}"
+
+class QuizLeaderboardEntry(models.Model):
+    # best score and best time per (quiz, user), maintained by quiz.leaderboard
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_leaderboard_entries')
+    best_score = models.PositiveIntegerField(default=0)
+    max_score = models.PositiveIntegerField(default=0)
+    best_time = models.DurationField(null=True, blank=True)
+    completed_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-best_score', 'best_time', 'user_id']
+        constraints = [
+            models.UniqueConstraint(fields=['quiz', 'user'], name='unique_quiz_leaderboard_user'),
+        ]
+        indexes = [
+            models.Index(fields=['quiz', '-best_score', 'best_time', 'user'], name='quiz_leaderboard_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.quiz.title} - {self.best_score}/{self.max_score}"
+
+class AttemptProgress(models.Model):
+    # in-progress attempt state, written by quiz.attempt_store (answers: {"<question id>": <option id>})
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attempts_in_progress')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='attempts_in_progress')
+    cursor = models.PositiveIntegerField(default=0)
+    answers = models.JSONField(default=dict)
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'quiz'], name='unique_attempt_progress'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.quiz_id} - question {self.cursor}"
+
+class QuizStats(models.Model):
+    # question analytics watermark per quiz: attempts up to last_attempt_id are counted in the stats tables below (quiz.analytics)
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    last_attempt_id = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.quiz_id} - {self.attempts} attempts"
+
+class ScoreStats(models.Model):
+    # number of counted attempts per score, the top/bottom groups of the discrimination index come from it
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='score_stats')
+    score = models.PositiveIntegerField()
+    attempts = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['quiz', 'score'], name='unique_score_stats'),
+        ]
+    
+    def __str__(self):
+        return f"{self.quiz_id} - score {self.score}: {self.attempts}"
+
+class QuestionStats(models.Model):
+    # answers to a question by attempts with a given score
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='stats')
+    score = models.PositiveIntegerField()
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'score'], name='unique_question_stats'),
+        ]
+    
+    def __str__(self):
+        return f"{self.question_id} - score {self.score}: {self.correct}/{self.answered}"
+
+class OptionStats(models.Model):
+    option = models.OneToOneField(Option, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    picks = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.option_id} - {self.picks} picks"
+
+class QuizSearchEntry(models.Model):
+    """
+    Read-only view of the quiz_search FTS5 table (created by migration 0007, maintained by quiz.search).
+    `document` is FTS5's hidden table column, filtering on it is a MATCH; `rank` is bm25 with the
+    column weights configured on the table.
+    """
+    quiz = models.OneToOneField(Quiz, primary_key=True, db_column='rowid', on_delete=models.DO_NOTHING, db_constraint=False, related_name='search_entry')
+    title = models.TextField()
+    description = models.TextField()
+    category = models.TextField()
+    questions = models.TextField()
+    document = models.TextField(db_column='quiz_search')
+    rank = models.FloatField()
+    
+    class Meta:
+        managed = False
+        db_table = 'quiz_search'
@@ -0,0 +1,282 @@
+"""
+Streaming import/export of a quiz's questions and options.
+
+Two formats, both read and written one question at a time:
+- csv: header row, then `question, points, correct, option_1, option_2, ...` per question, where
+  `correct` is the 1-based number of the correct option ("1;3" if several are correct)
+- json: JSON Lines, an optional first line {"quiz": {"title": ..., "description": ..., "time_limit": ...}}
+  then one {"text": ..., "points": 1, "options": [{"text": ..., "is_correct": true}, ...]} per line
+
+Imports are validated in full with validate() before anything is written, then written by
+import_questions() with bulk_create in batches. reorder_questions() applies a new question order.
+"""
+import codecs
+import csv
+import json
+from collections import namedtuple
+from itertools import groupby, islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.streaming import Echo
+
+from . import search
+from .models import Option, Question, Quiz
+from .snapshot import bump_quiz_version
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'json': ('application/x-ndjson', 'jsonl'),
+}
+CSV_HEADER = ['question', 'points', 'correct', 'option_1', 'option_2', 'option_3', 'option_4']
+BATCH_SIZE = 500
+MAX_ERRORS = 20
+OPTION_MAX_LENGTH = Option._meta.get_field('text').max_length
+
+ParsedQuestion = namedtuple('ParsedQuestion', ['line', 'text', 'points', 'options'])  # options: ((text, is_correct), ...)
+
+
+class QuestionBankError(Exception):
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+
+def detect_format(filename):
+    if filename.lower().endswith('.csv'):
+        return 'csv'
+    if filename.lower().endswith(('.json', '.jsonl', '.ndjson')):
+        return 'json'
+    return None
+
+
+# --- reading ----------------------------------------------------------------
+
+def _lines(file):
+    # the uploaded file is read line by line (decoded lazily), never as a whole
+    return codecs.iterdecode(file, 'utf-8-sig')
+
+
+def _read_csv(file):
+    reader = csv.reader(_lines(file))
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        if reader.line_num == 1 and row[0].strip().lower() == CSV_HEADER[0]:
+            continue
+        yield reader.line_num, {'text': row[0], 'points': row[1:2], 'correct': row[2:3], 'options': row[3:]}
+
+
+def _read_json(file):
+    for line, text in enumerate(_lines(file), start=1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f'line {line}: invalid JSON ({e})')
+        if not isinstance(data, dict):
+            raise ValueError(f'line {line}: expected a JSON object')
+        if 'quiz' in data:
+            yield line, data
+            continue
+        options = data.get('options')
+        if not isinstance(options, list) or not all(isinstance(option, dict) for option in options):
+            raise ValueError(f'line {line}: "options" must be a list of objects')
+        yield line, {
+            'text': data.get('text'),
+            'points': data.get('points', 1),
+            'options': [option.get('text') for option in options],
+            'correct': [bool(option.get('is_correct')) for option in options],
+        }
+
+
+def _clean(line, raw):
+    """Check one raw question, returns a ParsedQuestion or raises ValueError."""
+    text = str(raw['text'] or '').strip()
+    if not text:
+        raise ValueError(f'line {line}: the question text is empty')
+
+    points = raw['points']
+    if isinstance(points, list):
+        # csv cell, blank means the default of 1 point
+        points = points[0].strip() if points and points[0].strip() else 1
+    try:
+        points = int(points)
+    except (TypeError, ValueError):
+        points = 0
+    if points < 1:
+        raise ValueError(f'line {line}: points must be a positive whole number')
+
+    options = [str(option or '').strip() for option in raw['options']]
+    while options and not options[-1]:
+        options.pop()
+    if len(options) < 2 or not all(options):
+        raise ValueError(f'line {line}: a question needs at least two non-empty options')
+    if any(len(option) > OPTION_MAX_LENGTH for option in options):
+        raise ValueError(f'line {line}: options can be at most {OPTION_MAX_LENGTH} characters')
+
+    correct = raw['correct']
+    if correct and isinstance(correct[0], str):
+        # csv: "2" or "1;3"
+        try:
+            numbers = {int(number) for number in correct[0].replace(',', ';').split(';') if number.strip()}
+        except ValueError:
+            raise ValueError(f'line {line}: "correct" must be option numbers like 2 or 1;3')
+        if not numbers or not all(1 <= number <= len(options) for number in numbers):
+            raise ValueError(f'line {line}: "correct" must be between 1 and {len(options)}')
+        correct = [number in numbers for number in range(1, len(options) + 1)]
+    if not any(correct[:len(options)]):
+        raise ValueError(f'line {line}: no correct option')
+
+    return ParsedQuestion(line, text, points, tuple(zip(options, correct)))
+
+
+def _parse(file, fmt):
+    reader = _read_csv if fmt == 'csv' else _read_json
+    for line, raw in reader(file):
+        if 'quiz' in raw:
+            continue
+        yield line, raw
+
+
+def read_quiz_header(file, fmt):
+    """The quiz details from the first line of a JSON file ({} for CSV or when missing)."""
+    if fmt != 'json':
+        return {}
+    file.seek(0)
+    for text in _lines(file):
+        if text.strip():
+            try:
+                data = json.loads(text)
+            except ValueError:
+                return {}
+            quiz = data.get('quiz') if isinstance(data, dict) else None
+            return quiz if isinstance(quiz, dict) else {}
+    return {}
+
+
+def validate(file, fmt):
+    """Check the whole file without writing anything, returns the number of questions or raises QuestionBankError."""
+    file.seek(0)
+    count = 0
+    errors = []
+    try:
+        for line, raw in _parse(file, fmt):
+            try:
+                _clean(line, raw)
+                count += 1
+            except ValueError as e:
+                errors.append(str(e))
+                if len(errors) >= MAX_ERRORS:
+                    errors.append('too many errors, stopped checking')
+                    break
+    except UnicodeDecodeError:
+        errors.append('the file is not UTF-8 encoded')
+    except (ValueError, csv.Error) as e:
+        # broken JSON line or CSV quoting, the rest of the file can't be trusted
+        errors.append(str(e))
+    if not errors and not count:
+        errors.append('the file contains no questions')
+    if errors:
+        raise QuestionBankError(errors)
+    return count
+
+
+def iter_questions(file, fmt):
+    """ParsedQuestion for each question of an already validated file."""
+    file.seek(0)
+    for line, raw in _parse(file, fmt):
+        yield _clean(line, raw)
+
+
+def import_questions(quiz, questions, batch_size=BATCH_SIZE):
+    """
+    Append questions (ParsedQuestion) to a quiz with one bulk_create per batch of questions and
+    one for their options, call it inside transaction.atomic(). Returns the number of questions.
+    """
+    written = 0
+    questions = iter(questions)
+    while batch := list(islice(questions, batch_size)):
+        orders = quiz.allocate_question_orders(len(batch))
+        created = Question.objects.bulk_create([
+            Question(quiz=quiz, text=parsed.text, points=parsed.points, order=order)
+            for order, parsed in zip(orders, batch)
+        ])
+        Option.objects.bulk_create([
+            Option(question=question, text=text, is_correct=is_correct)
+            for question, parsed in zip(created, batch)
+            for text, is_correct in parsed.options
+        ])
+        written += len(batch)
+
+    # bulk_create skips the model signals, refresh the cached snapshot and the search index here
+    quiz_id = quiz.pk
+    transaction.on_commit(lambda: bump_quiz_version(quiz_id))
+    transaction.on_commit(lambda: search.index_quiz(quiz_id))
+    return written
+
+
+def reorder_questions(quiz, question_ids):
+    """
+    Apply a whole new ordering: question_ids lists every question of the quiz once, in the new
+    order. Only the questions that moved are written, with a single bulk_update. Returns how
+    many moved, raises ValueError if the list doesn't match the quiz's questions.
+    """
+    try:
+        question_ids = [int(question_id) for question_id in question_ids]
+    except (TypeError, ValueError):
+        raise ValueError('Question ids must be whole numbers.')
+    with transaction.atomic():
+        current = dict(Question.objects.filter(quiz=quiz).order_by().values_list('id', 'order'))
+        if len(question_ids) != len(current) or set(question_ids) != set(current):
+            raise ValueError('The new order must list every question of the quiz exactly once.')
+        moved = [
+            Question(pk=question_id, order=order)
+            for order, question_id in enumerate(question_ids, start=1)
+            if current[question_id] != order
+        ]
+        Question.objects.bulk_update(moved, ['order'])
+        if moved:
+            # bulk_update skips the model signals
+            quiz_id = quiz.pk
+            Quiz.objects.filter(pk=quiz_id).update(updated_at=timezone.now())
+            transaction.on_commit(lambda: bump_quiz_version(quiz_id))
+    return len(moved)
+
+
+# --- writing ----------------------------------------------------------------
+
+def _questions(quiz):
+    # one LEFT JOIN query read in chunks, grouped back into questions as it streams
+    rows = (
+        Question.objects.filter(quiz=quiz)
+        .order_by('order', 'id', 'options__id')
+        .values_list('id', 'text', 'points', 'options__text', 'options__is_correct')
+        .iterator(chunk_size=2000)
+    )
+    for (question_id, text, points), options in groupby(rows, key=lambda row: row[:3]):
+        yield text, points, [(row[3], row[4]) for row in options if row[3] is not None]
+
+
+def export_csv(quiz):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for text, points, options in _questions(quiz):
+        correct = ';'.join(str(number) for number, (_, is_correct) in enumerate(options, start=1) if is_correct)
+        yield writer.writerow([text, points, correct, *(option for option, _ in options)])
+
+
+def export_json(quiz):
+    yield json.dumps({'quiz': {'title': quiz.title, 'description': quiz.description, 'time_limit': quiz.time_limit}}) + '\n'
+    for text, points, options in _questions(quiz):
+        yield json.dumps({
+            'text': text,
+            'points': points,
+            'options': [{'text': option, 'is_correct': is_correct} for option, is_correct in options],
+        }) + '\n'
+
+
+def export(quiz, fmt):
+    return export_csv(quiz) if fmt == 'csv' else export_json(quiz)
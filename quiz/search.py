@@ -0,0 +1,113 @@
+"""
+Full-text quiz search on an SQLite FTS5 table.
+
+quiz_search has one row per quiz (rowid = quiz id) with the quiz title, description, category
+name and the text of all its questions. It is kept in sync by the signals in quiz/signals.py,
+anything that bypasses them (bulk_create, raw SQL, fixtures) needs `manage.py rebuild_search_index`.
+
+    match = build_match_query(request.GET.get('q', ''))
+    if match:
+        queryset = search(queryset, match).order_by('search_entry__rank')
+        ...
+        found = snippets(match, [quiz.id for quiz in page])
+"""
+import re
+
+from django.db import connection, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Category, Question, Quiz
+
+TABLE = 'quiz_search'
+MAX_TERMS = 8
+SNIPPET_TOKENS = 16
+
+# private-use characters as highlight markers, the text is escaped before they become <mark> tags
+_OPEN, _CLOSE = '\ue000', '\ue001'
+
+_INDEX_SQL = f"""
+    INSERT INTO {TABLE} (rowid, title, description, category, questions)
+    SELECT quiz.id, quiz.title, quiz.description, coalesce(category.name, ''),
+           coalesce((SELECT group_concat(question.text, char(10)) FROM {Question._meta.db_table} question
+                     WHERE question.quiz_id = quiz.id), '')
+    FROM {Quiz._meta.db_table} quiz
+    LEFT JOIN {Category._meta.db_table} category ON category.id = quiz.category_id
+"""
+
+
+def build_match_query(text):
+    """
+    Turn what the user typed into a safe FTS5 query: every word must match (quoted, so FTS
+    syntax like AND/NEAR/column filters is taken literally) and the last one is a prefix.
+    Returns None when there is nothing to search for.
+    """
+    terms = re.findall(r'\w+', text or '')[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+
+def search(queryset, match):
+    """
+    Restrict a Quiz queryset to the matches. The FTS table is joined (it drives the query), order
+    by 'search_entry__rank' for relevance. Don't combine it with aggregates: bm25 can't be
+    evaluated in a GROUP BY.
+    """
+    return queryset.filter(search_entry__document=match)
+
+
+def _marked(text):
+    return mark_safe(escape(text).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>'))
+
+
+def snippets(match, quiz_ids):
+    """
+    Highlighted title and text snippet for each matched quiz id, only run it for the current page.
+    Returns {quiz_id: (title, snippet)}, snippet is None when only the title or category matched.
+    """
+    if not quiz_ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(quiz_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""SELECT rowid, highlight({TABLE}, 0, %s, %s),
+                       snippet({TABLE}, 1, %s, %s, '…', {SNIPPET_TOKENS}),
+                       snippet({TABLE}, 3, %s, %s, '…', {SNIPPET_TOKENS})
+                FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid IN ({placeholders})""",
+            [_OPEN, _CLOSE] * 3 + [match, *quiz_ids],
+        )
+        rows = cursor.fetchall()
+    found = {}
+    for quiz_id, title, description, questions in rows:
+        # prefer the description, fall back to the matching question text
+        body = next((text for text in (description, questions) if _OPEN in text), None)
+        found[quiz_id] = (_marked(title), _marked(body) if body else None)
+    return found
+
+
+def index_quiz(quiz_id):
+    """(Re)index one quiz, removes its row if the quiz no longer exists."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [quiz_id])
+        cursor.execute(_INDEX_SQL + ' WHERE quiz.id = %s', [quiz_id])
+
+
+def index_category(category_id):
+    """Refresh the category name of every quiz in a category after it was renamed."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""UPDATE {TABLE} SET category = coalesce((SELECT name FROM {Category._meta.db_table} WHERE id = %s), '')
+                WHERE rowid IN (SELECT id FROM {Quiz._meta.db_table} WHERE category_id = %s)""",
+            [category_id, category_id],
+        )
+
+
+def rebuild():
+    """Reindex every quiz, returns the number of quizzes indexed."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(_INDEX_SQL)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Category, Quiz, Question, Option, QuizAttempt, Rating
+from .snapshot import bump_quiz_version
+from . import leaderboard, search
+
+
+def _bump_on_commit(quiz_id):
+    # bump after commit, otherwise a reader could cache the old rows under the new version
+    if quiz_id:
+        transaction.on_commit(lambda: bump_quiz_version(quiz_id))
+
+
+def _touch(quizzes):
+    # move Quiz.updated_at forward for changes that don't save the quiz itself, it is the
+    # validator of the quiz pages (quiz/conditional.py)
+    quizzes.update(updated_at=timezone.now())
+
+
+def _deleted_with_quiz(origin):
+    # questions/options removed by deleting their quiz, there is nothing left to touch
+    return isinstance(origin, Quiz) or getattr(origin, 'model', None) is Quiz
+
+
+def _reindex_on_commit(quiz_id):
+    if quiz_id:
+        transaction.on_commit(lambda: search.index_quiz(quiz_id))
+
+
+@receiver([post_save, post_delete], sender=Quiz)
+def quiz_changed(sender, instance, **kwargs):
+    _bump_on_commit(instance.pk)
+    _reindex_on_commit(instance.pk)
+
+
+@receiver(pre_delete, sender=Quiz)
+def quiz_deleting(sender, instance, **kwargs):
+    # the quiz's attempts go with it by cascade, the totals of its takers are recounted without them
+    user_ids = list(QuizAttempt.objects.filter(quiz=instance).order_by().values_list('user_id', flat=True).distinct())
+    if user_ids:
+        transaction.on_commit(lambda: leaderboard.recount(user_ids, [instance.pk]))
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, created=False, origin=None, **kwargs):
+    # deleted with their quiz: quiz_changed bumps and reindexes it once
+    if _deleted_with_quiz(origin):
+        return
+    # new questions already touched the quiz in allocate_question_orders()
+    if not created:
+        _touch(Quiz.objects.filter(pk=instance.quiz_id))
+    _bump_on_commit(instance.quiz_id)
+    _reindex_on_commit(instance.quiz_id)
+
+
+@receiver([post_save, post_delete], sender=Option)
+def option_changed(sender, instance, origin=None, **kwargs):
+    if _deleted_with_quiz(origin):
+        quiz_id = None
+    elif Option.question.is_cached(instance):
+        quiz_id = instance.question.quiz_id
+    else:
+        quiz_id = Question.objects.filter(pk=instance.question_id).values_list('quiz_id', flat=True).first()
+    if quiz_id:
+        _touch(Quiz.objects.filter(pk=quiz_id))
+    _bump_on_commit(quiz_id)
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, origin=None, **kwargs):
+    # RateQuizView never deletes ratings, these come from the admin or a deleted user
+    if not _deleted_with_quiz(origin):
+        Quiz(pk=instance.quiz_id).remove_rating(instance.score)
+
+
+@receiver(post_save, sender=Category)
+def category_changed(sender, instance, created, **kwargs):
+    if not created:
+        _touch(instance.quizzes.all())
+        transaction.on_commit(lambda: search.index_category(instance.pk))
+        for quiz_id in instance.quizzes.values_list('id', flat=True):
+            _bump_on_commit(quiz_id)
+
+
+@receiver(pre_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    # the quizzes are moved to "no category" with a plain UPDATE, so remember them now
+    _touch(instance.quizzes.all())
+    for quiz_id in instance.quizzes.values_list('id', flat=True):
+        _bump_on_commit(quiz_id)
+        _reindex_on_commit(quiz_id)
@@ -0,0 +1,101 @@
+"""
+Compiled, read-only snapshot of a quiz's questions and options for the take-quiz flow.
+
+The snapshot lives in Django's cache under 'quiz-snapshot:<quiz_id>:<version>'. The version is
+bumped by the Quiz/Question/Option/Category signals (see quiz/signals.py), so an edited
+quiz is simply read under a new key and old snapshots expire on their own. The same version keys
+the template fragments of the quiz cards and detail page ({% cache ... quiz.pk version %}), the
+cards add the rating aggregates to their key, ratings don't touch the version.
+"""
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Question, Option
+
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+SnapshotOption = namedtuple('SnapshotOption', ['id', 'text', 'is_correct'])
+SnapshotQuestion = namedtuple('SnapshotQuestion', ['id', 'text', 'order', 'points', 'options'])
+
+
+class QuizSnapshot(namedtuple('QuizSnapshot', ['quiz_id', 'version', 'questions'])):
+    __slots__ = ()
+
+    @property
+    def total_questions(self):
+        return len(self.questions)
+
+    @property
+    def max_score(self):
+        return sum(question.points for question in self.questions)
+
+    def get_question(self, question_id):
+        for question in self.questions:
+            if question.id == question_id:
+                return question
+        return None
+
+
+def _version_key(quiz_id):
+    return f'quiz-snapshot-version:{quiz_id}'
+
+
+def get_quiz_version(quiz_id):
+    version = cache.get(_version_key(quiz_id))
+    if version is None:
+        # seed from the clock so a version evicted from the cache never comes back with an old number
+        cache.add(_version_key(quiz_id), time.time_ns(), None)
+        version = cache.get(_version_key(quiz_id))
+    return version
+
+
+def get_quiz_versions(quiz_ids):
+    """{quiz_id: version} for a page of quizzes, with one cache round trip when they are all set."""
+    keys = {_version_key(quiz_id): quiz_id for quiz_id in quiz_ids}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    for quiz_id in quiz_ids:
+        if quiz_id not in versions:
+            versions[quiz_id] = get_quiz_version(quiz_id)
+    return versions
+
+
+def bump_quiz_version(quiz_id):
+    try:
+        cache.incr(_version_key(quiz_id))
+    except ValueError:
+        cache.set(_version_key(quiz_id), time.time_ns(), None)
+
+
+def build_quiz_snapshot(quiz_id, version=None):
+    questions = Question.objects.filter(quiz_id=quiz_id).order_by('order', 'id').prefetch_related(
+        Prefetch('options', queryset=Option.objects.order_by('id'))
+    )
+    return QuizSnapshot(
+        quiz_id=quiz_id,
+        version=version,
+        questions=tuple(
+            SnapshotQuestion(
+                id=question.id,
+                text=question.text,
+                order=question.order,
+                points=question.points,
+                options=tuple(SnapshotOption(option.id, option.text, option.is_correct) for option in question.options.all()),
+            )
+            for question in questions
+        ),
+    )
+
+
+def get_quiz_snapshot(quiz):
+    """Return the cached snapshot for a quiz (instance or id), compiling it on a cache miss."""
+    quiz_id = getattr(quiz, 'pk', quiz)
+    version = get_quiz_version(quiz_id)
+    key = f'quiz-snapshot:{quiz_id}:{version}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_quiz_snapshot(quiz_id, version)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
@@ -0,0 +1,90 @@
+"""
+Clean-up of abandoned quiz attempts and expired sessions, run periodically by manage.py sweep_attempts.
+
+An in-progress attempt (AttemptProgress, quiz/attempt_store.py) times out at its quiz's time limit
+plus ATTEMPT_GRACE. Timed-out attempts are finished like QuizCompleteView finishes them: the answers
+given so far are scored and saved (grading.finish_attempt) and the progress is dropped. A quiz without
+time limit has no deadline, its progress is only dropped once abandoned (ABANDONED_AFTER after it
+started), no attempt is recorded and the user can still take the quiz.
+
+Both jobs work in batches and every write is its own short transaction. SQLite has a single write
+lock, one DELETE of a big backlog would hold it for as long as it runs and stall every request that
+writes meanwhile.
+
+    finalized, discarded, abandoned = finalize_timed_out()
+    deleted = purge_expired_sessions()
+"""
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .attempt_store import get_attempt_store
+from .grading import finish_attempt
+from .models import ATTEMPT_GRACE, AttemptProgress, Quiz
+
+ABANDONED_AFTER = timedelta(days=7)
+
+
+def timed_out(now=None):
+    """The AttemptProgress rows past their deadline, or abandoned for quizzes without one."""
+    now = now or timezone.now()
+    expired = Q(quiz__time_limit__isnull=True, started_at__lt=now - ABANDONED_AFTER)
+    # one condition per distinct time limit (a handful), each a plain bound on started_at
+    limits = Quiz.objects.exclude(time_limit=None).order_by().values_list('time_limit', flat=True).distinct()
+    for limit in limits:
+        expired |= Q(quiz__time_limit=limit, started_at__lt=now - timedelta(minutes=limit) - ATTEMPT_GRACE)
+    return AttemptProgress.objects.filter(expired)
+
+
+def finalize_timed_out(batch_size=100, now=None):
+    """
+    Score and close every timed-out attempt and drop the abandoned ones, returns (finalized,
+    discarded, abandoned); discarded attempts belong to users who finished the quiz meanwhile.
+    """
+    now = now or timezone.now()
+    store = get_attempt_store()
+    queryset = timed_out(now).select_related('user', 'quiz').order_by('pk')
+    finalized = discarded = abandoned = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return finalized, discarded, abandoned
+        last_pk = batch[-1].pk
+        for progress in batch:
+            if not progress.quiz.time_limit:
+                # nothing was due, scoring it would also use up the user's one attempt
+                store.finish(progress.user, progress.quiz_id)
+                abandoned += 1
+                continue
+            # the cache store can hold answers newer than the row's last checkpoint
+            state = store.load(progress.user, progress.quiz_id)
+            answers = state.answers if state is not None else progress.answers
+            if finish_attempt(progress.user, progress.quiz, answers, progress.started_at, finished_at=now) is None:
+                discarded += 1
+            else:
+                finalized += 1
+            store.finish(progress.user, progress.quiz_id)
+
+
+def purge_expired_sessions(chunk_size=1000):
+    """
+    Delete the expired sessions `chunk_size` at a time (by their expire_date index), returns how many
+    were deleted, or None for session backends that don't keep them in the database.
+    """
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not hasattr(store, 'get_model_class'):
+        # cache, file or cookie sessions: what manage.py clearsessions would do
+        store.clear_expired()
+        return None
+    Session = store.get_model_class()
+    expired = Session.objects.filter(expire_date__lt=timezone.now())
+    deleted = 0
+    while True:
+        keys = list(expired.values_list('session_key', flat=True)[:chunk_size])
+        if not keys:
+            return deleted
+        deleted += Session.objects.filter(session_key__in=keys).delete()[0]
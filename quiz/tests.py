@@ -1,3 +1,1383 @@
-from django.test import TestCase
+import csv
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core import signing
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.middleware import ServerTimingMiddleware
+from core.models import OutboxEmail
+from core.pagination import EstimatedCountPaginator
+from quiz_master import settings_asgi
+
+from .attempt_store import CacheAttemptStore, DatabaseAttemptStore, get_attempt_store
+from .grading import finish_attempt, grade_answers, record_attempt
+from .models import (
+    AttemptProgress, Category, LeaderboardEntry, Option, Question, Quiz, QuizAttempt, QuizLeaderboardEntry, QuizStats, Rating,
+    UserAnswer,
+)
+from .snapshot import get_quiz_snapshot, get_quiz_version
+from .views import TakeQuizView
+from . import analytics, async_views, bulk, grading, leaderboard, search, sweeper
+
+User = get_user_model()
+
+
+def record(user, quiz, answers, time_taken=None):
+    # grade and save an attempt, grading.finish_attempt() without the email
+    return record_attempt(user, quiz, grade_answers(get_quiz_snapshot(quiz), answers), time_taken=time_taken)
+
+
+class ConcurrentCompletionTests(TransactionTestCase):
+    """Parallel quiz completions against the file-backed test database must not hit 'database is locked'."""
+
+    workers = 8
+
+    def setUp(self):
+        author = User.objects.create(username='author', email='author@example.com')
+        self.quiz = Quiz.objects.create(title='Concurrency', created_by=author)
+        for number in range(10):
+            question = Question.objects.create(quiz=self.quiz, text=f'Question {number}')
+            Option.objects.bulk_create([
+                Option(question=question, text=f'Option {n}', is_correct=(n == 0)) for n in range(4)
+            ])
+        self.users = [User.objects.create(username=f'taker{n}', email=f'taker{n}@example.com') for n in range(self.workers)]
+
+        # every user has answered everything and only has to hit quiz-complete
+        store = get_attempt_store()
+        snapshot = get_quiz_snapshot(self.quiz)
+        for user in self.users:
+            state = store.start(user, self.quiz.id)
+            for question in snapshot.questions:
+                store.record_answer(state, question.id, question.options[0].id)
+            store.move_cursor(state, snapshot.total_questions)
+            store.save(state)
+
+    def test_sqlite_profile_is_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+    def test_parallel_completions(self):
+        barrier = threading.Barrier(self.workers)
+        errors, statuses = [], []
+
+        def complete(user):
+            try:
+                client = Client(raise_request_exception=True)
+                client.force_login(user)
+                barrier.wait()
+                statuses.append(client.get(f'/quizzes/quiz/{self.quiz.id}/complete/').status_code)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=complete, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(statuses, [302] * self.workers)
+        self.assertEqual(QuizAttempt.objects.filter(quiz=self.quiz, score=10).count(), self.workers)
+
+
+class HotQueryPlanTests(TestCase):
+    """The hot query shapes must be answered from an index, without a table scan or a sort."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='planner', email='planner@example.com')
+        cls.quiz = Quiz.objects.create(title='Plans', created_by=cls.user)
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertRegex(plan, r'USING (COVERING )?INDEX|USING INTEGER PRIMARY KEY', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotRegex(plan, r'SCAN quiz_(quiz|question|quizattempt)\b(?! USING)', plan)
+
+    def test_attempt_exists(self):
+        self.assertUsesIndex(QuizAttempt.objects.filter(user=self.user, quiz=self.quiz).values('id')[:1])
+
+    def test_attempted_quizzes(self):
+        self.assertUsesIndex(
+            QuizAttempt.objects.filter(user=self.user, quiz_id__in=[self.quiz.id, self.quiz.id + 1]).order_by().values_list('quiz_id', flat=True)
+        )
+
+    def test_quiz_ranking(self):
+        self.assertUsesIndex(QuizAttempt.objects.filter(quiz=self.quiz).order_by('-score', 'time_taken'))
+
+    def test_active_quizzes_newest_first(self):
+        self.assertUsesIndex(Quiz.objects.filter(is_active=True).order_by('-created_at'))
+
+    def test_questions_in_order(self):
+        self.assertUsesIndex(Question.objects.filter(quiz=self.quiz).order_by('order'))
+
+
+class SearchTests(TestCase):
+    """The FTS index follows the model signals and the quiz list ranks and highlights matches."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='searcher', email='searcher@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.science = Category.objects.create(name='Science')
+            self.title_match = Quiz.objects.create(title='Python basics', description='Loops and lists', created_by=self.user)
+            self.body_match = Quiz.objects.create(title='Snakes', description='All about the python and other snakes', category=self.science, created_by=self.user)
+            other = Quiz.objects.create(title='History', description='Dates', created_by=self.user)
+            Question.objects.create(quiz=other, text='Which python version removed print statements?')
+        self.question_match = other
+
+    def search(self, **params):
+        return self.client.get(reverse('quiz-list'), params)
+
+    def test_ranked_by_bm25(self):
+        quizzes = list(self.search(q='python').context['quizzes'])
+        self.assertEqual(quizzes, [self.title_match, self.body_match, self.question_match])
+
+    def test_prefix_and_user_syntax(self):
+        self.assertEqual(list(self.search(q='pyth').context['quizzes'])[0], self.title_match)
+        # FTS operators in the input are searched for literally instead of raising a syntax error
+        self.assertEqual(list(self.search(q='python" OR title:*').context['quizzes']), [])
+
+    def test_combines_with_category_filter(self):
+        quizzes = list(self.search(q='python', category=self.science.pk).context['quizzes'])
+        self.assertEqual(quizzes, [self.body_match])
+
+    def test_highlighted_snippet(self):
+        response = self.search(q='python')
+        self.assertContains(response, '<mark>Python</mark> basics')
+        self.assertContains(response, 'Which <mark>python</mark> version')
+
+    def test_signals_keep_index_in_sync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.science.name = 'Biology'
+            self.science.save()
+            self.title_match.delete()
+        self.assertEqual(list(self.search(q='biology').context['quizzes']), [self.body_match])
+        self.assertEqual(list(self.search(q='basics').context['quizzes']), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.science.delete()
+        self.assertEqual(list(self.search(q='biology').context['quizzes']), [])
+
+    def test_quiz_delete_reindexes_once(self):
+        for number in range(3):
+            Question.objects.create(quiz=self.question_match, text=f'Extra question {number}')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.question_match.delete()
+        # the quiz's own bump and reindex, nothing per deleted question
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(list(self.search(q='version').context['quizzes']), [])
+
+    def test_rebuild(self):
+        Quiz.objects.bulk_create([Quiz(title='Bulk python', created_by=self.user)])
+        self.assertEqual(search.rebuild(), Quiz.objects.count())
+        self.assertEqual(len(self.search(q='bulk').context['quizzes']), 1)
+
+
+class QuestionBankTests(TestCase):
+    """Import validates the whole file before writing and export streams it back in the same format."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@example.com')
+        self.client.force_login(self.user)
+
+    def upload(self, name, content, url=None, **data):
+        return self.client.post(url or reverse('quiz-import'), {'file': SimpleUploadedFile(name, content.encode()), **data})
+
+    def test_csv_import_creates_quiz(self):
+        rows = ''.join(f'Question {n}?,{1 + n % 2},{1 + n % 3},a,b,c\n' for n in range(120))
+        with self.captureOnCommitCallbacks(execute=True):
+            # session, user, quiz, order allocation (UPDATE + SELECT), one INSERT for the questions and
+            # two for the options (Django splits them at SQLite's variable limit), whatever the file size
+            with self.assertNumQueries(10):
+                response = self.upload('bank.csv', 'question,points,correct,option_1,option_2,option_3\n' + rows, title='Imported')
+        quiz = Quiz.objects.get(title='Imported')
+        self.assertRedirects(response, reverse('quiz-detail', args=[quiz.pk]))
+        self.assertEqual(list(quiz.questions.values_list('order', flat=True)), list(range(1, 121)))
+        self.assertEqual(Option.objects.filter(question__quiz=quiz).count(), 360)
+        self.assertEqual(get_quiz_snapshot(quiz).max_score, 180)
+        self.assertEqual(list(self.client.get(reverse('quiz-list'), {'q': 'question'}).context['quizzes']), [quiz])
+
+    def test_invalid_file_writes_nothing(self):
+        content = 'What?,1,2,a,b\n,1,1,a,b\nWho?,1,5,a,b\nWhen?,x,1,a,b\n'
+        response = self.upload('bank.csv', content, title='Broken')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['form'].errors['file'], [
+            'line 2: the question text is empty',
+            'line 3: "correct" must be between 1 and 2',
+            'line 4: points must be a positive whole number',
+        ])
+        self.assertFalse(Quiz.objects.exists())
+
+    def test_json_round_trip(self):
+        quiz = Quiz.objects.create(title='Original', description='Round trip', time_limit=5, created_by=self.user)
+        for n in range(3):
+            question = Question.objects.create(quiz=quiz, text=f'Q{n}, "quoted"', points=n + 1)
+            Option.objects.create(question=question, text='right', is_correct=True)
+            Option.objects.create(question=question, text='wrong')
+        for fmt in ('csv', 'json'):
+            response = self.client.get(reverse('quiz-export', args=[quiz.pk]), {'format': fmt})
+            content = b''.join(response.streaming_content).decode()
+            self.upload(f'export.{fmt}', content, title=f'Copy {fmt}' if fmt == 'csv' else '')
+        csv_copy = Quiz.objects.get(title='Copy csv')
+        json_copy = Quiz.objects.get(title='Original', time_limit=5, description='Round trip', pk__gt=quiz.pk)
+        shape = lambda quiz: list(Option.objects.filter(question__quiz=quiz).order_by('question__order', 'id').values_list(
+            'question__text', 'question__points', 'text', 'is_correct'))
+        self.assertEqual(shape(csv_copy), shape(quiz))
+        self.assertEqual(shape(json_copy), shape(quiz))
+
+    def test_append_to_existing_quiz(self):
+        quiz = Quiz.objects.create(title='Existing', created_by=self.user)
+        Question.objects.create(quiz=quiz, text='First')
+        self.upload('more.jsonl', '{"text": "Second", "options": [{"text": "a", "is_correct": true}, {"text": "b"}]}\n',
+                    url=reverse('question-import', args=[quiz.pk]))
+        self.assertEqual(list(quiz.questions.values_list('text', 'order')), [('First', 1), ('Second', 2)])
+        other = User.objects.create(username='other', email='other@example.com')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('quiz-export', args=[quiz.pk])).status_code, 403)
+
+
+class QuestionOrderTests(TestCase):
+    """Order numbers come from the quiz's counter and a reorder is applied with one bulk_update."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='author', email='author@example.com')
+        self.quiz = Quiz.objects.create(title='Ordering', created_by=self.user)
+        self.questions = [Question.objects.create(quiz=self.quiz, text=f'Question {n}') for n in range(5)]
+        self.client.force_login(self.user)
+
+    def orders(self):
+        return list(self.quiz.questions.values_list('id', flat=True))
+
+    def test_allocator(self):
+        self.assertEqual([question.order for question in self.questions], [1, 2, 3, 4, 5])
+        self.assertEqual(self.quiz.allocate_question_orders(3), range(6, 9))
+        self.questions[-1].delete()
+        # numbers are never handed out twice, even after deletes
+        self.assertEqual(Question.objects.create(quiz=self.quiz, text='Appended').order, 9)
+
+    def test_add_question_view(self):
+        response = self.client.post(reverse('add-question', args=[self.quiz.pk]), {
+            'question_text': 'Added?', 'option_1': 'a', 'option_2': 'b', 'option_3': 'c', 'option_4': 'd', 'correct_option': '2',
+        })
+        self.assertRedirects(response, reverse('quiz-detail', args=[self.quiz.pk]))
+        question = self.quiz.questions.get(text='Added?')
+        self.assertEqual(question.order, 6)
+        self.assertEqual(list(question.options.values_list('text', 'is_correct')), [('a', False), ('b', True), ('c', False), ('d', False)])
+
+    def test_reorder_form(self):
+        new_order = [question.id for question in reversed(self.questions)]
+        # session, user, permission check, quiz, current orders, savepoint, one UPDATE, updated_at, release
+        with self.assertNumQueries(9):
+            response = self.client.post(reverse('quiz-reorder', args=[self.quiz.pk]), {'question': new_order})
+        self.assertRedirects(response, reverse('quiz-detail', args=[self.quiz.pk]))
+        self.assertEqual(self.orders(), new_order)
+
+    def test_reorder_json(self):
+        ids = [question.id for question in self.questions]
+        new_order = [ids[1], ids[0]] + ids[2:]
+        url = reverse('quiz-reorder', args=[self.quiz.pk])
+        response = self.client.post(url, {'questions': new_order}, content_type='application/json')
+        self.assertEqual(response.json(), {'moved': 2})
+        self.assertEqual(self.orders(), new_order)
+
+        # the list must contain every question exactly once
+        response = self.client.post(url, {'questions': new_order[:-1] + [new_order[0]]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.orders(), new_order)
+
+    def test_reorder_requires_owner(self):
+        self.client.force_login(User.objects.create(username='other', email='other@example.com'))
+        response = self.client.post(reverse('quiz-reorder', args=[self.quiz.pk]), {'question': []})
+        self.assertEqual(response.status_code, 403)
+
+
+class ConcurrentAuthoringTests(TransactionTestCase):
+    """Questions added in parallel to the same quiz must get distinct order numbers."""
+
+    workers = 8
+
+    def test_parallel_question_inserts(self):
+        quiz = Quiz.objects.create(title='Parallel', created_by=User.objects.create(username='author', email='author@example.com'))
+        barrier = threading.Barrier(self.workers)
+        errors = []
+
+        def add_questions(worker):
+            try:
+                barrier.wait(timeout=30)
+                for number in range(5):
+                    Question.objects.create(quiz=quiz, text=f'Question {worker}.{number}')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=add_questions, args=(worker,)) for worker in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        orders = sorted(quiz.questions.values_list('order', flat=True))
+        self.assertEqual(orders, list(range(1, self.workers * 5 + 1)))
+
+
+class FragmentCacheTests(TestCase):
+    """Quiz cards and detail fragments are cached per quiz version, per-user parts are not."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author', email='author@example.com')
+        self.reader = User.objects.create(username='reader', email='reader@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quiz = Quiz.objects.create(title='Cached', created_by=self.author)
+            question = Question.objects.create(quiz=self.quiz, text='First question')
+            Option.objects.create(question=question, text='Only option', is_correct=True)
+
+    def test_detail_fragments_cached_until_edit(self):
+        self.client.force_login(self.reader)
+        url = reverse('quiz-detail', args=[self.quiz.pk])
+        self.client.get(url)
+        # session, user, validator, quiz, own rating: the author, counts and questions come from the cache
+        with self.assertNumQueries(5):
+            self.assertContains(self.client.get(url), 'First question')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.create(quiz=self.quiz, text='Second question')
+        self.assertContains(self.client.get(url), 'Second question')
+
+    def test_author_buttons_not_shared(self):
+        url = reverse('quiz-detail', args=[self.quiz.pk])
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(url), reverse('add-question', args=[self.quiz.pk]))
+        self.client.force_login(self.reader)
+        self.assertNotContains(self.client.get(url), reverse('add-question', args=[self.quiz.pk]))
+
+    def test_card_follows_ratings_and_attempts(self):
+        self.client.force_login(self.reader)
+        self.assertNotContains(self.client.get(reverse('quiz-list')), '7.0')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('rate-quiz', args=[self.quiz.pk]), {'score': 7})
+        self.assertContains(self.client.get(reverse('quiz-list')), '7.0')
+
+        # the attempted badge is per user and outside the cached card
+        QuizAttempt.objects.create(user=self.reader, quiz=self.quiz)
+        self.assertContains(self.client.get(reverse('quiz-list')), 'Attempted')
+        self.client.force_login(self.author)
+        self.assertNotContains(self.client.get(reverse('quiz-list')), 'Attempted')
+
+
+class ConditionalGetTests(TestCase):
+    """Unchanged quiz pages are answered with 304 from one validator query, any visible change or another user gets a new ETag."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author', email='author@example.com')
+        self.reader = User.objects.create(username='reader', email='reader@example.com')
+        self.quiz = Quiz.objects.create(title='Conditional', created_by=self.author)
+        self.question = Question.objects.create(quiz=self.quiz, text='First question')
+        Option.objects.create(question=self.question, text='Only option', is_correct=True)
+        self.client.force_login(self.reader)
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_not_modified(self):
+        urls = [
+            reverse('quiz-list'),
+            reverse('quiz-detail', args=[self.quiz.pk]),
+            reverse('leaderboard'),
+            reverse('quiz-leaderboard', args=[self.quiz.pk]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                # session, user and the validator query, no page queries and no rendering
+                with self.assertNumQueries(3):
+                    response = self.revalidate(url, response)
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate(self):
+        detail = reverse('quiz-detail', args=[self.quiz.pk])
+        listing = reverse('quiz-list')
+        first = self.client.get(detail)
+
+        Option.objects.create(question=self.question, text='Another option')
+        second = self.revalidate(detail, first)
+        self.assertEqual(second.status_code, 200)
+
+        self.client.post(reverse('rate-quiz', args=[self.quiz.pk]), {'score': 5})
+        self.client.get(detail)  # shows the "thank you" message, never answered with 304
+        self.assertEqual(self.revalidate(detail, second).status_code, 200)
+
+        page = self.client.get(listing)
+        QuizAttempt.objects.create(user=self.reader, quiz=self.quiz)
+        self.assertEqual(self.revalidate(listing, page).status_code, 200)
+        page = self.client.get(listing)
+        Category.objects.create(name='New category')
+        self.assertEqual(self.revalidate(listing, page).status_code, 200)
+
+    def test_etag_per_user_and_query(self):
+        url = reverse('quiz-detail', args=[self.quiz.pk])
+        response = self.client.get(url)
+        self.client.force_login(self.author)
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+        listing = self.client.get(reverse('quiz-list'))
+        self.assertEqual(self.client.get(reverse('quiz-list') + '?sort=oldest', HTTP_IF_NONE_MATCH=listing['ETag']).status_code, 200)
+
+    def test_last_modified_for_anonymous_only(self):
+        url = reverse('quiz-detail', args=[self.quiz.pk])
+        self.assertFalse(self.client.get(url).has_header('Last-Modified'))
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+
+class AnalyticsTests(TestCase):
+    """Per-question stats are counted incrementally and match a recount from scratch."""
+
+    # correct answers per attempt for questions 1..3: scores 3, 2, 1, 1
+    patterns = [(True, True, True), (True, True, False), (False, True, False), (False, False, True)]
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author', email='author@example.com')
+        self.quiz = Quiz.objects.create(title='Analytics', created_by=self.author)
+        self.options = []
+        for number in range(3):
+            question = Question.objects.create(quiz=self.quiz, text=f'Question {number}')
+            self.options.append(Option.objects.bulk_create([
+                Option(question=question, text='right', is_correct=True),
+                Option(question=question, text='wrong', is_correct=False),
+            ]))
+
+    def attempt(self, number, pattern):
+        user = User.objects.create(username=f'taker{number}', email=f'taker{number}@example.com')
+        answers = {right.question_id: (right if correct else wrong).id for (right, wrong), correct in zip(self.options, pattern)}
+        record(user, self.quiz, answers)
+
+    def summary(self, report):
+        return [(row.answered, row.correct, row.discrimination, [option.picks for option in row.options]) for row in report.questions]
+
+    def test_report_counts_and_discrimination(self):
+        for number, pattern in enumerate(self.patterns):
+            self.attempt(number, pattern)
+        report = analytics.question_report(self.quiz)
+        self.assertEqual(report.attempts, 4)
+        self.assertEqual(report.groups, (2, 1))
+        self.assertEqual(self.summary(report), [
+            (4, 2, 1.0, [2, 2]),
+            (4, 3, 0.5, [3, 1]),
+            (4, 2, 0.0, [2, 2]),
+        ])
+
+    def test_refresh_is_incremental(self):
+        self.attempt(0, self.patterns[0])
+        self.attempt(1, self.patterns[1])
+        analytics.refresh(self.quiz.pk)
+        # nothing new: savepoint, the watermark row, one grouped query over the new attempts, release
+        with self.assertNumQueries(4):
+            analytics.refresh(self.quiz.pk)
+        self.attempt(2, self.patterns[2])
+        self.attempt(3, self.patterns[3])
+        incremental = self.summary(analytics.question_report(self.quiz))
+
+        analytics.rebuild()
+        self.assertEqual(self.summary(analytics.question_report(self.quiz)), incremental)
+
+    def test_dashboard_for_author_only(self):
+        self.attempt(0, self.patterns[0])
+        url = reverse('quiz-analytics', args=[self.quiz.pk])
+        self.client.force_login(User.objects.get(username='taker0'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.author)
+        response = self.client.get(url)
+        self.assertContains(response, 'Question 2')
+        self.assertContains(response, '100% correct')
+        self.assertContains(self.client.get(reverse('my-quiz-list')), url)
+
+
+class HistoryTests(TestCase):
+    """The history is paginated by (completed_at, id) keys, filtered by category and summarised in SQL."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='taker', email='taker@example.com')
+        author = User.objects.create(username='author', email='author@example.com')
+        self.science = Category.objects.create(name='Science')
+        quizzes = Quiz.objects.bulk_create([
+            Quiz(title=f'Quiz {number}', created_by=author, category=self.science if number % 3 == 0 else None)
+            for number in range(30)
+        ])
+        attempts = QuizAttempt.objects.bulk_create([
+            QuizAttempt(user=self.user, quiz=quiz, score=number % 5, max_score=4, time_taken=timedelta(minutes=1))
+            for number, quiz in enumerate(quizzes)
+        ])
+        # pairs of attempts share a timestamp, the id breaks the tie
+        start = timezone.now()
+        for number, attempt in enumerate(attempts):
+            QuizAttempt.objects.filter(pk=attempt.pk).update(completed_at=start - timedelta(minutes=number // 2))
+        self.expected = list(QuizAttempt.objects.filter(user=self.user).order_by('-completed_at', '-id').values_list('id', flat=True))
+        self.client.force_login(self.user)
+
+    def test_keyset_pages_cover_everything_once(self):
+        url = reverse('user-history')
+        seen, cursor, pages = [], None, []
+        while True:
+            response = self.client.get(url, {'cursor': cursor} if cursor else {})
+            pages.append(response.context['page'])
+            seen += [attempt.id for attempt in response.context['attempts']]
+            cursor = response.context['page'].next_cursor
+            if not cursor:
+                break
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(page) for page in pages], [25, 5])
+
+        back = self.client.get(url, {'cursor': pages[1].previous_cursor}).context['page']
+        self.assertEqual([attempt.id for attempt in back], self.expected[:25])
+        # an invalid cursor is the first page
+        self.assertEqual(len(self.client.get(url, {'cursor': 'garbage'}).context['page']), 25)
+
+    def test_category_filter_and_summary(self):
+        response = self.client.get(reverse('user-history'), {'category': self.science.pk})
+        self.assertEqual(len(response.context['page']), 10)
+        self.assertTrue(all(attempt.quiz.category_id == self.science.pk for attempt in response.context['page']))
+
+        summary = {row['quiz__category__name']: row for row in response.context['summary']}
+        self.assertEqual(summary['Science']['attempts'], 10)
+        self.assertEqual(summary['Science']['best_percentage'], 100.0)
+        overall = response.context['overall']
+        self.assertEqual(overall['attempts'], 30)
+        self.assertEqual(overall['total_time'], timedelta(minutes=30))
+        # scores cycle through 0..4 out of 4
+        self.assertAlmostEqual(overall['avg_percentage'], 50.0)
+
+
+class AdminQueryTests(TestCase):
+    """Admin changelists and change forms must not issue a query per row."""
+
+    def setUp(self):
+        self.admin = User.objects.create(username='root', email='root@example.com', is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        self.category = Category.objects.create(name='General')
+        self.takers = [User.objects.create(username=f'taker{n}', email=f'taker{n}@example.com') for n in range(3)]
+
+    def add_quiz(self, number):
+        quiz = Quiz.objects.create(title=f'Quiz {number}', category=self.category, created_by=self.admin)
+        question = Question.objects.create(quiz=quiz, text='Question?')
+        options = Option.objects.bulk_create([Option(question=question, text=f'Option {n}', is_correct=(n == 0)) for n in range(4)])
+        for taker in self.takers:
+            attempt = QuizAttempt.objects.create(user=taker, quiz=quiz, score=1, max_score=1)
+            attempt.answers.create(question=question, selected_option=options[0], is_correct=True)
+            Rating.objects.create(user=taker, quiz=quiz, score=5)
+        return quiz
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_changelists_are_bounded(self):
+        quiz = self.add_quiz(0)
+        answer = UserAnswer.objects.first()
+        urls = [reverse(f'admin:quiz_{model}_changelist') for model in ('quiz', 'question', 'option', 'quizattempt', 'useranswer', 'rating')]
+        urls += [
+            reverse('admin:quiz_quiz_change', args=[quiz.pk]),
+            reverse('admin:quiz_quizattempt_change', args=[answer.attempt_id]),
+            reverse('admin:quiz_useranswer_change', args=[answer.pk]),
+        ]
+        for url in urls:
+            self.client.get(url)  # warm up (content types cache)
+        before = [self.count_queries(url) for url in urls]
+        for number in range(1, 6):
+            self.add_quiz(number)
+        self.assertEqual([self.count_queries(url) for url in urls], before)
+
+    def test_estimated_count(self):
+        self.add_quiz(0)
+        queryset = UserAnswer.objects.order_by('-id')
+        top = queryset.first().pk
+        with mock.patch.object(EstimatedCountPaginator, 'exact_below', 0):
+            UserAnswer.objects.filter(pk=queryset.last().pk).delete()
+            # unfiltered: the highest id, a filtered list is counted
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, top)
+            self.assertEqual(EstimatedCountPaginator(queryset.filter(is_correct=True), 100).count, 2)
+        self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 2)
+
+
+class BulkTests(TestCase):
+    """Attempt exports stream from one query, the bulk actions are single UPDATE/DELETE statements."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author', email='author@example.com')
+        self.staff = User.objects.create(username='staff', email='staff@example.com', is_staff=True, is_superuser=True)
+        self.quizzes = [Quiz.objects.create(title=f'Quiz {n}', created_by=self.author) for n in range(2)]
+        self.takers = [User.objects.create(username=f'taker{n}', email=f'taker{n}@example.com') for n in range(4)]
+        snapshot_answers = {}
+        for quiz in self.quizzes:
+            for number in range(2):
+                question = Question.objects.create(quiz=quiz, text=f'{quiz.title} question {number}')
+                Option.objects.bulk_create([Option(question=question, text=f'Option {n}', is_correct=(n == 0)) for n in range(3)])
+            snapshot_answers[quiz.pk] = {
+                question_id: option_id
+                for question_id, option_id in Option.objects.filter(question__quiz=quiz, is_correct=True).values_list('question_id', 'id')
+            }
+        for quiz in self.quizzes:
+            for taker in self.takers:
+                record(taker, quiz, snapshot_answers[quiz.pk], time_taken=timedelta(seconds=90))
+        # the first quiz's attempts are a month old
+        QuizAttempt.objects.filter(quiz=self.quizzes[0]).update(completed_at=timezone.now() - timedelta(days=30))
+
+    def export(self, **params):
+        response = self.client.get(reverse('quiz-attempts-export', args=[self.quizzes[0].pk]), params)
+        return list(csv.reader(line.decode() for line in response.streaming_content))
+
+    def test_creator_export(self):
+        self.client.force_login(self.author)
+        with self.assertNumQueries(5):  # session, user, permission check, quiz, then one query for all rows
+            rows = self.export()
+        self.assertEqual(rows[0][:3], ['attempt', 'quiz', 'user'])
+        # 4 attempts of 2 answers each
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows[1][1:3], ['Quiz 0', 'taker0'])
+        self.assertEqual(rows[1][6:], ['90', 'Quiz 0 question 0', '1', 'Option 0', '1'])
+
+        today = timezone.localdate().isoformat()
+        self.assertEqual(len(self.export(**{'from': today})), 1)
+        self.assertEqual(len(self.export(to=today)), 9)
+        self.assertEqual(len(self.export(**{'from': '2025-02-30'})), 9)
+
+        self.client.force_login(self.takers[0])
+        self.assertEqual(self.client.get(reverse('quiz-attempts-export', args=[self.quizzes[0].pk])).status_code, 403)
+
+    def test_admin_toggle_active(self):
+        self.client.force_login(self.staff)
+        before = Quiz.objects.get(pk=self.quizzes[1].pk).updated_at
+        with self.assertNumQueries(1):
+            changed = bulk.set_active(Quiz.objects.all(), False)
+        self.assertEqual(changed, 2)
+        self.assertGreater(Quiz.objects.get(pk=self.quizzes[1].pk).updated_at, before)
+
+        self.client.post(reverse('admin:quiz_quiz_changelist'), {'action': 'activate', '_selected_action': [self.quizzes[0].pk]})
+        self.assertEqual(list(Quiz.objects.filter(is_active=True)), [self.quizzes[0]])
+
+    def test_admin_delete_attempts(self):
+        analytics.refresh(self.quizzes[0].pk)
+        self.client.force_login(self.staff)
+        old = list(QuizAttempt.objects.filter(quiz=self.quizzes[0]).values_list('pk', flat=True))
+        url = reverse('admin:quiz_quizattempt_changelist')
+        # the first post only asks for confirmation
+        response = self.client.post(url, {'action': 'delete_attempts', '_selected_action': old})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, f'delete {len(old)} attempts')
+        self.assertEqual(QuizAttempt.objects.filter(pk__in=old).count(), len(old))
+        self.assertNotIn('delete_selected', dict(self.client.get(url).context['action_form'].fields['action'].choices))
+
+        response = self.client.post(url, {'action': 'delete_attempts', '_selected_action': old, 'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(set(QuizAttempt.objects.values_list('quiz_id', flat=True)), {self.quizzes[1].pk})
+        self.assertFalse(UserAnswer.objects.filter(attempt__quiz=self.quizzes[0]).exists())
+        # leaderboards recounted, the quiz's analytics dropped
+        self.assertFalse(QuizLeaderboardEntry.objects.filter(quiz=self.quizzes[0]).exists())
+        self.assertEqual(LeaderboardEntry.objects.get(user=self.takers[0]).total_attempts, 1)
+        self.assertFalse(QuizStats.objects.filter(quiz=self.quizzes[0]).exists())
+
+    def test_admin_delete_all_filtered_attempts(self):
+        self.client.force_login(self.staff)
+        url = reverse('admin:quiz_quizattempt_changelist') + f'?quiz__id__exact={self.quizzes[1].pk}'
+        # "select all": the checkboxes of the page shown plus select_across, the filter comes from the url
+        shown = list(QuizAttempt.objects.filter(quiz=self.quizzes[1]).values_list('pk', flat=True)[:1])
+        response = self.client.post(url, {'action': 'delete_attempts', 'select_across': '1', '_selected_action': shown, 'index': 0})
+        self.assertContains(response, 'delete 4 attempts')
+        self.assertContains(response, 'name="select_across" value="1"')
+        self.client.post(url, {'action': 'delete_attempts', 'select_across': '1', '_selected_action': shown, 'post': 'yes'})
+        self.assertEqual(set(QuizAttempt.objects.values_list('quiz_id', flat=True)), {self.quizzes[0].pk})
+        self.assertFalse(QuizLeaderboardEntry.objects.filter(quiz=self.quizzes[1]).exists())
+
+    def test_admin_delete_one_attempt_recounts(self):
+        self.client.force_login(self.staff)
+        attempt = QuizAttempt.objects.filter(quiz=self.quizzes[0], user=self.takers[0]).get()
+        response = self.client.post(reverse('admin:quiz_quizattempt_delete', args=[attempt.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(QuizAttempt.objects.filter(pk=attempt.pk).exists())
+        self.assertFalse(QuizLeaderboardEntry.objects.filter(quiz=self.quizzes[0], user=self.takers[0]).exists())
+
+    def test_admin_export_selected_quizzes(self):
+        self.client.force_login(self.staff)
+        response = self.client.post(reverse('admin:quiz_quiz_changelist'), {
+            'action': 'export_attempts', '_selected_action': [quiz.pk for quiz in self.quizzes],
+        })
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 17)
+
+
+class ApiTests(TestCase):
+    """The JSON API pages with cursors, selects only the requested fields and answers with 304/gzip."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author', email='author@example.com')
+        self.quizzes = Quiz.objects.bulk_create([Quiz(title=f'Quiz {n}', created_by=self.author) for n in range(7)])
+        question = Question.objects.create(quiz=self.quizzes[0], text='Question?')
+        Option.objects.bulk_create([Option(question=question, text=f'Option {n}', is_correct=(n == 0)) for n in range(2)])
+        self.takers = [User.objects.create(username=f'taker{n}', email=f'taker{n}@example.com') for n in range(5)]
+
+    def pages(self, url):
+        results = []
+        while url:
+            data = self.client.get(url).json()
+            results += data['results']
+            url = data['next']
+        return results
+
+    def test_quiz_list(self):
+        url = reverse('api-quiz-list')
+        # the anonymous list: validator, page
+        with self.assertNumQueries(2):
+            data = self.client.get(url, {'limit': 3}).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'title', 'category', 'question_count', 'rating', 'created_at'})
+        self.assertIsNone(data['previous'])
+
+        results = self.pages(f'{url}?limit=3&fields=id,title')
+        self.assertEqual([row['id'] for row in results], [quiz.pk for quiz in reversed(self.quizzes)])
+        self.assertEqual(set(results[0]), {'id', 'title'})
+
+        response = self.client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_quiz_detail(self):
+        data = self.client.get(reverse('api-quiz-detail', args=[self.quizzes[0].pk])).json()
+        self.assertEqual(data['title'], 'Quiz 0')
+        self.assertEqual(data['question_count'], 1)
+        self.assertEqual(data['questions'][0]['options'], [
+            {'id': option.pk, 'text': option.text} for option in Option.objects.order_by('id')
+        ])
+        data = self.client.get(reverse('api-quiz-detail', args=[self.quizzes[0].pk]), {'fields': 'title'}).json()
+        self.assertEqual(data, {'title': 'Quiz 0'})
+
+        Quiz.objects.filter(pk=self.quizzes[1].pk).update(is_active=False)
+        self.assertEqual(self.client.get(reverse('api-quiz-detail', args=[self.quizzes[1].pk])).status_code, 404)
+
+    def test_quiz_leaderboard_cursor_over_null_times(self):
+        quiz = self.quizzes[0]
+        # equal scores, one without a time: SQLite sorts it first
+        for taker, seconds in zip(self.takers, [30, None, 30, 10, 50]):
+            record(taker, quiz, {}, time_taken=timedelta(seconds=seconds) if seconds else None)
+        expected = [entry.user.username for entry in QuizLeaderboardEntry.objects.filter(quiz=quiz).select_related('user')]
+        results = self.pages(reverse('api-quiz-leaderboard', args=[quiz.pk]) + '?limit=2')
+        self.assertEqual([row['user'] for row in results], expected)
+        self.assertEqual(expected[0], 'taker1')
+
+        data = self.client.get(reverse('api-leaderboard'), {'limit': 2}).json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(self.client.get(reverse('api-quiz-leaderboard', args=[999])).status_code, 404)
+
+    def test_etag_and_gzip(self):
+        url = reverse('api-quiz-list')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        Quiz.objects.filter(pk=self.quizzes[2].pk).update(title='Renamed', updated_at=timezone.now())
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+@override_settings(ROOT_URLCONF=settings_asgi.ROOT_URLCONF, MIDDLEWARE=settings_asgi.MIDDLEWARE)
+class AsyncViewTests(TestCase):
+    """The ASGI profile serves the read pages from async views, rendering what the sync views render."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author', email='author@example.com')
+        self.taker = User.objects.create(username='taker', email='taker@example.com')
+        self.quiz = Quiz.objects.create(title='Async quiz', created_by=self.author)
+        self.hidden = Quiz.objects.create(title='Hidden quiz', created_by=self.author, is_active=False)
+        question = Question.objects.create(quiz=self.quiz, text='Which one?')
+        options = Option.objects.bulk_create([Option(question=question, text=f'Option {n}', is_correct=(n == 0)) for n in range(3)])
+        self.attempt = record(self.taker, self.quiz, {question.id: options[1].id})
+
+    def test_routes_and_middleware(self):
+        self.assertIs(resolve(reverse('quiz-list')).func.view_class, async_views.QuizListView)
+        self.assertIs(resolve(reverse('quiz-leaderboard', args=[self.quiz.pk])).func.view_class, async_views.LeaderboardView)
+        self.assertEqual(resolve(reverse('quiz-take', args=[self.quiz.pk])).url_name, 'quiz-take')
+        # a sync middleware would put every request back in a thread
+        for path in settings_asgi.MIDDLEWARE:
+            middleware = import_string(path)
+            if middleware is not ServerTimingMiddleware:
+                self.assertTrue(getattr(middleware, 'async_capable', False), path)
+
+    async def test_list_and_detail(self):
+        response = await self.async_client.get(reverse('quiz-list'))
+        self.assertContains(response, 'Async quiz')
+        self.assertNotContains(response, 'Hidden quiz')
+        self.assertEqual(response.context['paginator'].count, 1)
+        revalidated = await self.async_client.get(reverse('quiz-list'), headers={'if-none-match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual((await self.async_client.get(reverse('quiz-list'), {'page': 9})).status_code, 404)
+
+        await self.async_client.aforce_login(self.taker)
+        response = await self.async_client.get(reverse('quiz-list'))
+        self.assertEqual(response.context['attempted_quizzes'], {self.quiz.pk})
+        response = await self.async_client.get(reverse('quiz-detail', args=[self.quiz.pk]))
+        self.assertContains(response, 'Which one?')
+        self.assertFalse(response.context['can_edit'])
+        self.assertEqual((await self.async_client.get(reverse('quiz-detail', args=[self.hidden.pk]))).status_code, 404)
+
+    async def test_result_page(self):
+        url = reverse('quiz-result', args=[self.attempt.pk])
+        self.assertEqual((await self.async_client.get(url)).status_code, 302)
+        await self.async_client.aforce_login(self.author)
+        self.assertEqual((await self.async_client.get(url)).status_code, 404)
+        await self.async_client.aforce_login(self.taker)
+        response = await self.async_client.get(url)
+        self.assertContains(response, 'Which one?')
+        self.assertContains(response, 'Option 1')
+
+    async def test_leaderboards(self):
+        await self.async_client.aforce_login(self.taker)
+        response = await self.async_client.get(reverse('leaderboard'))
+        self.assertEqual([entry.user_id for entry in response.context['leaderboard']], [self.taker.pk])
+        self.assertEqual(response.context['my_rank'], 1)
+        response = await self.async_client.get(reverse('quiz-leaderboard', args=[self.quiz.pk]))
+        self.assertEqual(response.context['quiz'], self.quiz)
+        self.assertEqual((await self.async_client.get(reverse('quiz-leaderboard', args=[999]))).status_code, 404)
+
+    def test_sync_result_page_prefetches(self):
+        self.client.force_login(self.taker)
+        # session, user, attempt with its quiz, answers, questions, their options, selected options
+        with override_settings(ROOT_URLCONF='quiz_master.urls'), self.assertNumQueries(7):
+            self.client.get(reverse('quiz-result', args=[self.attempt.pk]))
+
+    def test_same_html_as_the_sync_views(self):
+        for url in (reverse('quiz-list'), reverse('quiz-detail', args=[self.quiz.pk]), reverse('leaderboard')):
+            async_page = async_to_sync(self.async_client.get)(url).content
+            with override_settings(ROOT_URLCONF='quiz_master.urls'):
+                self.assertEqual(Client().get(url).content, async_page, url)
+
+
+class SweeperTests(TestCase):
+    """Timed-out attempts are scored and closed, late answers rejected, expired sessions deleted in chunks."""
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create(username='author', email='author@example.com')
+        self.timed = Quiz.objects.create(title='Timed', created_by=author, time_limit=5)
+        self.untimed = Quiz.objects.create(title='Untimed', created_by=author)
+        self.correct = {}
+        for quiz in (self.timed, self.untimed):
+            for number in range(2):
+                question = Question.objects.create(quiz=quiz, text=f'{quiz.title} question {number}')
+                options = Option.objects.bulk_create([Option(question=question, text=f'Option {n}', is_correct=(n == 0)) for n in range(2)])
+                self.correct[question.id] = options[0].id
+        self.users = [User.objects.create(username=f'taker{n}', email=f'taker{n}@example.com') for n in range(5)]
+
+    def start(self, user, quiz, ago, answers=()):
+        # an attempt started `ago`, in the store's cache and its AttemptProgress row
+        store = get_attempt_store()
+        state = store.start(user, quiz.id)
+        for question_id in answers:
+            store.record_answer(state, question_id, self.correct[question_id])
+        state.started_at -= ago
+        state.dirty = True
+        store.save(state)
+        AttemptProgress.objects.filter(user=user, quiz=quiz).update(started_at=state.started_at)
+
+    def test_finalize_timed_out(self):
+        first_question = Question.objects.filter(quiz=self.timed).order_by('id').first()
+        self.start(self.users[0], self.timed, timedelta(minutes=10), answers=[first_question.id])
+        self.start(self.users[1], self.timed, timedelta(minutes=2))
+        self.start(self.users[2], self.untimed, timedelta(days=8))
+        self.start(self.users[3], self.untimed, timedelta(days=1))
+        self.start(self.users[4], self.timed, timedelta(minutes=10))
+        record(self.users[4], self.timed, {})
+
+        self.assertEqual(sweeper.finalize_timed_out(batch_size=2), (1, 1, 1))
+        self.assertEqual(
+            set(AttemptProgress.objects.values_list('user__username', flat=True)), {'taker1', 'taker3'},
+        )
+        attempt = QuizAttempt.objects.get(user=self.users[0])
+        # the answer only in the cache counts, the time is capped at the limit
+        self.assertEqual((attempt.score, attempt.time_taken), (1, timedelta(minutes=5)))
+        # the untimed quiz had no deadline: its progress is dropped, nothing scored or mailed
+        self.assertFalse(QuizAttempt.objects.filter(user=self.users[2]).exists())
+        self.assertIsNone(get_attempt_store().load(self.users[2], self.untimed.pk))
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_late_answers_are_rejected(self):
+        self.client.force_login(self.users[0])
+        self.start(self.users[0], self.timed, timedelta(minutes=10))
+        url = reverse('quiz-take', args=[self.timed.pk])
+        self.assertRedirects(self.client.get(url), reverse('quiz-complete', args=[self.timed.pk]), fetch_redirect_response=False)
+        question = Question.objects.filter(quiz=self.timed).order_by('order', 'id').first()
+        response = self.client.post(url, {'answer': self.correct[question.id]})
+        self.assertRedirects(response, reverse('quiz-complete', args=[self.timed.pk]), fetch_redirect_response=False)
+        self.assertEqual(get_attempt_store().load(self.users[0], self.timed.pk).answers, {})
+
+        self.client.get(reverse('quiz-complete', args=[self.timed.pk]))
+        self.assertEqual(QuizAttempt.objects.get(user=self.users[0]).score, 0)
+
+    def test_late_single_page_submission(self):
+        answers = {f'q_{question_id}': option_id for question_id, option_id in self.correct.items()}
+        url = reverse('quiz-take', args=[self.timed.pk])
+        for user, ago, score in ((self.users[0], timedelta(minutes=10), 0), (self.users[1], timedelta(minutes=4), 2)):
+            self.client.force_login(user)
+            token = signing.dumps(
+                {'quiz': self.timed.pk, 'user': user.pk, 'start': (timezone.now() - ago).isoformat()}, salt=TakeQuizView.token_salt,
+            )
+            self.client.post(url, {'mode': TakeQuizView.SINGLE_MODE, 'token': token, **answers})
+            self.assertEqual(QuizAttempt.objects.get(user=user).score, score)
+
+    def test_reloading_the_single_page_keeps_the_start_time(self):
+        user = self.users[0]
+        self.client.force_login(user)
+        url = reverse('quiz-take', args=[self.timed.pk])
+        token = self.client.get(url, {'mode': 'single', 'format': 'json'}).json()['token']
+        # the page was opened ten minutes ago: reloading it doesn't hand out a fresh clock
+        self.start(user, self.timed, timedelta(minutes=10))
+        response = self.client.get(url, {'mode': 'single', 'format': 'json'})
+        self.assertRedirects(response, reverse('quiz-complete', args=[self.timed.pk]), fetch_redirect_response=False)
+
+        answers = {f'q_{question_id}': option_id for question_id, option_id in self.correct.items()}
+        self.client.post(url, {'mode': TakeQuizView.SINGLE_MODE, 'token': token, **answers})
+        attempt = QuizAttempt.objects.get(user=user)
+        self.assertEqual((attempt.score, attempt.time_taken), (0, timedelta(minutes=5)))
+        self.assertFalse(AttemptProgress.objects.filter(user=user).exists())
+
+    def test_purge_expired_sessions_in_chunks(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{n}', session_data='', expire_date=now - timedelta(days=1)) for n in range(5)]
+            + [Session(session_key=f'live{n}', session_data='', expire_date=now + timedelta(days=1)) for n in range(2)]
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sweeper.purge_expired_sessions(chunk_size=2), 5)
+        self.assertEqual(sum(query['sql'].startswith('DELETE') for query in queries), 3)
+        self.assertEqual(set(Session.objects.values_list('session_key', flat=True)), {'live0', 'live1'})
+
+        out = StringIO()
+        call_command('sweep_attempts', stdout=out)
+        self.assertIn('Finished 0 timed-out attempts (0 already completed), dropped 0 abandoned attempts, deleted 0 expired sessions.', out.getvalue())
+
+
+class GradingTests(TestCase):
+    """grade_answers() scores against the snapshot without a request, finish_attempt() grades outside its transaction."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='taker', email='taker@example.com')
+        self.quiz = Quiz.objects.create(title='Graded', created_by=self.user)
+        self.questions, self.correct, self.wrong = [], {}, {}
+        for points in (1, 2, 3):
+            question = Question.objects.create(quiz=self.quiz, text=f'Worth {points}?', points=points)
+            right, wrong = Option.objects.bulk_create([Option(question=question, text='right', is_correct=True), Option(question=question, text='wrong')])
+            self.questions.append(question)
+            self.correct[question.id], self.wrong[question.id] = right.id, wrong.id
+
+    def grade(self, answers):
+        return grade_answers(get_quiz_snapshot(self.quiz), answers)
+
+    def test_scoring(self):
+        first, second, third = self.questions
+        result = self.grade({first.id: self.correct[first.id], second.id: self.correct[second.id], third.id: self.wrong[third.id]})
+        self.assertEqual((result.score, result.max_score), (3, 6))
+        self.assertEqual([(answer.question_id, answer.is_correct) for answer in result.answers], [
+            (first.id, True), (second.id, True), (third.id, False),
+        ])
+
+    def test_option_of_another_question_is_rejected(self):
+        first, second, _ = self.questions
+        result = self.grade({first.id: self.correct[second.id]})
+        self.assertEqual((result.score, result.answers), (0, []))
+
+    def test_non_numeric_ids(self):
+        first, second, third = self.questions
+        result = self.grade({'abc': self.correct[first.id], first.id: 'x', second.id: None, str(third.id): str(self.correct[third.id])})
+        self.assertEqual(result.score, 3)
+        self.assertEqual([answer.question_id for answer in result.answers], [third.id])
+
+    def test_finish_attempt_grades_before_its_transaction(self):
+        depth = len(connection.atomic_blocks)
+
+        def grade(snapshot, answers):
+            self.assertEqual(len(connection.atomic_blocks), depth)
+            return grade_answers(snapshot, answers)
+        first = self.questions[0]
+        with mock.patch.object(grading, 'grade_answers', side_effect=grade) as graded:
+            attempt = finish_attempt(self.user, self.quiz, {first.id: self.correct[first.id]}, timezone.now())
+        graded.assert_called_once()
+        self.assertEqual(attempt.score, 1)
+        self.assertEqual(attempt.answers.count(), 1)
+
+
+class AttemptStoreTests(TestCase):
+    """Both attempt stores round-trip the state, skip unchanged writes and keep the AttemptProgress row current."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='taker', email='taker@example.com')
+        self.quiz = Quiz.objects.create(title='Stored', created_by=self.user)
+
+    def shared_cache(self):
+        # CacheAttemptStore refuses the per-process LocMemCache
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        return override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }})
+
+    def check_round_trip(self, store):
+        state = store.start(self.user, self.quiz.id)
+        store.record_answer(state, 7, '3')
+        store.move_cursor(state, 1)
+        self.assertTrue(store.save(state))
+        loaded = store.load(self.user, self.quiz.id)
+        self.assertEqual((loaded.cursor, loaded.answers, loaded.started_at), (1, {'7': 3}, state.started_at))
+
+        # the same answer and cursor again: nothing to write
+        store.record_answer(loaded, 7, 3)
+        store.move_cursor(loaded, 1)
+        with self.assertNumQueries(0):
+            self.assertFalse(store.save(loaded))
+
+        store.finish(self.user, self.quiz.id)
+        self.assertIsNone(store.load(self.user, self.quiz.id))
+        self.assertFalse(AttemptProgress.objects.exists())
+
+    def test_database_store(self):
+        self.assertIsInstance(get_attempt_store(), DatabaseAttemptStore)
+        self.check_round_trip(DatabaseAttemptStore())
+
+    def test_cache_store(self):
+        with self.shared_cache():
+            self.check_round_trip(CacheAttemptStore())
+
+    def test_cache_store_checkpoints_every_n_saves(self):
+        with self.shared_cache():
+            store = CacheAttemptStore()
+            state = store.start(self.user, self.quiz.id)
+            # an answer and a move per question, like the per-question flow: only the cache is written
+            for question in range(1, store.checkpoint_every):
+                store.record_answer(state, question, 3)
+                store.move_cursor(state, question)
+                with self.assertNumQueries(0):
+                    store.save(state)
+            self.assertEqual(AttemptProgress.objects.get().answers, {})
+            self.assertEqual(len(store.load(self.user, self.quiz.id).answers), store.checkpoint_every - 1)
+
+            store.record_answer(state, store.checkpoint_every, 3)
+            store.move_cursor(state, store.checkpoint_every)
+            with self.assertNumQueries(1):
+                store.save(state)
+            progress = AttemptProgress.objects.get()
+            self.assertEqual((progress.cursor, len(progress.answers)), (store.checkpoint_every, store.checkpoint_every))
+
+    def test_cache_store_refuses_locmem(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            with self.assertRaises(ImproperlyConfigured):
+                CacheAttemptStore()
+
+
+class RatingAggregateTests(TestCase):
+    """The stored rating aggregates follow new, changed and deleted ratings, the rebuild command repairs them."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author', email='author@example.com')
+        self.quiz = Quiz.objects.create(title='Rated', created_by=self.author)
+        self.raters = [User.objects.create(username=f'rater{n}', email=f'rater{n}@example.com') for n in range(2)]
+
+    def rate(self, user, score):
+        self.client.force_login(user)
+        self.client.post(reverse('rate-quiz', args=[self.quiz.pk]), {'score': str(score)})
+
+    def aggregates(self):
+        self.quiz.refresh_from_db()
+        return self.quiz.rating_sum, self.quiz.rating_count, self.quiz.rating_histogram
+
+    def test_add_and_change(self):
+        self.rate(self.raters[0], 5)
+        self.rate(self.raters[1], 3)
+        self.assertEqual(self.aggregates(), (8, 2, [0, 0, 1, 0, 1, 0, 0]))
+        self.rate(self.raters[0], 7)
+        self.assertEqual(self.aggregates(), (10, 2, [0, 0, 1, 0, 0, 0, 1]))
+        self.assertEqual(self.quiz.average_rating, 5)
+
+    def test_ratings_keep_the_snapshot_version(self):
+        version = get_quiz_version(self.quiz.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rate(self.raters[0], 5)
+            Rating.objects.get(user=self.raters[0]).delete()
+        self.assertEqual(get_quiz_version(self.quiz.pk), version)
+
+    def test_deletes(self):
+        self.rate(self.raters[0], 5)
+        self.rate(self.raters[1], 3)
+        Rating.objects.get(user=self.raters[0]).delete()
+        self.assertEqual(self.aggregates(), (3, 1, [0, 0, 1, 0, 0, 0, 0]))
+        # the user's ratings go with the user
+        self.raters[1].delete()
+        self.assertEqual(self.aggregates(), (0, 0, [0] * 7))
+
+    def test_rebuild_moves_the_validator_only(self):
+        Rating.objects.bulk_create([Rating(quiz=self.quiz, user=user, score=4) for user in self.raters])
+        other = Quiz.objects.create(title='Untouched', created_by=self.author)
+        self.quiz.refresh_from_db()
+        updated_at, version = self.quiz.updated_at, get_quiz_version(self.quiz.pk)
+        other_updated_at = other.updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.assertEqual(self.aggregates(), (8, 2, [0, 0, 0, 2, 0, 0, 0]))
+        self.assertGreater(self.quiz.updated_at, updated_at)
+        # the cards are keyed on the aggregates, the snapshot of the questions stays cached
+        self.assertEqual(get_quiz_version(self.quiz.pk), version)
+        other.refresh_from_db()
+        self.assertEqual(other.updated_at, other_updated_at)
+
+    def test_admin_cannot_edit_scores(self):
+        admin_user = User.objects.create(username='root', email='root@example.com', is_staff=True, is_superuser=True)
+        self.rate(self.raters[0], 5)
+        rating = Rating.objects.get()
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:quiz_rating_change', args=[rating.pk]), {'score': '1'})
+        self.assertEqual(response.status_code, 403)
+        rating.refresh_from_db()
+        self.assertEqual(rating.score, 5)
+        self.client.post(reverse('admin:quiz_rating_delete', args=[rating.pk]), {'post': 'yes'})
+        self.assertEqual(self.aggregates(), (0, 0, [0] * 7))
+
+
+class QuizListQueryTests(TestCase):
+    """A quiz list page costs a fixed number of queries, whatever the number of quizzes on it."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='reader', email='reader@example.com')
+        category = Category.objects.create(name='Science')
+        quizzes = Quiz.objects.bulk_create([Quiz(title=f'Quiz {n}', category=category, created_by=self.user) for n in range(13)])
+        for quiz in quizzes:
+            question = Question.objects.create(quiz=quiz, text=f'{quiz.title}?')
+            Option.objects.create(question=question, text='Yes', is_correct=True)
+        Rating.objects.create(quiz=quizzes[0], user=self.user, score=5)
+        record(self.user, quizzes[1], {})
+        self.params = {'category': category.pk, 'sort': 'rating'}
+        self.client.force_login(self.user)
+
+    def test_page_size_does_not_change_the_query_count(self):
+        for page, size in ((1, 12), (2, 1)):
+            # a cold cache, the card fragments are rendered too
+            cache.clear()
+            # session, user, validator, count, page, attempted quizzes, categories
+            with self.assertNumQueries(7):
+                response = self.client.get(reverse('quiz-list'), {**self.params, 'page': page})
+            self.assertEqual(len(response.context['quizzes']), size)
+
+
+class SnapshotVersionTests(TestCase):
+    """Saving or deleting a quiz, question or option moves the snapshot version, the next read sees the change."""
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create(username='author', email='author@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quiz = Quiz.objects.create(title='Versioned', created_by=author)
+            self.question = Question.objects.create(quiz=self.quiz, text='Before?')
+            self.option = Option.objects.create(question=self.question, text='Before', is_correct=True)
+
+    def assertBumps(self, change):
+        snapshot = get_quiz_snapshot(self.quiz)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertNotEqual(get_quiz_version(self.quiz.pk), snapshot.version)
+        # cached: read twice without a query
+        new = get_quiz_snapshot(self.quiz)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_quiz_snapshot(self.quiz), new)
+        return new
+
+    def test_versions_shared_between_workers(self):
+        # locmem is per process, a worker would keep grading with its own stale snapshot
+        self.assertNotIsInstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+        other_worker = caches.create_connection(DEFAULT_CACHE_ALIAS)
+        version = get_quiz_version(self.quiz.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quiz.save()
+        self.assertNotEqual(other_worker.get(f'quiz-snapshot-version:{self.quiz.pk}'), version)
+
+    def test_quiz_save_and_delete(self):
+        self.quiz.title = 'Renamed'
+        self.assertBumps(self.quiz.save)
+        self.assertBumps(Quiz.objects.get(pk=self.quiz.pk).delete)
+
+    def test_question_save_and_delete(self):
+        self.question.text = 'After?'
+        snapshot = self.assertBumps(self.question.save)
+        self.assertEqual(snapshot.questions[0].text, 'After?')
+        snapshot = self.assertBumps(lambda: Question.objects.create(quiz=self.quiz, text='Second?'))
+        self.assertEqual(snapshot.total_questions, 2)
+        snapshot = self.assertBumps(self.question.delete)
+        self.assertEqual([question.text for question in snapshot.questions], ['Second?'])
+
+    def test_option_save_and_delete(self):
+        self.option.text = 'After'
+        snapshot = self.assertBumps(self.option.save)
+        self.assertEqual(snapshot.questions[0].options[0].text, 'After')
+        snapshot = self.assertBumps(self.option.delete)
+        self.assertEqual(snapshot.questions[0].options, ())
+
+
+class LeaderboardTests(TestCase):
+    """Attempts update the materialized leaderboards, ranks agree with the order of the pages."""
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create(username='author', email='author@example.com')
+        self.quizzes = [Quiz.objects.create(title=f'Quiz {n}', created_by=author) for n in range(2)]
+        for quiz in self.quizzes:
+            for points in (1, 2):
+                question = Question.objects.create(quiz=quiz, text=f'{quiz.title} {points}?', points=points)
+                Option.objects.create(question=question, text='Right', is_correct=True)
+        self.takers = [User.objects.create(username=f'taker{n}', email=f'taker{n}@example.com') for n in range(6)]
+
+    def answers(self, quiz, points):
+        # the correct answers worth `points` in total (0, 1, 2 or 3)
+        return {
+            question_id: option_id for question_id, option_id, worth in
+            Option.objects.filter(question__quiz=quiz).values_list('question_id', 'id', 'question__points')
+            if worth & points
+        }
+
+    def test_record_attempt(self):
+        taker = self.takers[0]
+        record(taker, self.quizzes[0], self.answers(self.quizzes[0], 3), time_taken=timedelta(seconds=40))
+        record(taker, self.quizzes[1], self.answers(self.quizzes[1], 1))
+        entry = LeaderboardEntry.objects.get(user=taker)
+        self.assertEqual((entry.total_score, entry.total_attempts), (4, 2))
+        quiz_entry = QuizLeaderboardEntry.objects.get(user=taker, quiz=self.quizzes[0])
+        self.assertEqual((quiz_entry.best_score, quiz_entry.max_score, quiz_entry.best_time), (3, 3, timedelta(seconds=40)))
+        self.assertIsNone(QuizLeaderboardEntry.objects.get(user=taker, quiz=self.quizzes[1]).best_time)
+
+        # the incremental tables match a rebuild from QuizAttempt
+        incremental = list(QuizLeaderboardEntry.objects.values_list('quiz_id', 'user_id', 'best_score', 'best_time'))
+        leaderboard.rebuild()
+        self.assertEqual(sorted(QuizLeaderboardEntry.objects.values_list('quiz_id', 'user_id', 'best_score', 'best_time')), sorted(incremental))
+
+    def test_ranks_follow_the_page_order(self):
+        quiz = self.quizzes[0]
+        # equal scores with NULL and equal times: NULL sorts first, then the time, then the user id
+        for taker, points, seconds in zip(self.takers, [3, 3, 3, 3, 1, 3], [50, None, 20, 20, 10, None]):
+            record(taker, quiz, self.answers(quiz, points), time_taken=timedelta(seconds=seconds) if seconds else None)
+        self.client.force_login(self.takers[0])
+        page = [entry.user_id for entry in self.client.get(reverse('quiz-leaderboard', args=[quiz.pk])).context['leaderboard']]
+        self.assertEqual(page, [self.takers[n].pk for n in (1, 5, 2, 3, 0, 4)])
+        self.assertEqual([leaderboard.get_quiz_rank(quiz.pk, User(pk=user_id)) for user_id in page], list(range(1, 7)))
+
+        page = [entry.user_id for entry in self.client.get(reverse('leaderboard')).context['leaderboard']]
+        self.assertEqual([leaderboard.get_user_rank(User(pk=user_id)) for user_id in page], list(range(1, 7)))
+        self.assertIsNone(leaderboard.get_quiz_rank(self.quizzes[1].pk, self.takers[0]))
+
+    def test_deleted_quiz_leaves_the_totals(self):
+        quiz, other = self.quizzes
+        record(self.takers[0], quiz, self.answers(quiz, 3))
+        record(self.takers[0], other, self.answers(other, 1))
+        record(self.takers[1], quiz, self.answers(quiz, 2))
+        self.client.force_login(self.takers[0])
+        before = self.client.get(reverse('leaderboard'))
+
+        self.client.force_login(quiz.created_by)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('quiz-delete', args=[quiz.pk]))
+        self.assertFalse(Quiz.objects.filter(pk=quiz.pk).exists())
+        entry = LeaderboardEntry.objects.get(user=self.takers[0])
+        self.assertEqual((entry.total_score, entry.total_attempts), (1, 1))
+        self.assertFalse(LeaderboardEntry.objects.filter(user=self.takers[1]).exists())
+
+        # the overall page isn't answered 304 with the old totals
+        self.client.force_login(self.takers[0])
+        response = self.client.get(reverse('leaderboard'), HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry.user_id for entry in response.context['leaderboard']], [self.takers[0].pk])
+
+    def test_deleted_author_takes_the_totals_of_their_quizzes(self):
+        other_author = User.objects.create(username='other', email='other@example.com')
+        kept = Quiz.objects.create(title='Kept', created_by=other_author)
+        question = Question.objects.create(quiz=kept, text='Kept?')
+        Option.objects.create(question=question, text='Right', is_correct=True)
+        record(self.takers[0], self.quizzes[0], self.answers(self.quizzes[0], 3))
+        record(self.takers[0], kept, {question.id: question.options.get().id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.quizzes[0].created_by.delete()
+        entry = LeaderboardEntry.objects.get(user=self.takers[0])
+        self.assertEqual((entry.total_score, entry.total_attempts), (1, 1))
+
+    def test_leaderboard_etag_follows_dropped_entries(self):
+        quiz, other = self.quizzes
+        record(self.takers[1], quiz, self.answers(quiz, 3))
+        record(self.takers[0], other, self.answers(other, 1))
+        self.client.force_login(self.takers[0])
+        before = self.client.get(reverse('leaderboard'))
+        # only the older entry goes, the newest attempt and entry ids stay the same
+        with self.captureOnCommitCallbacks(execute=True):
+            quiz.delete()
+        response = self.client.get(reverse('leaderboard'), HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+
+class SinglePageModeTests(TestCase):
+    """?mode=single sends the whole quiz without the answers and takes them back in one POST."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='taker', email='taker@example.com')
+        self.quiz = Quiz.objects.create(title='One page', created_by=self.user)
+        self.correct = {}
+        for number in range(3):
+            question = Question.objects.create(quiz=self.quiz, text=f'Question {number}?')
+            options = Option.objects.bulk_create([Option(question=question, text=f'Option {n}', is_correct=(n == 1)) for n in range(3)])
+            self.correct[question.id] = options[1].id
+        self.url = reverse('quiz-take', args=[self.quiz.pk])
+        self.client.force_login(self.user)
+
+    def test_json_payload_has_no_answers(self):
+        response = self.client.get(self.url, {'mode': 'single', 'format': 'json'})
+        data = response.json()
+        self.assertEqual([question[0] for question in data['questions']], list(self.correct))
+        self.assertEqual(data['questions'][0][3], [[option.id, option.text] for option in Option.objects.filter(question_id=data['questions'][0][0]).order_by('id')])
+        self.assertNotIn(b'is_correct', response.content)
+        self.assertNotIn(b'true', response.content)
+
+    def test_one_post_completes_the_quiz(self):
+        token = self.client.get(self.url, {'mode': 'single', 'format': 'json'}).json()['token']
+        answers = {f'q_{question_id}': option_id for question_id, option_id in self.correct.items()}
+        # a tampered token is refused
+        self.client.post(self.url, {'mode': 'single', 'token': token + 'x', **answers})
+        self.assertFalse(QuizAttempt.objects.exists())
+
+        response = self.client.post(self.url, {'mode': 'single', 'token': token, **answers})
+        attempt = QuizAttempt.objects.get(user=self.user, quiz=self.quiz)
+        self.assertRedirects(response, reverse('quiz-result', args=[attempt.pk]), fetch_redirect_response=False)
+        self.assertEqual((attempt.score, attempt.max_score, attempt.answers.count()), (3, 3, 3))
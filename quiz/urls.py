@@ -12,6 +12,12 @@ urlpatterns = [
     path('quiz/<int:pk>/take/', views.TakeQuizView.as_view(), name='quiz-take'), # ---
 	path('quiz/<int:pk>/complete/', views.QuizCompleteView.as_view(), name='quiz-complete'), # ---
 	path('quiz/<int:quiz_pk>/add-question/', views.AddQuestionView.as_view(), name='add-question'), 
+    path('quiz/import/', views.QuizImportView.as_view(), name='quiz-import'),
+    path('quiz/<int:quiz_pk>/import/', views.QuizImportView.as_view(), name='question-import'),
+    path('quiz/<int:pk>/export/', views.QuizExportView.as_view(), name='quiz-export'),
+    path('quiz/<int:pk>/attempts/export/', views.QuizAttemptExportView.as_view(), name='quiz-attempts-export'),
+    path('quiz/<int:pk>/reorder/', views.QuizReorderView.as_view(), name='quiz-reorder'),
+    path('quiz/<int:pk>/analytics/', views.QuizAnalyticsView.as_view(), name='quiz-analytics'),
     path('result/<int:pk>/', views.QuizResultView.as_view(), name='quiz-result'),
     path('history/', views.UserQuizHistoryView.as_view(), name='user-history'),
     path('leaderboard/', views.LeaderboardView.as_view(), name='leaderboard'),
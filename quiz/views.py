@@ -1,54 +1,97 @@
+import json
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
 from django.db import transaction
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.conf import settings
-from django.utils import timezone
+from django.core import signing
+from django.http import JsonResponse, StreamingHttpResponse
+from core.pagination import KeysetPaginator
+from django.utils.decorators import method_decorator
+from django.utils.dateparse import parse_date
 from datetime import timedelta
-from django.db.models import Avg, Count, Q
-from .models import Quiz, Question, Option, QuizAttempt, UserAnswer, Category, Rating
-from .forms import QuizForm, QuestionForm, OptionForm, TakeQuizForm, RatingForm, QuestionWithOptionsForm, CategoryForm
-from django.db import models
+from django.db.models import Avg, Count, Max, Sum, Q, F, Case, When, Value, FloatField, ExpressionWrapper, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Quiz, Question, Option, QuizAttempt, Category, Rating, LeaderboardEntry, QuizLeaderboardEntry
+from .forms import QuizForm, QuestionForm, OptionForm, TakeQuizForm, RatingForm, QuestionWithOptionsForm, CategoryForm, QuizImportForm
+from .snapshot import get_quiz_snapshot, get_quiz_version, get_quiz_versions
+from .grading import finish_attempt
+from .attempt_store import get_attempt_store
+from . import leaderboard
+from . import search
+from . import question_bank
+from . import conditional
+from . import analytics
+from . import bulk
 from datetime import datetime
 
 
+@method_decorator(conditional.quiz_list, name='get')
 class QuizListView(ListView):
     model = Quiz
     template_name = 'quiz/quiz_list.html'
     context_object_name = 'quizzes'
+    paginate_by = 12
     
     def get_queryset(self):
-        queryset = Quiz.objects.filter(is_active=True)
+        # everything a card shows comes from this one query, so a page costs the same whatever its size
+        # (question count as a subquery: no GROUP BY, which the search ranking can't be used in)
+        question_count = Question.objects.filter(quiz=OuterRef('pk')).order_by().values('quiz').annotate(count=Count('id')).values('count')
+        queryset = Quiz.objects.filter(is_active=True).select_related('category').annotate(
+            question_count=Coalesce(Subquery(question_count), 0),
+            avg_rating=Case(
+                When(rating_count=0, then=Value(0.0)),
+                default=ExpressionWrapper(F('rating_sum') * 1.0 / F('rating_count'), output_field=FloatField()),
+                output_field=FloatField(),
+            ),
+        )
         category_id = self.request.GET.get('category')
         if category_id:
             queryset = queryset.filter(category_id=category_id)
+        self.search_match = search.build_match_query(self.request.GET.get('q', ''))
+        if self.search_match:
+            queryset = search.search(queryset, self.search_match)
         sort_by = self.request.GET.get('sort')
         if sort_by == 'rating':
-            queryset = queryset.annotate(avg_rating=Avg('ratings__score')).order_by('-avg_rating')
-        elif sort_by == 'newest':
-            queryset = queryset.order_by('-created_at')
+            queryset = queryset.order_by('-avg_rating', '-created_at')
         elif sort_by == 'oldest':
             queryset = queryset.order_by('created_at')
+        elif self.search_match and sort_by in (None, '', 'relevance'):
+            queryset = queryset.order_by('search_entry__rank', '-created_at')
+        else:
+            queryset = queryset.order_by('-created_at')
         return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['categories'] = Category.objects.all()
         context['selected_category'] = self.request.GET.get('category')
-        context['sort_by'] = self.request.GET.get('sort', 'newest')
+        context['search_query'] = self.request.GET.get('q', '')
+        context['sort_by'] = self.request.GET.get('sort') or ('relevance' if self.search_match else 'newest')
         
-        # Add attempted quizzes for authenticated users
+        # highlighted title and snippet, for the quizzes on this page only
+        if self.search_match:
+            found = search.snippets(self.search_match, [quiz.id for quiz in context['quizzes']])
+            for quiz in context['quizzes']:
+                quiz.search_title, quiz.search_snippet = found.get(quiz.id, (None, None))
+        else:
+            # cache key of each card fragment (search results are rendered fresh, they differ per query)
+            versions = get_quiz_versions([quiz.id for quiz in context['quizzes']])
+            for quiz in context['quizzes']:
+                quiz.cache_version = versions[quiz.id]
+        
+        # Add attempted quizzes for authenticated users (only the ones on this page)
         if self.request.user.is_authenticated:
             attempted_quizzes = QuizAttempt.objects.filter(
-                user=self.request.user
-            ).values_list('quiz_id', flat=True)
+                user=self.request.user,
+                quiz_id__in=[quiz.id for quiz in context['quizzes']]
+            ).order_by().values_list('quiz_id', flat=True)
             context['attempted_quizzes'] = set(attempted_quizzes)
         
         return context
 
+@method_decorator(conditional.quiz_detail, name='get')
 class QuizDetailView(DetailView):
     model = Quiz
     template_name = 'quiz/quiz_detail.html'
@@ -59,6 +102,11 @@ class QuizDetailView(DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # the cached fragments only vary on the quiz version and whether the author's buttons show
+        context['quiz_version'] = get_quiz_version(self.object.pk)
+        context['can_edit'] = self.request.user.is_staff or self.object.created_by_id == self.request.user.pk
+        # lazy, only evaluated when the questions fragment isn't cached
+        context['questions'] = self.object.questions.prefetch_related('options')
         if self.request.user.is_authenticated:
             user_rating = Rating.objects.filter(quiz=self.object, user=self.request.user).first()
             context['user_rating'] = user_rating.score if user_rating else None
@@ -114,6 +162,11 @@ class QuizDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 class TakeQuizView(LoginRequiredMixin, View):
+    # ?mode=single sends the whole quiz at once and takes every answer in one POST,
+    # the per-question flow below stays as the default / fallback
+    SINGLE_MODE = 'single'
+    token_salt = 'quiz.take.single'
+    
     def get(self, request, pk):
         quiz = get_object_or_404(Quiz, pk=pk, is_active=True)
         
@@ -122,37 +175,30 @@ class TakeQuizView(LoginRequiredMixin, View):
             messages.error(request, 'You have already attempted this quiz.')
             return redirect('quiz-detail', pk=quiz.id)
         
-        questions = list(quiz.questions.all().order_by('order'))
-        total_questions = len(questions)
+        if request.GET.get('mode') == self.SINGLE_MODE:
+            return self.get_single(request, quiz)
         
-        # Initialize session variables if not exists
-        if 'current_quiz' not in request.session or request.session['current_quiz']['quiz_id'] != quiz.id:
-            request.session['current_quiz'] = {
-                'quiz_id': quiz.id,
-                'current_question': 0,
-                'answers': {},
-                'start_time': timezone.now().isoformat()
-            }
+        questions = get_quiz_snapshot(quiz).questions
+        total_questions = len(questions)
         
-        current_quiz_data = request.session['current_quiz']
-        current_question_index = current_quiz_data['current_question']
+        # Load the in-progress attempt, or start one (quiz/attempt_store.py)
+        store = get_attempt_store()
+        state = store.load(request.user, quiz.id) or store.start(request.user, quiz.id)
         
         # Check if user clicked previous
         if 'previous' in request.GET:
-            current_question_index = max(0, current_question_index - 1)
-            current_quiz_data['current_question'] = current_question_index
-            request.session['current_quiz'] = current_quiz_data
+            store.move_cursor(state, max(0, state.cursor - 1))
+            store.save(state)
+        current_question_index = state.cursor
         
-        # Check if quiz is completed
-        if current_question_index >= total_questions:
+        # Check if quiz is completed, or its time is up
+        if current_question_index >= total_questions or quiz.time_is_up(state.started_at):
             return redirect('quiz-complete', pk=quiz.id)
         
         current_question = questions[current_question_index]
         
         # Get user's previous answer if any
-        user_answer = None
-        if str(current_question.id) in current_quiz_data['answers']:
-            user_answer = current_quiz_data['answers'][str(current_question.id)]
+        user_answer = state.answers.get(str(current_question.id))
         
         form = TakeQuizForm(question=current_question, initial={'answer': user_answer})
         
@@ -167,108 +213,125 @@ class TakeQuizView(LoginRequiredMixin, View):
     
     def post(self, request, pk):
         quiz = get_object_or_404(Quiz, pk=pk, is_active=True)
-        questions = list(quiz.questions.all().order_by('order'))
-        total_questions = len(questions)
         
         # Check if user has already attempted this quiz
         if QuizAttempt.objects.filter(user=request.user, quiz=quiz).exists():
             messages.error(request, 'You have already attempted this quiz.')
             return redirect('quiz-detail', pk=quiz.id)
         
-        # Get quiz data from session
-        if 'current_quiz' not in request.session or request.session['current_quiz']['quiz_id'] != quiz.id:
+        if request.POST.get('mode') == self.SINGLE_MODE:
+            return self.post_single(request, quiz)
+        
+        questions = get_quiz_snapshot(quiz).questions
+        total_questions = len(questions)
+        
+        # Get the in-progress attempt
+        store = get_attempt_store()
+        state = store.load(request.user, quiz.id)
+        if state is None:
             messages.error(request, 'Quiz session expired. Please try again.')
             return redirect('quiz-detail', pk=quiz.id)
+        if state.cursor >= total_questions:
+            return redirect('quiz-complete', pk=quiz.id)
+        if quiz.time_is_up(state.started_at):
+            # the answers given in time are scored, this one isn't recorded
+            messages.error(request, 'Time is up, answers submitted after the time limit are not counted.')
+            return redirect('quiz-complete', pk=quiz.id)
         
-        current_quiz_data = request.session['current_quiz']
-        current_question_index = current_quiz_data['current_question']
-        current_question = questions[current_question_index]
+        current_question = questions[state.cursor]
         
         # Get the selected option
         selected_option_id = request.POST.get('answer')
         
-        if selected_option_id:
-            # Save the answer in session
-            current_quiz_data['answers'][str(current_question.id)] = selected_option_id
-            request.session['current_quiz'] = current_quiz_data
+        if selected_option_id and selected_option_id.isdigit():
+            store.record_answer(state, current_question.id, selected_option_id)
         
-        # Move to next question
-        current_question_index += 1
-        current_quiz_data['current_question'] = current_question_index
-        request.session['current_quiz'] = current_quiz_data
+        # Move to next question, answer and cursor are written together
+        store.move_cursor(state, state.cursor + 1)
+        store.save(state)
         
         # Check if quiz is completed
-        if current_question_index >= total_questions:
+        if state.cursor >= total_questions:
             return redirect('quiz-complete', pk=quiz.id)
         
         return redirect('quiz-take', pk=quiz.id)
     
+    def get_single(self, request, quiz):
+        # one start time per user and quiz, shared with the per-question flow: reloading the page
+        # (or switching modes) doesn't restart the clock
+        store = get_attempt_store()
+        state = store.load(request.user, quiz.id) or store.start(request.user, quiz.id)
+        if quiz.time_is_up(state.started_at):
+            return redirect('quiz-complete', pk=quiz.id)
+        snapshot = get_quiz_snapshot(quiz)
+        # the start time also travels signed with the form
+        token = signing.dumps({'quiz': quiz.id, 'user': request.user.id, 'start': state.started_at.isoformat()}, salt=self.token_salt)
+        if request.GET.get('format') == 'json':
+            # compact payload for scripted clients: [id, text, points, [[option id, text], ...]], no correct flags
+            return JsonResponse({
+                'quiz': quiz.id,
+                'title': quiz.title,
+                'time_limit': quiz.time_limit,
+                'token': token,
+                'questions': [
+                    [question.id, question.text, question.points, [[option.id, option.text] for option in question.options]]
+                    for question in snapshot.questions
+                ],
+            })
+        return render(request, 'quiz/take_quiz_single.html', {
+            'quiz': quiz,
+            'questions': snapshot.questions,
+            'total_questions': snapshot.total_questions,
+            'token': token,
+        })
+    
+    def post_single(self, request, quiz):
+        try:
+            data = signing.loads(request.POST.get('token', ''), salt=self.token_salt)
+        except signing.BadSignature:
+            data = None
+        if not data or data['quiz'] != quiz.id or data['user'] != request.user.id:
+            messages.error(request, 'Quiz session expired. Please try again.')
+            return redirect('quiz-detail', pk=quiz.id)
+        
+        # answers come in as q_<question id>=<option id>
+        answers = {
+            key[2:]: value for key, value in request.POST.items() if key.startswith('q_') and value
+        }
+        store = get_attempt_store()
+        state = store.load(request.user, quiz.id)
+        started_at = state.started_at if state is not None else datetime.fromisoformat(data['start'])
+        if quiz.time_is_up(started_at):
+            # the whole form came in late: the attempt is closed without its answers
+            messages.error(request, 'Time is up, answers submitted after the time limit are not counted.')
+            answers = {}
+        attempt = finish_attempt(request.user, quiz, answers, started_at)
+        store.finish(request.user, quiz.id)
+        if attempt is None:
+            messages.error(request, 'You have already attempted this quiz.')
+            return redirect('quiz-detail', pk=quiz.id)
+        messages.success(request, f'Quiz completed! Your score: {attempt.score}/{attempt.max_score}')
+        return redirect('quiz-result', pk=attempt.id)
+
 
 # works with TakeQuizView
 class QuizCompleteView(LoginRequiredMixin, View):
     def get(self, request, pk):
         quiz = get_object_or_404(Quiz, pk=pk, is_active=True)
-        questions = list(quiz.questions.all().order_by('order'))
         
-        # Get quiz data from session
-        if 'current_quiz' not in request.session or request.session['current_quiz']['quiz_id'] != quiz.id:
+        # Get the in-progress attempt
+        store = get_attempt_store()
+        state = store.load(request.user, quiz.id)
+        if state is None:
             messages.error(request, 'Quiz session expired. Please try again.')
             return redirect('quiz-detail', pk=quiz.id)
         
-        current_quiz_data = request.session['current_quiz']
-        answers = current_quiz_data['answers']
-        start_time = datetime.fromisoformat(current_quiz_data['start_time'])  # Fixed this line
-        
-        # Calculate score
-        score = 0
-        max_score = sum(q.points for q in questions)
-        
-        with transaction.atomic():
-            # Create quiz attempt
-            attempt = QuizAttempt.objects.create(
-                user=request.user,
-                quiz=quiz,
-                score=score,
-                max_score=max_score,
-                time_taken=timezone.now() - start_time
-            )
-            
-            # Save user answers
-            for question in questions:
-                if str(question.id) in answers:
-                    selected_option_id = answers[str(question.id)]
-                    try:
-                        selected_option = Option.objects.get(id=selected_option_id)
-                        is_correct = selected_option.is_correct
-                        
-                        if is_correct:
-                            score += question.points
-                            
-                        UserAnswer.objects.create(
-                            attempt=attempt,
-                            question=question,
-                            selected_option=selected_option,
-                            is_correct=is_correct
-                        )
-                    except Option.DoesNotExist:
-                        pass
-            
-            # Update the score
-            attempt.score = score
-            attempt.save()
-            
-            # Send email with quiz results
-            send_mail(
-                'Quiz Result',
-                f'Your result for {quiz.title}:\nScore: {score}/{max_score}\nTime taken: {attempt.time_taken}',
-                settings.DEFAULT_FROM_EMAIL,
-                [request.user.email],
-                fail_silently=False,
-            )
-        
-        # Clear session
-        if 'current_quiz' in request.session:
-            del request.session['current_quiz']
+        attempt = finish_attempt(request.user, quiz, state.answers, state.started_at)
+        store.finish(request.user, quiz.id)
+        if attempt is None:
+            messages.error(request, 'You have already attempted this quiz.')
+            return redirect('quiz-detail', pk=quiz.id)
+        score, max_score = attempt.score, attempt.max_score
         
         messages.success(request, f'Quiz completed! Your score: {score}/{max_score}')
         return redirect('quiz-result', pk=attempt.id)
@@ -280,7 +343,10 @@ class QuizResultView(LoginRequiredMixin, DetailView):
     context_object_name = 'attempt'
     
     def get_queryset(self):
-        return QuizAttempt.objects.filter(user=self.request.user)
+        # everything the page shows in five queries, whatever the number of answers
+        return QuizAttempt.objects.filter(user=self.request.user).select_related('quiz').prefetch_related(
+            'answers__question__options', 'answers__selected_option',
+        )
 
 class MyQuizListView(LoginRequiredMixin, ListView):
     model = Quiz
@@ -294,35 +360,70 @@ class UserQuizHistoryView(LoginRequiredMixin, ListView):
     model = QuizAttempt
     template_name = 'quiz/user_quiz_history.html'
     context_object_name = 'attempts'
+    per_page = 25
     
     def get_queryset(self):
-        return QuizAttempt.objects.filter(user=self.request.user).select_related('quiz')
+        queryset = QuizAttempt.objects.filter(user=self.request.user).select_related('quiz__category')
+        category_id = self.request.GET.get('category', '')
+        if category_id.isdigit():
+            queryset = queryset.filter(quiz__category_id=category_id)
+        return queryset
+    
+    def get_summary(self):
+        # one grouped query: per category stats of every attempt (the category filter doesn't apply)
+        percentage = Case(
+            When(max_score__gt=0, then=ExpressionWrapper(F('score') * 100.0 / F('max_score'), output_field=FloatField())),
+            output_field=FloatField(),
+        )
+        rows = list(
+            QuizAttempt.objects.filter(user=self.request.user)
+            .values('quiz__category_id', 'quiz__category__name')
+            .annotate(
+                attempts=Count('id'),
+                scored=Count('id', filter=Q(max_score__gt=0)),
+                avg_percentage=Avg(percentage),
+                best_percentage=Max(percentage),
+                total_time=Sum('time_taken'),
+            )
+            .order_by('quiz__category__name')
+        )
+        scored = sum(row['scored'] for row in rows)
+        overall = {
+            'attempts': sum(row['attempts'] for row in rows),
+            'avg_percentage': sum(row['avg_percentage'] * row['scored'] for row in rows if row['scored']) / scored if scored else None,
+            'best_percentage': max((row['best_percentage'] for row in rows if row['best_percentage'] is not None), default=None),
+            'total_time': sum((row['total_time'] for row in rows if row['total_time']), timedelta()),
+        }
+        return rows, overall
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Add categories for filtering
-        context['categories'] = Category.objects.all()
+        # keyset pages: the cursor is the (completed_at, id) of the last row shown, no OFFSET
+        page = KeysetPaginator(context['attempts'], ('-completed_at', '-id'), self.per_page).page(self.request.GET.get('cursor'))
+        context['attempts'] = context['page'] = page
+        context['summary'], context['overall'] = self.get_summary()
+        # only the categories the user has attempts in, they come with the summary
+        context['categories'] = [row for row in context['summary'] if row['quiz__category_id']]
+        context['selected_category'] = self.request.GET.get('category', '')
         return context
 
+@method_decorator(conditional.leaderboard, name='get')
 class LeaderboardView(ListView):
-    model = QuizAttempt
     template_name = 'quiz/leaderboard.html'
     context_object_name = 'leaderboard'
+    paginate_by = 25
     
     def get_queryset(self):
+        # reads the materialized leaderboard tables (quiz/leaderboard.py), not QuizAttempt
         quiz_id = self.kwargs.get('quiz_id')
         if quiz_id:
-            # For specific quiz leaderboard, show the highest score per user
-            return QuizAttempt.objects.filter(quiz_id=quiz_id).values('user__username', 'user__id').annotate(
-                max_score=models.Max('score'),
-                min_time=models.Min('time_taken')
-            ).order_by('-max_score', 'min_time')
+            # For specific quiz leaderboard, show the best score and time per user
+            return QuizLeaderboardEntry.objects.filter(quiz_id=quiz_id).select_related('user').order_by(
+                '-best_score', 'best_time', 'user_id'
+            )
         else:
-            # For overall leaderboard, show the highest score per user across all quizzes
-            return QuizAttempt.objects.values('user__username', 'user__id').annotate(
-                total_score=models.Sum('score'),
-                total_attempts=models.Count('id')
-            ).order_by('-total_score')
+            # For overall leaderboard, show the total score per user across all quizzes
+            return LeaderboardEntry.objects.select_related('user').order_by('-total_score', 'user_id')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -332,6 +433,11 @@ class LeaderboardView(ListView):
             context['is_specific_quiz'] = True
         else:
             context['is_specific_quiz'] = False
+        if self.request.user.is_authenticated:
+            if quiz_id:
+                context['my_rank'] = leaderboard.get_quiz_rank(quiz_id, self.request.user)
+            else:
+                context['my_rank'] = leaderboard.get_user_rank(self.request.user)
         return context
 
 
@@ -343,11 +449,14 @@ class RateQuizView(LoginRequiredMixin, View):
         if score and score.isdigit():
             score = int(score)
             if 1 <= score <= 7:
-                rating, created = Rating.objects.update_or_create(
-                    quiz=quiz,
-                    user=request.user,
-                    defaults={'score': score}
-                )
+                with transaction.atomic():
+                    previous_score = Rating.objects.filter(quiz=quiz, user=request.user).values_list('score', flat=True).first()
+                    rating, created = Rating.objects.update_or_create(
+                        quiz=quiz,
+                        user=request.user,
+                        defaults={'score': score}
+                    )
+                    quiz.apply_rating(score, previous_score)
                 if created:
                     messages.success(request, 'Thank you for rating!')
                 else:
@@ -388,27 +497,147 @@ class AddQuestionView(LoginRequiredMixin, UserPassesTestMixin, View):
         
         if form.is_valid():
             with transaction.atomic():
-                # Get the next order number
-                next_order = quiz.questions.count() + 1
-                
-                # Create the question
+                # Create the question, save() appends it with the quiz's order allocator
                 question = Question.objects.create(
                     quiz=quiz,
                     text=form.cleaned_data['question_text'],
-                    order=next_order,  # Set order automatically                    
                 )
                 # Create the options
                 correct_option = int(form.cleaned_data['correct_option'])
-                for i in range(1, 5):
-                    option_text = form.cleaned_data[f'option_{i}']
-                    is_correct = (i == correct_option)
-                    Option.objects.create(
-                        question=question,
-                        text=option_text,
-                        is_correct=is_correct
-                    )
+                Option.objects.bulk_create([
+                    Option(question=question, text=form.cleaned_data[f'option_{i}'], is_correct=(i == correct_option))
+                    for i in range(1, 5)
+                ])
                 
                 messages.success(request, 'Question added successfully!')
                 return redirect('quiz-detail', pk=quiz.pk)
         
-        return render(request, self.template_name, {'quiz': quiz, 'form': form})
\ No newline at end of file
+        return render(request, self.template_name, {'quiz': quiz, 'form': form})
+
+class QuizImportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Create a quiz (quiz-import) or add questions to one (question-import) from a CSV/JSON Lines file."""
+    template_name = 'quiz/quiz_import.html'
+    
+    def test_func(self):
+        if 'quiz_pk' not in self.kwargs:
+            return True
+        quiz = get_object_or_404(Quiz, pk=self.kwargs['quiz_pk'])
+        return quiz.created_by_id == self.request.user.pk or self.request.user.is_staff
+    
+    def get_quiz(self):
+        if 'quiz_pk' not in self.kwargs:
+            return None
+        return get_object_or_404(Quiz, pk=self.kwargs['quiz_pk'])
+    
+    def get(self, request, quiz_pk=None):
+        quiz = self.get_quiz()
+        return render(request, self.template_name, {'quiz': quiz, 'form': QuizImportForm(quiz=quiz)})
+    
+    def post(self, request, quiz_pk=None):
+        quiz = self.get_quiz()
+        # the form validates the whole file before anything is written
+        form = QuizImportForm(request.POST, request.FILES, quiz=quiz)
+        if not form.is_valid():
+            return render(request, self.template_name, {'quiz': quiz, 'form': form})
+        
+        upload = form.cleaned_data['file']
+        with transaction.atomic():
+            if quiz is None:
+                quiz = Quiz.objects.create(
+                    title=form.cleaned_data['title'],
+                    category=form.cleaned_data['category'],
+                    created_by=request.user,
+                    **form.quiz_details
+                )
+            count = question_bank.import_questions(quiz, question_bank.iter_questions(upload, form.format))
+        
+        messages.success(request, f'Imported {count} questions.')
+        return redirect('quiz-detail', pk=quiz.pk)
+
+class QuizReorderView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Drag-and-drop question ordering. POST the complete new order, either as form fields
+    (question=<id>, repeated) or as JSON {"questions": [ids...]} which gets a JSON reply.
+    """
+    template_name = 'quiz/quiz_reorder.html'
+    
+    def test_func(self):
+        quiz = get_object_or_404(Quiz, pk=self.kwargs['pk'])
+        return quiz.created_by_id == self.request.user.pk or self.request.user.is_staff
+    
+    def get(self, request, pk):
+        quiz = get_object_or_404(Quiz, pk=pk)
+        questions = quiz.questions.only('id', 'text', 'order', 'quiz_id')
+        return render(request, self.template_name, {'quiz': quiz, 'questions': questions})
+    
+    def post(self, request, pk):
+        quiz = get_object_or_404(Quiz, pk=pk)
+        wants_json = request.content_type == 'application/json'
+        try:
+            if wants_json:
+                question_ids = json.loads(request.body).get('questions')
+                if not isinstance(question_ids, list):
+                    raise ValueError('Send {"questions": [question ids in the new order]}.')
+            else:
+                question_ids = request.POST.getlist('question')
+            moved = question_bank.reorder_questions(quiz, question_ids)
+        except (ValueError, AttributeError) as e:
+            if wants_json:
+                return JsonResponse({'error': str(e)}, status=400)
+            messages.error(request, str(e))
+            return redirect('quiz-reorder', pk=quiz.pk)
+        
+        if wants_json:
+            return JsonResponse({'moved': moved})
+        messages.success(request, 'Question order saved.')
+        return redirect('quiz-detail', pk=quiz.pk)
+
+class QuizExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Stream a quiz's questions as CSV (default) or JSON Lines (?format=json)."""
+    
+    def test_func(self):
+        quiz = get_object_or_404(Quiz, pk=self.kwargs['pk'])
+        return quiz.created_by_id == self.request.user.pk or self.request.user.is_staff
+    
+    def get(self, request, pk):
+        quiz = get_object_or_404(Quiz, pk=pk)
+        fmt = request.GET.get('format', 'csv')
+        if fmt not in question_bank.FORMATS:
+            fmt = 'csv'
+        content_type, extension = question_bank.FORMATS[fmt]
+        response = StreamingHttpResponse(question_bank.export(quiz, fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="quiz-{quiz.pk}.{extension}"'
+        return response
+
+class QuizAttemptExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Stream a quiz's attempts and their answers as CSV, optionally from/to a date (?from=2025-01-01&to=2025-01-31)."""
+    
+    def test_func(self):
+        quiz = get_object_or_404(Quiz, pk=self.kwargs['pk'])
+        return quiz.created_by_id == self.request.user.pk or self.request.user.is_staff
+    
+    def get(self, request, pk):
+        quiz = get_object_or_404(Quiz, pk=pk)
+        try:
+            start = parse_date(request.GET.get('from', ''))
+            end = parse_date(request.GET.get('to', ''))
+        except ValueError:
+            start = end = None
+        attempts = bulk.attempts_between(QuizAttempt.objects.filter(quiz=quiz), start, end)
+        response = StreamingHttpResponse(bulk.export_attempts_csv(attempts), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="quiz-{quiz.pk}-attempts.csv"'
+        return response
+
+class QuizAnalyticsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Per-question dashboard for the quiz's author: correct rate, discrimination and option picks."""
+    template_name = 'quiz/quiz_analytics.html'
+    
+    def test_func(self):
+        quiz = get_object_or_404(Quiz, pk=self.kwargs['pk'])
+        return quiz.created_by_id == self.request.user.pk or self.request.user.is_staff
+    
+    def get(self, request, pk):
+        quiz = get_object_or_404(Quiz, pk=pk)
+        # counts the attempts made since the last visit, then reads the stats tables
+        report = analytics.question_report(quiz)
+        return render(request, self.template_name, {'quiz': quiz, 'report': report})
@@ -2,6 +2,8 @@
 ASGI config for quiz_master project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+It defaults to the ASGI profile (quiz_master/settings_asgi.py): async views for the read-heavy
+pages and async capable middleware.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -11,6 +13,6 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz_master.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'quiz_master.settings_asgi')
 
 application = get_asgi_application()
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',  # only active with PERFORMANCE_TIMING = True
     'django.middleware.security.SecurityMiddleware',
 	'whitenoise.middleware.WhiteNoiseMiddleware',  # ---
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -84,6 +85,38 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': config('CONN_MAX_AGE', default=600, cast=int),  # persistent connections
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',  # atomic() takes the write lock up front, no lock-upgrade deadlocks
+        },
+        'TEST': {
+            # a real file, WAL and concurrent connections don't work with the in-memory test database
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# PRAGMAs applied on every new connection (core/db.py)
+SQLITE_PRAGMAS = {
+    'journal_mode': config('SQLITE_JOURNAL_MODE', default='WAL'),
+    'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=134217728, cast=int),
+    'cache_size': config('SQLITE_CACHE_SIZE', default=-20000, cast=int),
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+# quiz snapshot versions and snapshots (quiz/snapshot.py) live here, every worker must see the same
+# ones or grading reads a stale quiz: the default is a file cache shared by the processes of this
+# host (not locmem, which is per process). Use redis/memcached when the workers span several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=5000, cast=int)},
     }
 }
 
@@ -156,6 +189,24 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'welcome-page'
 LOGOUT_REDIRECT_URL = 'welcome-page'
 
+# In-progress quiz attempts (quiz/attempt_store.py): DatabaseAttemptStore, or CacheAttemptStore
+# with a cache shared by every worker (the default file cache, redis..., never LocMemCache)
+QUIZ_ATTEMPT_STORE = config('QUIZ_ATTEMPT_STORE', default='quiz.attempt_store.DatabaseAttemptStore')
+
+# Per-request Server-Timing header and 'quiz_master.performance' log lines (core/middleware.py)
+PERFORMANCE_TIMING = config('PERFORMANCE_TIMING', default=False, cast=bool)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'quiz_master.performance': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Media settings
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
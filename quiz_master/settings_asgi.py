@@ -0,0 +1,30 @@
+"""
+ASGI deployment profile, the settings quiz_master/asgi.py loads by default:
+
+    uvicorn quiz_master.asgi:application --workers 4
+
+The quiz list, detail, result and leaderboard pages are served by the async views of
+quiz/async_views.py (quiz_master/urls_asgi.py), everything else by the same sync views as under
+WSGI. Every middleware has to be async capable: a single sync one makes Django run the whole
+request, async views included, in a worker thread again.
+
+The ASGI handler runs each request's sync work (ORM queries included) in a thread of its own,
+so a connection can't outlive its request: CONN_MAX_AGE is 0 here. The sync code of a request
+still runs one call at a time, run several workers to use more cores. `manage.py loadtest`
+compares this profile with WSGI.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, MIDDLEWARE
+
+ROOT_URLCONF = 'quiz_master.urls_asgi'
+
+# a persistent connection would be opened per request thread and never reused, close it instead
+# (a copy: the WSGI settings' dict must stay as it is when both modules are imported)
+DATABASES = {**DATABASES, 'default': {**DATABASES['default'], 'CONN_MAX_AGE': 0}}
+
+# WhiteNoise is sync only. ServerTimingMiddleware is too, it stays listed and removes itself
+# unless PERFORMANCE_TIMING is on, when the requests go through threads (and get timed) again.
+MIDDLEWARE = [
+    'core.middleware.AsyncWhiteNoiseMiddleware' if path == 'whitenoise.middleware.WhiteNoiseMiddleware' else path
+    for path in MIDDLEWARE
+]
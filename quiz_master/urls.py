@@ -25,6 +25,7 @@ urlpatterns = [
     path('', include("core.urls")),
     path('users/', include("users.urls")),
     path('quizzes/', include("quiz.urls")),    
+    path('api/v1/', include("quiz.api_urls")),
 	path('users/', include('django.contrib.auth.urls')), # Password reset URLs    
 ]
 
@@ -0,0 +1,20 @@
+"""
+URLs of the ASGI profile (quiz_master/settings_asgi.py): the read-heavy quiz pages go to their
+async views, under the same paths and names, everything else to quiz_master/urls.py.
+"""
+from django.urls import include, path
+
+from quiz import async_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('quizzes/', include([
+        path('', async_views.QuizListView.as_view(), name='quiz-list'),
+        path('quiz/<int:pk>/', async_views.QuizDetailView.as_view(), name='quiz-detail'),
+        path('result/<int:pk>/', async_views.QuizResultView.as_view(), name='quiz-result'),
+        path('leaderboard/', async_views.LeaderboardView.as_view(), name='leaderboard'),
+        path('leaderboard/quiz/<int:quiz_id>/', async_views.LeaderboardView.as_view(), name='quiz-leaderboard'),
+    ])),
+    *sync_urlpatterns,
+]
@@ -16,6 +16,13 @@ class CustomUser(AbstractUser):
     #profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # the admin user directory sorts by join date
+            models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+        ]
+    
     def save(self, *args, **kwargs):
         if self.is_superuser:
             self.user_type = 'admin'
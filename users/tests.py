@@ -1,3 +1,68 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from quiz.models import Quiz, QuizAttempt
+
+User = get_user_model()
+
+
+class UserDirectoryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(username='admin', email='admin@example.com', user_type='admin')
+        author = User.objects.create(username='author', email='author@example.com')
+        quizzes = [Quiz.objects.create(title=f'Directory {n}', created_by=author) for n in range(2)]
+        self.users = User.objects.bulk_create([
+            User(username=f'member{n}', email=f'member{n}@example.com', phone_number=f'0700{n:04d}') for n in range(30)
+        ])
+        now = timezone.now()
+        # member3 is the most recently active, member5 has two attempts
+        for user, quiz, ago in ((self.users[5], quizzes[0], 3), (self.users[5], quizzes[1], 2), (self.users[3], quizzes[0], 1)):
+            attempt = QuizAttempt.objects.create(user=user, quiz=quiz, score=1, max_score=1)
+            # completed_at is auto_now_add
+            QuizAttempt.objects.filter(pk=attempt.pk).update(completed_at=now - timedelta(hours=ago))
+        self.client.force_login(self.admin)
+
+    def test_pages_are_paginated(self):
+        response = self.client.get(reverse('profile'))
+        page = response.context['users_list']
+        self.assertEqual(len(page), 25)
+        self.assertEqual(response.context['paginator'].count, 32)
+        self.assertContains(response, 'Page 1 of 2')
+
+        response = self.client.get(reverse('profile'), {'page': 2})
+        self.assertEqual(len(response.context['users_list']), 7)
+
+    def test_search_matches_username_email_and_phone(self):
+        response = self.client.get(reverse('profile'), {'q': 'member1'})
+        self.assertEqual(response.context['paginator'].count, 11)  # member1, member10-19
+        response = self.client.get(reverse('profile'), {'q': '07000029'})
+        self.assertEqual([user.username for user in response.context['users_list']], ['member29'])
+
+    def test_sort_by_activity(self):
+        response = self.client.get(reverse('profile'), {'sort': 'active'})
+        users = list(response.context['users_list'])
+        self.assertEqual([user.username for user in users[:2]], ['member3', 'member5'])
+        self.assertEqual(users[1].attempt_count, 2)
+        self.assertIsNone(users[2].last_attempt)
+
+    def test_page_query_count_does_not_grow_with_users(self):
+        # session, user, count, page
+        with self.assertNumQueries(4):
+            self.client.get(reverse('profile'), {'sort': 'active'})
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('user-directory-export'), {'q': 'member5'})
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], 'username,email,phone,type,email verified,joined,attempts,last attempt')
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(rows[1].startswith('member5,member5@example.com,07000005,user,no,'))
+        self.assertEqual(rows[1].split(',')[6], '2')
 
-# Create your tests here.
+    def test_directory_is_admin_only(self):
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.get(reverse('user-directory-export')).status_code, 403)
+        self.assertTemplateUsed(self.client.get(reverse('profile')), 'users/user_profile.html')
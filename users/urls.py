@@ -9,6 +9,7 @@ urlpatterns = [
     path('verify/<uuid:token>/', views.verify_email, name='verify-email'),
 	path('profile/', views.ProfileView.as_view(), name='profile'),
     path('profile/edit/', views.ProfileUpdateView.as_view(), name='edit-profile'),
+    path('profile/users.csv', views.UserDirectoryExportView.as_view(), name='user-directory-export'),
 
 	# Password reset URLs
     path('password-reset/', auth_views.PasswordResetView.as_view(
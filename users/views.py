@@ -2,11 +2,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, UpdateView, View
 from django.contrib.auth.views import LoginView, LogoutView
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth import get_user_model
 from django.contrib import messages
-from django.core.mail import send_mail
+from django.db import transaction
+from django.core.paginator import Paginator
+from django.http import StreamingHttpResponse
+from core.mail import queue_mail
 from django.conf import settings
+from . import directory
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, UserUpdateForm
 from django.contrib.auth.forms import PasswordResetForm
 from django.contrib.auth.views import PasswordResetView
@@ -22,18 +26,18 @@ class SignUpView(CreateView):
     template_name = 'registration/signup.html'
     
     def form_valid(self, form):
-        response = super().form_valid(form)
-        # Send verification email
-        verification_url = self.request.build_absolute_uri(
-            reverse_lazy('verify-email', kwargs={'token': self.object.email_verification_token})
-        )
-        send_mail(
-            'Verify your email address',
-            f'Please click the following link to verify your email: {verification_url} \n -QuizMaster App',
-            settings.DEFAULT_FROM_EMAIL,
-            [self.object.email],
-            fail_silently=False,
-        )        
+        with transaction.atomic():
+            response = super().form_valid(form)
+            # Queue verification email, delivered by manage.py send_queued_mail
+            verification_url = self.request.build_absolute_uri(
+                reverse_lazy('verify-email', kwargs={'token': self.object.email_verification_token})
+            )
+            queue_mail(
+                'Verify your email address',
+                f'Please click the following link to verify your email: {verification_url} \n -QuizMaster App',
+                settings.DEFAULT_FROM_EMAIL,
+                [self.object.email],
+            )
         messages.success(self.request, 'Account created! Please check your email to verify your account.')
         return response
 
@@ -49,12 +53,11 @@ class CustomLoginView(LoginView):
             verification_url = self.request.build_absolute_uri(
                 reverse_lazy('verify-email', kwargs={'token': user.email_verification_token})
             )
-            send_mail(
+            queue_mail(
                 'Verify your email address',
                 f'Please click the following link to verify your email: {verification_url}',
                 settings.DEFAULT_FROM_EMAIL,
                 [user.email],
-                fail_silently=False,
             )
             messages.error(self.request, 'Please verify your email before logging in. A new verification email was sent')
             return self.form_invalid(form)
@@ -64,14 +67,23 @@ class CustomLogoutView(LogoutView):
     next_page = reverse_lazy('welcome-page')
 
 class ProfileView(LoginRequiredMixin, View):
+    users_per_page = 25
+    
     def get(self, request):
         user = request.user
         if user.user_type == 'admin':
-            # For admin users, show all users
-            users_list = User.objects.all() # CustomUser
+            # For admin users, a searchable and paginated user directory
+            search_query = request.GET.get('q', '')
+            sort = request.GET.get('sort') if request.GET.get('sort') in directory.SORTS else directory.DEFAULT_SORT
+            paginator = Paginator(directory.directory(search_query, sort), self.users_per_page)
+            users_list = paginator.get_page(request.GET.get('page'))
             return render(request, 'users/admin_profile.html', {
                 'user': user,
-                'users_list': users_list
+                'users_list': users_list,
+                'paginator': paginator,
+                'search_query': search_query,
+                'sort': sort,
+                'sorts': [(key, label) for key, (label, ordering) in directory.SORTS.items()],
             })
         else:
             # For regular users, show only their profile
@@ -79,6 +91,18 @@ class ProfileView(LoginRequiredMixin, View):
                 'user': user
             })
 
+class UserDirectoryExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """The admin user directory as a streamed CSV file, with the same search and sort as the profile page."""
+    
+    def test_func(self):
+        return self.request.user.user_type == 'admin'
+    
+    def get(self, request):
+        users = directory.directory(request.GET.get('q', ''), request.GET.get('sort'))
+        response = StreamingHttpResponse(directory.export_csv(users), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="users.csv"'
+        return response
+
 class ProfileUpdateView(LoginRequiredMixin, UpdateView):
     model = User
     form_class = UserUpdateForm